@@ -181,13 +181,7 @@ def tasks(limit: int, status: Optional[str]):
         # Исправление обработки времени
         if task['created_at']:
             try:
-                # Если это unix timestamp
-                if task['created_at'] > 1000000000:  # После 2001 года
-                    created_at = time.ctime(task['created_at'])[:19]
-                else:
-                    # Если это julian day - конвертируем
-                    unix_time = (task['created_at'] - 2440587.5) * 86400
-                    created_at = time.ctime(unix_time)[:19]
+                created_at = time.ctime(task['created_at'])[:19]
             except (ValueError, OverflowError, OSError):
                 created_at = 'Invalid time'
         else:
@@ -225,13 +219,13 @@ def task_info(task_id: str):
     click.echo(f"\n=== Задача {task['id']} ===")
     click.echo(f"Тип: {task['type']}")
     click.echo(f"Статус: {task['status']}")
-    click.echo(f"Создана: {time.ctime(task['created_at'] * 86400 + time.mktime(time.gmtime(0))) if task['created_at'] else 'Unknown'}")
+    click.echo(f"Создана: {time.ctime(task['created_at']) if task['created_at'] else 'Unknown'}")
     
     if task['started_at']:
-        click.echo(f"Запущена: {time.ctime(task['started_at'] * 86400 + time.mktime(time.gmtime(0)))}")
+        click.echo(f"Запущена: {time.ctime(task['started_at'])}")
     
     if task['finished_at']:
-        click.echo(f"Завершена: {time.ctime(task['finished_at'] * 86400 + time.mktime(time.gmtime(0)))}")
+        click.echo(f"Завершена: {time.ctime(task['finished_at'])}")
     
     click.echo(f"Таймаут: {task['timeout_sec']} сек")
     
@@ -689,6 +683,101 @@ def status():
     click.echo(f"\nОбновлено: {stats.get('timestamp', 'Unknown')}")
 
 
+# // Chg_VAC_FTS_1710: полнотекстовый поиск вакансий
+@cli.command()
+@click.argument('query', nargs=-1, required=True)
+@click.option('--limit', '-l', default=20, help='Количество результатов')
+@click.option('--offset', '-o', default=0, help='Смещение (постраничный вывод)')
+def search(query, limit: int, offset: int):
+    """Поиск вакансий по тексту (FTS5): python django, pyth*"""
+    
+    db = TaskDatabase()
+    text = ' '.join(query)
+    start = time.time()
+    result = db.search_vacancies(text, limit=limit, offset=offset)
+    elapsed_ms = (time.time() - start) * 1000
+    
+    if not result['items']:
+        click.echo(f"Ничего не найдено: {text}")
+        return
+    
+    click.echo(f"\n{'HH ID':<12} {'Title':<40} {'Company':<25} {'Area'}")
+    click.echo("-" * 95)
+    for v in result['items']:
+        click.echo(f"{(v.get('hh_id') or '')[:11]:<12} {(v.get('title') or '')[:39]:<40} "
+                   f"{(v.get('company') or '')[:24]:<25} {v.get('area') or ''}")
+        if v.get('snippet'):
+            click.echo(f"{'':<12} {v['snippet'][:80]}")
+    
+    shown_to = offset + len(result['items'])
+    click.echo(f"\nПоказано {offset + 1}-{shown_to} из {result['total']} ({elapsed_ms:.1f} мс)")
+
+
+# // Chg_DB_MAINT_1710: обслуживание БД без полного VACUUM
+@cli.command()
+@click.option('--full-vacuum', is_flag=True,
+              help='Однократный полный VACUUM (блокирует запись; переводит старую БД в auto_vacuum=INCREMENTAL)')
+def db_maintenance(full_vacuum: bool):
+    """Удаление по срокам хранения (config.cleanup), incremental_vacuum и checkpoint WAL"""
+    from core.config_manager import get_config_manager
+    
+    db = TaskDatabase()
+    if full_vacuum:
+        click.echo("⏳ Полный VACUUM...")
+        db.vacuum()
+    
+    cfg = get_config_manager().get_cleanup_settings()
+    retention = {
+        'tasks': cfg['keep_tasks_days'],
+        'logs': cfg['keep_logs_days'],
+        'system_health': cfg['keep_system_health_days'],
+        'vacancy_versions': cfg['keep_vacancy_versions_days'],
+    }
+    result = db.run_maintenance(
+        retention,
+        batch_size=cfg['delete_batch_size'],
+        vacuum_step_pages=cfg['vacuum_step_pages'],
+        vacuum_time_budget_sec=cfg['vacuum_time_budget_sec'],
+        checkpoint_mode=cfg['wal_checkpoint_mode']
+    )
+    for table, count in result['deleted'].items():
+        click.echo(f"  {table}: удалено {count} (срок {retention[table]} дн.)")
+    vacuum = result['vacuum']
+    click.echo(f"auto_vacuum: {vacuum['mode']}, освобождено {vacuum['freed_bytes'] / 1024 / 1024:.1f} MB, "
+               f"свободных страниц осталось: {vacuum['free_pages_left']}")
+    if vacuum['mode'] == 'none':
+        click.echo("💡 Файл создан без auto_vacuum: выполните один раз db-maintenance --full-vacuum")
+    if result['checkpoint']:
+        click.echo(f"WAL checkpoint: {result['checkpoint']}")
+
+
+# // Chg_VAC_DIMS_1710: миграция на нормализованное хранение измерений вакансий
+@cli.command()
+@click.option('--keep-text', is_flag=True, help='Только заполнить *_key, текстовые колонки не очищать')
+@click.option('--batch-size', default=5000, help='Строк vacancies на транзакцию')
+def normalize_storage(keep_text: bool, batch_size: int):
+    """Перевести area/experience/schedule/employment/currency на справочники dim_*"""
+    
+    db = TaskDatabase()
+    result = db.normalize_vacancy_storage(drop_text=not keep_text, batch_size=batch_size)
+    click.echo(f"Ключи заполнены: {result['rows_keyed']}")
+    if not keep_text:
+        click.echo(f"Строк сжато: {result['rows_compacted']}")
+        click.echo("💡 Место в файле БД освободится после VACUUM")
+
+
+# // Chg_RAW_ZLIB_1710: миграция raw_json в сжатый BLOB
+@cli.command()
+@click.option('--batch-size', default=1000, help='Строк vacancies на транзакцию')
+def compress_raw(batch_size: int):
+    """Сжать raw_json вакансий (TEXT -> zlib BLOB)"""
+    
+    db = TaskDatabase()
+    compressed = db.compress_raw_json(batch_size=batch_size)
+    click.echo(f"Сжато строк: {compressed}")
+    click.echo("💡 Место в файле БД освободится после VACUUM")
+
+
 @cli.command()
 @click.option('--days', '-d', default=7, help='Количество дней для статистики (по умолчанию: 7)')
 @click.option('--format', '-f', 'output_format', default='table', 
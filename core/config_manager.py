@@ -117,14 +117,18 @@ class ConfigManager:
             'min_workers': dispatcher_config.get('min_workers', 1),
             'queue_max_size': dispatcher_config.get('queue_max_size', 10000),
             'chunk_size': dispatcher_config.get('chunk_size', 500),
-            'monitor_interval_sec': dispatcher_config.get('monitor_interval_sec', 10),
+            'monitor_interval_sec': dispatcher_config.get('monitor_interval_sec', 1),
+            'external_poll_interval_sec': dispatcher_config.get('external_poll_interval_sec', 10),
             'task_timeout_sec': dispatcher_config.get('default_timeout_sec', 3600),
             'health_check_interval_sec': dispatcher_config.get('health_check_interval_sec', 30),
+            'task_lease_sec': dispatcher_config.get('task_lease_sec', 60),
             'failed_task_retry_limit': dispatcher_config.get('failed_task_retry_limit', 3),
             'retry_delay_multiplier': dispatcher_config.get('retry_delay_multiplier', 2.0),
             'metrics_collection_enabled': dispatcher_config.get('metrics_collection_enabled', True),
             'metrics_retention_hours': dispatcher_config.get('metrics_retention_hours', 168),
             'priority_queue_enabled': dispatcher_config.get('priority_queue_enabled', True),
+            'type_concurrency_limits': dispatcher_config.get('type_concurrency_limits', {}),
+            'conflicting_task_types': dispatcher_config.get('conflicting_task_types', {}),
             'deadlock_detection_enabled': dispatcher_config.get('deadlock_detection_enabled', True),
             'worker_memory_limit_mb': dispatcher_config.get('worker_memory_limit_mb', 512)
         }
@@ -147,6 +151,10 @@ class ConfigManager:
             'db_table': logging_config.get('db_table', 'system_logs'),
             'db_retention_days': logging_config.get('db_retention_days', 30),
             'db_level_filter': logging_config.get('db_level_filter', 'WARNING'),
+            # // Chg_DB_LOG_ASYNC_1710: фоновая пакетная запись логов в БД
+            'db_batch_size': logging_config.get('db_batch_size', 200),
+            'db_flush_interval_ms': logging_config.get('db_flush_interval_ms', 500),
+            'db_queue_size': logging_config.get('db_queue_size', 10000),
             'console_enabled': logging_config.get('console_enabled', True),
             'console_level': logging_config.get('console_level', 'INFO'),
             'structured_format': logging_config.get('structured_format', False),
@@ -232,7 +240,14 @@ class ConfigManager:
             'auto_cleanup_enabled': cleanup_config.get('auto_cleanup_enabled', True),
             'interval_hours': cleanup_config.get('cleanup_interval_hours', 24),
             'keep_tasks_days': cleanup_config.get('keep_tasks_days', 7),
-            'keep_logs_days': cleanup_config.get('keep_logs_days', 30)
+            'keep_logs_days': cleanup_config.get('keep_logs_days', 30),
+            # // Chg_DB_MAINT_1710: сроки хранения и параметры обслуживания БД
+            'keep_system_health_days': cleanup_config.get('keep_system_health_days', 14),
+            'keep_vacancy_versions_days': cleanup_config.get('keep_vacancy_versions_days', 180),
+            'delete_batch_size': cleanup_config.get('delete_batch_size', 1000),
+            'vacuum_step_pages': cleanup_config.get('vacuum_step_pages', 512),
+            'vacuum_time_budget_sec': cleanup_config.get('vacuum_time_budget_sec', 5),
+            'wal_checkpoint_mode': cleanup_config.get('wal_checkpoint_mode', 'TRUNCATE')
         }
     
     def update_setting(self, section: str, key: str, value: Any, config_name: str = 'config_v4.json') -> bool:
@@ -0,0 +1,65 @@
+"""
+Хеш содержимого вакансии для дедупликации HH Tool v4
+
+// Chg_HASH_BLAKE2_1710: единый отпечаток для TaskDatabase (ответ HH API) и core.models.Vacancy.
+blake2b по каноническому кортежу значимых полей — без json.dumps всего словаря и без сортировки ключей.
+"""
+
+import hashlib
+from typing import Any, Dict, Iterable, Optional
+
+# Идентификатор схемы хеширования (хранится в db_meta; при смене хеши пересчитываются)
+CONTENT_HASH_SCHEME = 'blake2b-v1'
+
+# Поля отпечатка и их порядок. Соответствие ответу HH API:
+# hh_id=id, title=name, employer=employer.name, salary_*=salary.*, area=area.name,
+# requirement=snippet.requirement, responsibility=snippet.responsibility
+HASH_FIELDS = (
+    'hh_id', 'title', 'employer', 'salary_from', 'salary_to', 'currency',
+    'area', 'published_at', 'requirement', 'responsibility',
+)
+
+_SEPARATOR = b'\x1f'
+_NONE = b'\x00'
+
+
+def _encode(value: Any) -> bytes:
+    if value is None or value == '':
+        return _NONE
+    if isinstance(value, str):
+        return value.encode('utf-8')
+    return str(value).encode('utf-8')
+
+
+def fingerprint(values: Iterable[Any]) -> str:
+    """Хеш кортежа значений (None и пустая строка равнозначны)"""
+    return hashlib.blake2b(_SEPARATOR.join(_encode(v) for v in values), digest_size=16).hexdigest()
+
+
+def vacancy_fingerprint(vacancy_data: Dict[str, Any]) -> str:
+    """Хеш вакансии из ответа HH API"""
+    employer = vacancy_data.get('employer') or {}
+    salary = vacancy_data.get('salary') or {}
+    area = vacancy_data.get('area') or {}
+    snippet = vacancy_data.get('snippet') or {}
+    return fingerprint((
+        vacancy_data.get('id'),
+        vacancy_data.get('name'),
+        employer.get('name'),
+        salary.get('from'),
+        salary.get('to'),
+        salary.get('currency'),
+        area.get('name'),
+        vacancy_data.get('published_at'),
+        snippet.get('requirement'),
+        snippet.get('responsibility'),
+    ))
+
+
+def fields_fingerprint(hh_id: Any = None, title: Optional[str] = None, employer: Optional[str] = None,
+                       salary_from: Any = None, salary_to: Any = None, currency: Optional[str] = None,
+                       area: Optional[str] = None, published_at: Optional[str] = None,
+                       requirement: Optional[str] = None, responsibility: Optional[str] = None) -> str:
+    """Хеш по отдельным полям (для моделей и строк БД) — совпадает с vacancy_fingerprint"""
+    return fingerprint((hh_id, title, employer, salary_from, salary_to, currency,
+                        area, published_at, requirement, responsibility))
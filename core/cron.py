@@ -0,0 +1,214 @@
+"""
+Cron-расписания HH Tool v4
+
+// Chg_CRON_1710: разбор 5-польного cron (минута, час, день месяца, месяц, день недели)
+в битовые маски и расчёт следующего запуска прыжками по маскам — без перебора минут.
+Поддерживаются *, числа, диапазоны, шаги (*/N, A-B/N, A/N), списки, имена месяцев и дней
+(JAN-DEC, SUN-SAT), 7 = воскресенье, алиасы @hourly/@daily/@weekly/@monthly/@yearly
+и прежние шаблоны планировщика hourly/daily/weekly.
+
+Если ограничены и день месяца, и день недели, срабатывает любое из условий (как в Vixie cron).
+Время считается по часам стены: при переводе вперёд несуществующее время сдвигается на величину
+перехода, при переводе назад повторяющийся час срабатывает один раз (первое вхождение).
+"""
+
+import calendar
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, Optional
+
+_MONTH_NAMES = {name: i for i, name in enumerate(
+    ('JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC'), start=1)}
+_DOW_NAMES = {name: i for i, name in enumerate(('SUN', 'MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT'))}
+
+ALIASES = {
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+    '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@hourly': '0 * * * *',
+    # Шаблоны SchedulerDaemon до появления cron: daily — в 02:00, weekly — в воскресенье в 03:00
+    'hourly': '0 * * * *',
+    'daily': '0 2 * * *',
+    'weekly': '0 3 * * 0',
+}
+
+# (минимум, максимум, имена) по полям
+_FIELDS = (
+    (0, 59, None),
+    (0, 23, None),
+    (1, 31, None),
+    (1, 12, _MONTH_NAMES),
+    (0, 7, _DOW_NAMES),
+)
+
+# Поиск дальше этого горизонта — выражение не срабатывает никогда (например, 30 февраля)
+_MAX_YEARS_AHEAD = 8
+
+
+def _value(token: str, names: Optional[Dict[str, int]]) -> int:
+    if names and token.upper() in names:
+        return names[token.upper()]
+    return int(token)
+
+
+def _parse_field(text: str, low: int, high: int, names: Optional[Dict[str, int]]) -> int:
+    """Поле cron -> битовая маска (бит N — значение N)"""
+    mask = 0
+    for part in text.split(','):
+        if not part:
+            raise ValueError(f"empty list item in '{text}'")
+        range_part, _, step_part = part.partition('/')
+        step = int(step_part) if step_part else 1
+        if step < 1:
+            raise ValueError(f"step must be positive in '{part}'")
+        if range_part == '*':
+            start, end = low, high
+        elif '-' in range_part:
+            start_text, end_text = range_part.split('-', 1)
+            start, end = _value(start_text, names), _value(end_text, names)
+            if names is _DOW_NAMES and end == 0 < start:
+                end = 7  # SAT-SUN
+        else:
+            start = _value(range_part, names)
+            end = high if step_part else start
+        if not (low <= start <= high and low <= end <= high) or start > end:
+            raise ValueError(f"value out of range {low}-{high} in '{part}'")
+        for value in range(start, end + 1, step):
+            mask |= 1 << value
+    return mask
+
+
+def _next_bit(mask: int, start: int) -> Optional[int]:
+    """Наименьший установленный бит >= start"""
+    rest = mask >> start
+    if not rest:
+        return None
+    return start + (rest & -rest).bit_length() - 1
+
+
+class CronExpression:
+    """Скомпилированное cron-выражение; next_after() — ближайший запуск строго после момента"""
+
+    def __init__(self, expression: str):
+        self.expression = expression.strip()
+        fields = ALIASES.get(self.expression.lower(), self.expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"cron expression must have 5 fields: '{expression}'")
+        masks = [_parse_field(text, low, high, names) for text, (low, high, names) in zip(fields, _FIELDS)]
+        self.minutes, self.hours, self.days, self.months, dows = masks
+        if dows & (1 << 7):
+            dows = (dows | 1) & 0x7F
+        self.dows = dows
+        # Как в Vixie cron: поле, начинающееся с '*', считается неограниченным
+        self.dom_restricted = not fields[2].startswith('*')
+        self.dow_restricted = not fields[4].startswith('*')
+        # Маска дней недели, развёрнутая на дни месяца (бит d — день d), для каждого дня недели 1-го числа
+        self._dow_day_masks = tuple(self._expand_dows(first_dow) for first_dow in range(7))
+
+    def __repr__(self) -> str:
+        return f"CronExpression({self.expression!r})"
+
+    def _expand_dows(self, first_dow: int) -> int:
+        week = 0
+        for day in range(7):
+            if self.dows >> ((first_dow + day) % 7) & 1:
+                week |= 1 << day
+        mask = 0
+        for shift in range(0, 35, 7):
+            mask |= week << shift
+        return mask << 1
+
+    def day_mask(self, year: int, month: int) -> int:
+        """Битовая маска дней месяца, в которые выражение срабатывает"""
+        first_weekday, days_in_month = calendar.monthrange(year, month)
+        valid = (1 << (days_in_month + 1)) - 2
+        by_dow = self._dow_day_masks[(first_weekday + 1) % 7]  # monthrange: понедельник = 0
+        if self.dom_restricted and self.dow_restricted:
+            mask = self.days | by_dow
+        elif self.dow_restricted:
+            mask = by_dow
+        else:
+            mask = self.days
+        return mask & valid
+
+    def _next_wall(self, start: datetime) -> datetime:
+        """Ближайшее время стены >= start (наивное, с точностью до минуты)"""
+        year, month, day, hour, minute = start.year, start.month, start.day, start.hour, start.minute
+        limit = year + _MAX_YEARS_AHEAD
+        while year <= limit:
+            next_month = _next_bit(self.months, month)
+            if next_month is None:
+                year, month, day, hour, minute = year + 1, 1, 1, 0, 0
+                continue
+            if next_month != month:
+                month, day, hour, minute = next_month, 1, 0, 0
+
+            next_day = _next_bit(self.day_mask(year, month), day)
+            if next_day is None:
+                year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+                day, hour, minute = 1, 0, 0
+                continue
+            if next_day != day:
+                day, hour, minute = next_day, 0, 0
+
+            next_hour = _next_bit(self.hours, hour)
+            if next_hour is None:
+                rollover = datetime(year, month, day) + timedelta(days=1)
+                year, month, day, hour, minute = rollover.year, rollover.month, rollover.day, 0, 0
+                continue
+            if next_hour != hour:
+                hour, minute = next_hour, 0
+
+            next_minute = _next_bit(self.minutes, minute)
+            if next_minute is None:
+                rollover = datetime(year, month, day, hour) + timedelta(hours=1)
+                year, month, day, hour, minute = rollover.year, rollover.month, rollover.day, rollover.hour, 0
+                continue
+            return datetime(year, month, day, hour, next_minute)
+        raise ValueError(f"cron expression never fires: '{self.expression}'")
+
+    def next_after(self, after: datetime) -> datetime:
+        """
+        Следующий запуск строго после after. Наивное after — локальное время системы,
+        aware — в его часовом поясе; результат того же вида
+        """
+        tz = after.tzinfo
+        after_ts = after.timestamp()
+        wall = after.replace(tzinfo=None, second=0, microsecond=0, fold=0) + timedelta(minutes=1)
+        while True:
+            candidate = self._next_wall(wall)
+            result = _normalize(candidate, tz)
+            if result.timestamp() > after_ts:
+                return result
+            # первое вхождение повторяющегося часа уже прошло — ищем дальше
+            wall = candidate + timedelta(minutes=1)
+
+    def matches(self, moment: datetime) -> bool:
+        """Срабатывает ли выражение в минуту moment (по времени стены)"""
+        return bool(
+            self.minutes >> moment.minute & 1
+            and self.hours >> moment.hour & 1
+            and self.months >> moment.month & 1
+            and self.day_mask(moment.year, moment.month) >> moment.day & 1
+        )
+
+
+def _normalize(wall: datetime, tz) -> datetime:
+    """Время стены -> реальный момент: несуществующее время сдвигается вперёд на величину перехода"""
+    if tz is None:
+        return datetime.fromtimestamp(wall.timestamp())
+    return wall.replace(tzinfo=tz).astimezone(timezone.utc).astimezone(tz)
+
+
+@lru_cache(maxsize=128)
+def parse_cron(expression: str) -> CronExpression:
+    """Разбор с кэшем: одно выражение компилируется один раз на процесс"""
+    return CronExpression(expression)
+
+
+def next_run(expression: str, after: Optional[datetime] = None) -> datetime:
+    """Ближайший запуск по выражению после after (по умолчанию — сейчас, локальное время)"""
+    return parse_cron(expression).next_after(after or datetime.now())
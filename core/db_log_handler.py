@@ -1,24 +1,44 @@
 """
 // Chg_DB_LOG_HANDLER_2409: logging.Handler for writing logs into SQLite via TaskDatabase
+
+// Chg_DB_LOG_ASYNC_1710: emit() только ставит строку в ограниченную очередь; фоновый поток пишет
+пачками (executemany) каждые batch_size записей или flush_interval_ms. При переполнении очереди
+записи отбрасываются и учитываются в счётчике dropped — логирование не тормозит вызывающий поток.
 """
 import logging
 import json
+import queue
+import sys
+import threading
 import time
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 from .task_database import TaskDatabase
 
+_STOP = object()
+
+
 class DbLogHandler(logging.Handler):
-    def __init__(self, db_path: Optional[str] = None, level=logging.INFO):
+    def __init__(self, db_path: Optional[str] = None, level=logging.INFO,
+                 batch_size: int = 200, flush_interval_ms: int = 500, max_queue: int = 10000):
         super().__init__(level)
         self.db = TaskDatabase(db_path or "data/hh_v4.sqlite3")
         # avoid recursion: don't let this handler write its own logs
         self._logger_name = self.__class__.__name__
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(1, int(flush_interval_ms)) / 1000.0
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._counters = {'written': 0, 'dropped': 0, 'failed': 0}
+        self._counters_lock = threading.Lock()
+        self._writer = threading.Thread(target=self._run, name="DbLogWriter", daemon=True)
+        self._writer.start()
 
     def emit(self, record: logging.LogRecord) -> None:
         try:
-            # Filter out noisy modules if needed
+            # Filter out noisy modules if needed; записи самого писателя (TaskDatabase) не пишем
             if getattr(record, 'name', '').endswith('sqlite3') or record.name == self._logger_name:
                 return
+            if record.thread == self._writer.ident:
+                return
             msg = self.format(record) if self.formatter else record.getMessage()
             ctx = {
                 'process': record.process,
@@ -27,19 +47,84 @@ class DbLogHandler(logging.Handler):
                 'pathname': record.pathname,
                 'funcName': record.funcName,
             }
-            # // Chg_DB_LOG_FIX_2409: добавляем debug при ошибках записи
-            self.db._write_log_record(
-                ts=time.time(),
-                level=record.levelname,
-                module=record.name,
-                func=record.funcName or '',
-                message=msg,
-                context_json=json.dumps(ctx, ensure_ascii=False)
-            )
+            row = (record.created, record.levelname, record.name, record.funcName or '',
+                   msg, json.dumps(ctx, ensure_ascii=False))
+            try:
+                self._queue.put_nowait(row)
+            except queue.Full:
+                self._count('dropped')
+        except Exception:
+            self.handleError(record)
+
+    # --- фоновая запись ---
+
+    def _run(self) -> None:
+        batch: List[Tuple] = []
+        waiters: List[threading.Event] = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            stop = item is _STOP
+            if isinstance(item, threading.Event):
+                waiters.append(item)
+            elif item is not None and not stop:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            if batch and (len(batch) >= self.batch_size or waiters or stop or time.monotonic() >= deadline):
+                self._write(batch)
+                batch = []
+                deadline = None
+            for event in waiters:
+                event.set()
+            waiters = []
+            if stop:
+                return
+
+    def _write(self, batch: List[Tuple]) -> None:
+        try:
+            self.db.write_log_records(batch)
+            self._count('written', len(batch))
         except Exception as e:
+            self._count('failed', len(batch))
             # Never raise from logging, but try to debug
             try:
-                import sys
                 print(f"DbLogHandler error: {e}", file=sys.stderr)
-            except:
+            except Exception:
                 pass
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._counters_lock:
+            self._counters[name] += n
+
+    # --- управление ---
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Дождаться записи всего, что уже в очереди (False — не успели за timeout)"""
+        if not self._writer.is_alive():
+            return False
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self) -> None:
+        """Дописать очередь и остановить поток (вызывается и из logging.shutdown при выходе)"""
+        if self._writer.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=5.0)
+                self._writer.join(timeout=10.0)
+            except queue.Full:
+                pass
+        super().close()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Счётчики: записано, отброшено при переполнении, потеряно из-за ошибок БД, в очереди"""
+        with self._counters_lock:
+            return {**self._counters, 'queued': self._queue.qsize()}
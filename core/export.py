@@ -170,7 +170,7 @@ class VacancyExporter:
         
         # Формируем SQL запрос
         fields_str = ', '.join(sql_fields)
-        base_query = f"SELECT {fields_str} FROM vacancies"
+        base_query = f"SELECT {fields_str} FROM {self._vacancies_source()}"
         
         # Добавляем фильтры
         where_conditions = []
@@ -384,6 +384,20 @@ class VacancyExporter:
             cell.font = Font(bold=True)
             cell.fill = PatternFill(start_color='D9E1F2', end_color='D9E1F2', fill_type='solid')
     
+    def _vacancies_source(self) -> str:
+        """
+        // Chg_VAC_DIMS_1710: vacancies_compat подставляет названия area/experience/... из справочников
+        (в нормализованной схеме они не хранятся в vacancies); на старых БД — сама таблица
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                row = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'view' AND name = 'vacancies_compat'"
+                ).fetchone()
+            return 'vacancies_compat' if row else 'vacancies'
+        except sqlite3.Error:
+            return 'vacancies'
+    
     def get_export_formats(self) -> Dict[str, Dict[str, Any]]:
         """Получение доступных форматов экспорта"""
         return EXPORT_FORMATS.copy()
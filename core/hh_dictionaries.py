@@ -0,0 +1,194 @@
+"""
+Справочники HH.ru с локальным кэшем для HH Tool v4
+
+// Chg_HH_DICT_1710: /dictionaries и /areas кэшируются в таблице hh_dictionaries и обновляются
+раз в неделю (SchedulerDaemon). Поиск по справочникам читает только БД (лениво, один раз на
+справочник) и память — сетевых запросов на горячем пути нет.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .task_database import TaskDatabase
+
+# Параметры фильтра -> справочник, по которому они проверяются
+FILTER_DICTIONARY_FIELDS = {
+    'area': 'areas',
+    'experience': 'experience',
+    'employment': 'employment',
+    'schedule': 'schedule',
+}
+
+
+class HHDictionaryManager:
+    """
+    Менеджер справочников HH.ru
+    - refresh() загружает устаревшие источники (условный GET: 304 только продлевает срок)
+    - get/resolve/validate_filter работают без сети по локальному кэшу
+    """
+
+    SOURCES = {
+        'dictionaries': '/dictionaries',
+        'areas': '/areas',
+    }
+
+    def __init__(self, database: Optional[TaskDatabase] = None, fetcher=None, cache_days: float = 7):
+        self.db = database or TaskDatabase()
+        self.fetcher = fetcher
+        self.ttl_sec = float(cache_days) * 86400
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._items: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._ids_by_name: Dict[str, Dict[str, str]] = {}
+
+    # --- обновление из HH API ---
+
+    def refresh(self, force: bool = False) -> Dict[str, Any]:
+        """
+        Обновить справочники, срок актуальности которых истёк (или все при force)
+
+        Returns:
+            {'updated': {справочник: элементов}, 'not_modified': [...], 'skipped': [источники]}
+        """
+        if self.fetcher is None:
+            raise RuntimeError("HHDictionaryManager.refresh requires a fetcher")
+
+        result = {'updated': {}, 'not_modified': [], 'skipped': []}
+        expiry = self.db.get_dictionaries_expiry()
+        now = time.time()
+        for source, path in self.SOURCES.items():
+            names = [name for name in expiry if (name == 'areas') == (source == 'areas')]
+            if names and not force and min(expiry[name] for name in names) > now:
+                result['skipped'].append(source)
+                continue
+
+            # Условный запрос только при заполненном кэше: иначе 304 оставил бы справочник пустым
+            url = f"{self.fetcher.base_url}{path}"
+            data, not_modified = self.fetcher.fetch_json_if_modified(url, conditional=bool(names) and not force)
+            if not_modified:
+                self.db.extend_dictionaries(names, self.ttl_sec)
+                result['not_modified'].extend(names)
+                continue
+            if data is None:
+                self.logger.warning(f"HH dictionary source {url} returned no data")
+                continue
+
+            parsed = self._parse_areas(data) if source == 'areas' else self._parse_dictionaries(data)
+            for name, items in parsed.items():
+                result['updated'][name] = self.db.replace_dictionary(name, items, self.ttl_sec)
+
+        self.invalidate()
+        self.logger.info(f"HH dictionaries refreshed: {result['updated'] or 'no changes'}")
+        return result
+
+    @staticmethod
+    def _parse_dictionaries(data: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+        """Ответ /dictionaries -> {справочник: [{id, name, metadata}]} (у currency ключ — code)"""
+        parsed = {}
+        for name, values in (data or {}).items():
+            if not isinstance(values, list):
+                continue
+            items = []
+            for value in values:
+                if not isinstance(value, dict):
+                    continue
+                item_id = value.get('id', value.get('code'))
+                if item_id is None:
+                    continue
+                metadata = {k: v for k, v in value.items() if k not in ('id', 'name')}
+                items.append({'id': item_id, 'name': value.get('name') or '', 'metadata': metadata or None})
+            if items:
+                parsed[name] = items
+        return parsed
+
+    @staticmethod
+    def _parse_areas(data: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        """Дерево /areas -> плоский список с parent_id (обход в глубину, порядок HH сохраняется)"""
+        items = []
+        stack = list(reversed(data or []))
+        while stack:
+            area = stack.pop()
+            items.append({'id': area['id'], 'name': area.get('name') or '', 'parent_id': area.get('parent_id')})
+            stack.extend(reversed(area.get('areas') or []))
+        return {'areas': items}
+
+    # --- локальный поиск ---
+
+    def invalidate(self) -> None:
+        """Сбросить in-memory копию (следующий поиск перечитает БД)"""
+        with self._lock:
+            self._items.clear()
+            self._ids_by_name.clear()
+
+    def _load(self, name: str) -> Dict[str, Dict[str, Any]]:
+        items = self._items.get(name)
+        if items is not None:
+            return items
+        with self._lock:
+            if name not in self._items:
+                rows = self.db.get_dictionary_items(name)
+                self._items[name] = {row['id']: row for row in rows}
+                self._ids_by_name[name] = {row['name'].casefold(): row['id'] for row in rows}
+            return self._items[name]
+
+    def get_items(self, name: str) -> List[Dict[str, Any]]:
+        """Все элементы справочника"""
+        return list(self._load(name).values())
+
+    def get(self, name: str, item_id: Any) -> Optional[Dict[str, Any]]:
+        """Элемент справочника по ID"""
+        return self._load(name).get(str(item_id))
+
+    def get_name(self, name: str, item_id: Any) -> Optional[str]:
+        """Название элемента по ID"""
+        item = self.get(name, item_id)
+        return item['name'] if item else None
+
+    def resolve(self, name: str, value: Any) -> Optional[str]:
+        """ID элемента по ID или названию (без учёта регистра)"""
+        items = self._load(name)
+        if str(value) in items:
+            return str(value)
+        return self._ids_by_name.get(name, {}).get(str(value).strip().casefold())
+
+    def resolve_area(self, value: Any) -> Optional[str]:
+        """ID региона по ID или названию ("Москва" -> "1")"""
+        return self.resolve('areas', value)
+
+    def validate_filter(self, filter_params: Dict[str, Any]) -> List[str]:
+        """
+        Проверить значения фильтра по справочникам
+
+        Returns:
+            Список ошибок; справочники, которых нет в кэше, не проверяются
+        """
+        fp = filter_params.get('params', filter_params)
+        errors = []
+        for field, dictionary in FILTER_DICTIONARY_FIELDS.items():
+            if fp.get(field) in (None, '', []) or not self._load(dictionary):
+                continue
+            values = fp[field] if isinstance(fp[field], list) else [fp[field]]
+            for value in values:
+                if self.resolve(dictionary, value) is None:
+                    errors.append(f"Неизвестное значение {field}: {value!r}")
+        return errors
+
+    def normalize_filter(self, filter_params: Dict[str, Any]) -> Dict[str, Any]:
+        """Копия фильтра, где названия ("Москва", "Нет опыта") заменены на ID справочников HH"""
+        fp = dict(filter_params.get('params', filter_params))
+        for field, dictionary in FILTER_DICTIONARY_FIELDS.items():
+            if fp.get(field) in (None, '', []) or not self._load(dictionary):
+                continue
+            values = fp[field] if isinstance(fp[field], list) else [fp[field]]
+            resolved = [self.resolve(dictionary, value) or value for value in values]
+            if not isinstance(fp[field], list):
+                resolved = resolved[0]
+                # Числовые ID оставляем как в исходном фильтре
+                if isinstance(fp[field], int):
+                    continue
+            fp[field] = resolved
+        if 'params' in filter_params:
+            return {**filter_params, 'params': fp}
+        return fp
@@ -4,10 +4,11 @@ from typing import Dict, List, Any, Optional
 from datetime import datetime
 from pathlib import Path
 import hashlib
-import json
 import psutil
 import platform
 
+from .content_hash import fields_fingerprint
+
 
 @dataclass
 class Vacancy:
@@ -53,41 +54,23 @@ class Vacancy:
     
     def calculate_hash(self) -> str:
         """
-        Улучшенный хеш контента для дедупликации v4
+        Хеш контента для дедупликации v4
         
-        // Chg_HASH_1909: Enhanced content hashing with SHA256 and normalized fields
+        // Chg_HASH_BLAKE2_1710: общий с TaskDatabase отпечаток (core.content_hash):
+        // snippet_description = snippet.requirement, description = snippet.responsibility
         """
-        # Нормализованные ключевые поля для дедупликации
-        content_parts = [
-            # Основная информация
-            (self.title or "").strip().lower(),
-            (self.employer_name or "").strip().lower(),
-            
-            # Зарплатная вилка (нормализованная)
-            str(self.salary_from or 0),
-            str(self.salary_to or 0),
-            (self.currency or "RUR").upper(),
-            
-            # Условия работы
-            (self.experience or "").lower(),
-            (self.schedule or "").lower(), 
-            (self.employment or "").lower(),
-            
-            # Навыки (отсортированные)
-            json.dumps(sorted([s.strip().lower() for s in (self.key_skills or [])]), ensure_ascii=False),
-            
-            # Описание (первые 500 символов для стабильности)
-            (self.description or "")[:500].strip().lower(),
-            
-            # Локация
-            (self.area or "").strip().lower()
-        ]
-        
-        # Объединение с разделителем
-        content = "|".join(content_parts)
-        
-        # SHA256 для лучшей безопасности и меньших коллизий
-        return hashlib.sha256(content.encode('utf-8')).hexdigest()[:32]  # First 32 chars for compactness
+        return fields_fingerprint(
+            hh_id=self.hh_id,
+            title=self.title,
+            employer=self.employer_name,
+            salary_from=self.salary_from,
+            salary_to=self.salary_to,
+            currency=self.currency,
+            area=self.area_name or self.area,
+            published_at=self.published_at,
+            requirement=self.snippet_description,
+            responsibility=self.description
+        )
 
 
 @dataclass 
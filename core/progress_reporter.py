@@ -0,0 +1,144 @@
+"""
+Прогресс задач HH Tool v4
+
+// Chg_PROGRESS_THROTTLE_1710: обновления прогресса накапливаются в памяти и пишутся в tasks.progress_json
+не чаще раза в min_interval_sec (и обязательно при завершении), а не UPDATE+commit на каждую страницу.
+Каждое обновление сразу публикуется в progress_channel — веб-слой в том же процессе получает его без БД.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class ProgressChannel:
+    """In-process канал прогресса: последнее состояние по задаче и подписчики"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latest: Dict[str, Dict[str, Any]] = {}
+        self._subscribers: List[Callable[[str, Dict[str, Any]], None]] = []
+        self.logger = logging.getLogger(__name__)
+
+    def subscribe(self, callback: Callable[[str, Dict[str, Any]], None]) -> Callable[[], None]:
+        """Подписка callback(task_id, progress); возвращает функцию отписки"""
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe() -> None:
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return unsubscribe
+
+    def publish(self, task_id: str, progress: Dict[str, Any]) -> None:
+        with self._lock:
+            self._latest[task_id] = progress
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(task_id, progress)
+            except Exception as e:
+                self.logger.debug(f"progress subscriber failed: {e}")
+
+    def latest(self, task_id: Optional[str] = None) -> Dict[str, Any]:
+        """Последний прогресс задачи (или всех задач, если task_id не задан)"""
+        with self._lock:
+            if task_id is None:
+                return dict(self._latest)
+            return dict(self._latest.get(task_id) or {})
+
+    def discard(self, task_id: str) -> None:
+        """Забыть завершённую задачу: её итоговый прогресс уже в tasks.progress_json"""
+        with self._lock:
+            self._latest.pop(task_id, None)
+
+
+progress_channel = ProgressChannel()
+
+
+class ProgressReporter:
+    """
+    Прогресс одной задачи: update() — только память и канал,
+    запись в БД — из update() не чаще min_interval_sec и в close().
+    Параллельные части задачи (фильтры, срезы) пишут через update_part(): каждая в свой
+    ключ parts, поля totals на верхнем уровне — суммы по частям
+    """
+
+    def __init__(self, database, task_id: str, min_interval_sec: float = 2.0,
+                 snapshot: Optional[Callable[[], Dict[str, Any]]] = None,
+                 channel: Optional[ProgressChannel] = None,
+                 totals: Tuple[str, ...] = ()):
+        self.db = database
+        self.task_id = task_id
+        self.min_interval_sec = max(0.0, float(min_interval_sec))
+        # snapshot() вызывается только при записи в БД (например, копия self.stats загрузчика)
+        self.snapshot = snapshot
+        self.channel = channel or progress_channel
+        self.totals = tuple(totals)
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._progress: Dict[str, Any] = {}
+        self._dirty = False
+        self._last_flush: Optional[float] = None
+        self.flushes = 0
+
+    def update(self, **fields: Any) -> None:
+        self._apply(fields)
+
+    def update_part(self, part: str, **fields: Any) -> None:
+        """Прогресс одной части задачи — не затирает прогресс остальных"""
+        self._apply(fields, part)
+
+    def _apply(self, fields: Dict[str, Any], part: Optional[str] = None) -> None:
+        with self._lock:
+            if part is None:
+                self._progress.update(fields)
+            else:
+                parts = self._progress.setdefault('parts', {})
+                parts[part] = {**parts.get(part, {}), **fields}
+                for name in self.totals:
+                    self._progress[name] = sum(p.get(name, 0) for p in parts.values())
+            self._progress['timestamp'] = time.time()
+            self._dirty = True
+            progress = self._copy_progress()
+            due = self._last_flush is None or time.monotonic() - self._last_flush >= self.min_interval_sec
+        self.channel.publish(self.task_id, progress)
+        if due:
+            self.flush()
+
+    def _copy_progress(self) -> Dict[str, Any]:
+        """Копия под self._lock: parts меняются из других потоков, пока копия пишется в БД"""
+        progress = dict(self._progress)
+        if 'parts' in progress:
+            progress['parts'] = {part: dict(fields) for part, fields in progress['parts'].items()}
+        return progress
+
+    def flush(self) -> bool:
+        """Записать накопленный прогресс, если он менялся с прошлой записи"""
+        with self._lock:
+            if not self._dirty:
+                return False
+            progress = self._copy_progress()
+            self._dirty = False
+            self._last_flush = time.monotonic()
+        if self.snapshot:
+            try:
+                progress.update(self.snapshot())
+            except Exception as e:
+                self.logger.debug(f"progress snapshot failed: {e}")
+        try:
+            self.db.update_task_progress(self.task_id, progress)
+            self.flushes += 1
+            return True
+        except Exception as e:
+            self.logger.error(f"Failed to update task progress: {e}")
+            return False
+
+    def close(self, status: Optional[str] = None) -> None:
+        """Финальная запись (при завершении или ошибке задачи)"""
+        if status:
+            self.update(status=status)
+        self.flush()
+        self.channel.discard(self.task_id)
@@ -23,8 +23,12 @@ import threading
 
 # Импорт компонентов системы
 from .task_dispatcher import TaskDispatcher
-from .task_database import TaskDatabase
-from plugins.fetcher_v4 import VacancyFetcher, estimate_total_pages
+from .task_database import LeaseHeartbeat, TaskDatabase, TASK_LEASE_SEC
+from .task_queue import TimerHeap
+from .cron import parse_cron
+from .hh_dictionaries import HHDictionaryManager
+from plugins.fetcher_v4 import VacancyFetcher, estimate_search_size, HH_RESULTS_CAP, HH_MAX_PAGES
+from plugins.fetcher_async_v4 import AsyncVacancyFetcher
 from logging.handlers import RotatingFileHandler
 from core.config_manager import get_config_manager
 
@@ -37,6 +41,7 @@ class TaskType(Enum):
     SYNC_HOST2 = "sync_host2"
     ANALYZE_HOST3 = "analyze_host3"
     SYSTEM_HEALTH = "system_health"
+    REFRESH_DICTIONARIES = "refresh_dictionaries"
 
 
 class TaskStatus(Enum):
@@ -53,7 +58,7 @@ class ScheduledTask:
     """Запланированная задача"""
     task_type: TaskType
     name: str
-    schedule_pattern: str  # "hourly", "daily", "weekly", "0 */2 * * *" (cron-like)
+    schedule_pattern: str  # "hourly", "daily", "weekly" или cron "0 */2 * * *" (см. core.cron)
     enabled: bool = True
     last_run: Optional[datetime] = None
     next_run: Optional[datetime] = None
@@ -101,11 +106,23 @@ class SchedulerDaemon:
         # // Chg_V4_DB_2109: добавляем v4 БД задач/вакансий для веб-панели и загрузок
         self.db_v4 = TaskDatabase()
         self.dispatcher = TaskDispatcher(config=self.config)
+        fetcher_cfg = self.config.get('vacancy_fetcher', {})
         self.fetcher = VacancyFetcher(
-            config=self.config.get('vacancy_fetcher', {}),
-            rate_limit_delay=self.config.get('rate_limit_delay', 1.0),
+            config=fetcher_cfg,
+            # // Chg_TOKEN_BUCKET_1710: задержка берётся из секции vacancy_fetcher
+            rate_limit_delay=fetcher_cfg.get('rate_limit_delay', self.config.get('rate_limit_delay', 1.0)),
             database=self.db_v4  # сохраняем вакансии в v4 БД
         )
+        # // Chg_ASYNC_FETCHER_1710: асинхронный загрузчик, если установлен httpx; иначе — sync через to_thread
+        self.async_fetcher = None
+        if AsyncVacancyFetcher.available():
+            self.async_fetcher = AsyncVacancyFetcher(
+                config=fetcher_cfg,
+                rate_limit_delay=fetcher_cfg.get('rate_limit_delay', self.config.get('rate_limit_delay', 1.0)),
+                database=self.db_v4
+            )
+        # // Chg_HH_DICT_1710: справочники HH из локального кэша (обновление — еженедельная задача)
+        self.dictionaries = HHDictionaryManager(self.db_v4, self.fetcher)
         
         # Состояние демона
         self.running = False
@@ -115,9 +132,20 @@ class SchedulerDaemon:
         self.scheduled_tasks: Dict[str, ScheduledTask] = {}
         self.active_executions: Dict[str, TaskExecution] = {}
         self.execution_history: List[TaskExecution] = []
+        # // Chg_EVENT_SCHEDULE_1710: next_run задач в куче таймеров; цикл спит до ближайшего
+        # срока и просыпается раньше по wake() (новая задача, освободился слот, сигнал)
+        self.timers = TimerHeap()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # // Chg_TASK_LEASE_1710: строки tasks своих выполнений держим арендой; продлевает её отдельный
+        # поток (цикл демона бывает занят блокирующими шагами). Если демон упал — reclaim_expired_leases
+        # переведёт строки в failed
+        self.lease_sec = float((self.config.get('task_dispatcher') or {}).get('task_lease_sec', TASK_LEASE_SEC))
+        self.lease_owner = f"scheduler:{os.getpid()}"
+        self.lease_heartbeat = LeaseHeartbeat(self.db_v4, self.lease_owner, self.lease_sec)
         
         # Настройки
-        self.check_interval = 60  # Проверять каждую минуту
+        self.check_interval = 60  # Максимальный сон цикла без событий
         self.max_concurrent_tasks = 3
         self.history_limit = 1000
         
@@ -156,6 +184,10 @@ class SchedulerDaemon:
             params={
                 "max_pages": 200,
                 "filters_source": "config/filters.json",
+                "filters_concurrency": 3,
+                "incremental": True,
+                "split_search_space": True,
+                "slices_concurrency": 4,
                 "first_run_delay_sec": 0
             }
         ))
@@ -168,10 +200,25 @@ class SchedulerDaemon:
             enabled=True,
             timeout_minutes=30,
             params={
+                "employers_concurrency": 5,
+                "refresh_after_hours": 24,
                 "first_run_delay_sec": 15
             }
         ))
         
+        # // Chg_HH_DICT_1710: справочники HH (/dictionaries, /areas) — раз в неделю
+        self.add_task(ScheduledTask(
+            task_type=TaskType.REFRESH_DICTIONARIES,
+            name="Weekly HH Dictionaries Refresh",
+            schedule_pattern="weekly",
+            enabled=True,
+            timeout_minutes=10,
+            params={
+                "force": False,
+                "first_run_delay_sec": 10
+            }
+        ))
+        
         # Очистка данных каждые 6 часов
         self.add_task(ScheduledTask(
             task_type=TaskType.CLEANUP_DATA,
@@ -243,33 +290,39 @@ class SchedulerDaemon:
             task.next_run = datetime.now() + timedelta(seconds=first_delay)
         else:
             task.next_run = self._calculate_next_run(task.schedule_pattern)
+        self._schedule_timer(task_id, task)
         
         self.logger.info(f"Добавлена задача: {task.name} (запуск: {task.next_run})")
     
+    def _schedule_timer(self, task_id: str, task: ScheduledTask):
+        """Поставить таймер на task.next_run и разбудить основной цикл"""
+        if task.enabled and task.next_run:
+            self.timers.push(task_id, task.next_run.timestamp())
+        else:
+            self.timers.discard(task_id)
+        self.wake()
+    
+    def wake(self):
+        """Разбудить основной цикл (можно вызывать из любого потока и обработчика сигнала)"""
+        if self._loop is not None and self._wakeup is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:
+                pass  # цикл уже закрыт
+    
     def _calculate_next_run(self, pattern: str) -> datetime:
-        """Расчет времени следующего запуска"""
-        now = datetime.now()
+        """
+        Расчет времени следующего запуска
         
-        if pattern == "hourly":
-            return now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
-        elif pattern == "daily":
-            return now.replace(hour=2, minute=0, second=0, microsecond=0) + timedelta(days=1)
-        elif pattern == "weekly":
-            days_ahead = 6 - now.weekday()  # Воскресенье
-            if days_ahead <= 0:
-                days_ahead += 7
-            return now.replace(hour=3, minute=0, second=0, microsecond=0) + timedelta(days=days_ahead)
-        elif pattern.startswith("*/"):
-            # Простой парсинг для */N минут
-            minutes = int(pattern.split()[0][2:])
-            return now + timedelta(minutes=minutes)
-        elif pattern.startswith("0 */"):
-            # Парсинг для 0 */N часов
-            hours = int(pattern.split()[1][2:])
-            next_hour = (now.hour // hours + 1) * hours
-            return now.replace(hour=next_hour % 24, minute=0, second=0, microsecond=0)
-        else:
+        // Chg_CRON_1710: полноценный 5-польный cron (core.cron); hourly/daily/weekly — алиасы.
+        Прежний разбор "0 */N" после 24 часов давал время в прошлом и повторный запуск
+        """
+        now = datetime.now()
+        try:
+            return parse_cron(pattern).next_after(now)
+        except ValueError as e:
             # По умолчанию - через час
+            self.logger.error(f"Некорректное расписание '{pattern}': {e}; запуск через час")
             return now + timedelta(hours=1)
     
     async def _execute_task(self, task_id: str, task: ScheduledTask) -> TaskExecution:
@@ -293,15 +346,20 @@ class SchedulerDaemon:
                     TaskType.SYNC_HOST2: 'process_pipeline',     # Используем разрешенный тип
                     TaskType.ANALYZE_HOST3: 'process_pipeline',  # Используем разрешенный тип
                     TaskType.SYSTEM_HEALTH: 'test',             # Используем разрешенный тип
+                    TaskType.REFRESH_DICTIONARIES: 'cleanup',   # Используем разрешенный тип
                 }
                 v4_type = v4_type_map.get(task.task_type, task.task_type.value)
+                # // Chg_TASK_LEASE_1710: строка сразу running с владельцем — диспетчер не захватит её
+                # в промежутке между созданием и запуском
                 self.db_v4.create_task(
                     task_id=task_id,
                     task_type=v4_type,
                     params=task.params or {},
-                    timeout_sec=int(task.timeout_minutes) * 60
+                    timeout_sec=int(task.timeout_minutes) * 60,
+                    owner=self.lease_owner,
+                    lease_sec=self.lease_sec
                 )
-                self.db_v4.update_task_status(task_id, 'running')
+                self.lease_heartbeat.add(task_id)
             except Exception as reg_err:
                 self.logger.error(f"Ошибка регистрации v4-задачи {task_id}: {reg_err}")
             self.logger.info(f"Начало выполнения задачи: {task.name}")
@@ -320,6 +378,8 @@ class SchedulerDaemon:
                 result = await self._execute_analyze_host3(task)
             elif task.task_type == TaskType.SYSTEM_HEALTH:
                 result = await self._execute_system_health(task)
+            elif task.task_type == TaskType.REFRESH_DICTIONARIES:
+                result = await self._execute_refresh_dictionaries(task)
             else:
                 raise Exception(f"Неизвестный тип задачи: {task.task_type}")
             
@@ -334,7 +394,8 @@ class SchedulerDaemon:
             
             # Обновляем статус v4-задачи
             try:
-                self.db_v4.update_task_status(task_id, 'completed', result)
+                if not self.db_v4.update_task_status(task_id, 'completed', result, lease_owner=self.lease_owner):
+                    self.logger.warning(f"Аренда задачи {task_id} истекла до завершения; результат в tasks не записан")
             except Exception:
                 pass
             self.logger.info(f"Задача завершена успешно: {task.name}")
@@ -350,7 +411,7 @@ class SchedulerDaemon:
             self.logger.error(f"Ошибка выполнения задачи {task.name}: {e}")
             # Обновляем статус v4-задачи
             try:
-                self.db_v4.update_task_status(task_id, 'failed', {'error': str(e)})
+                self.db_v4.update_task_status(task_id, 'failed', {'error': str(e)}, lease_owner=self.lease_owner)
             except Exception:
                 pass
             
@@ -364,6 +425,7 @@ class SchedulerDaemon:
             execution.end_time = datetime.now()
             execution.duration_seconds = (execution.end_time - execution.start_time).total_seconds()
             
+            self.lease_heartbeat.discard(task_id)
             # Перемещаем из активных в историю
             if task_id in self.active_executions:
                 del self.active_executions[task_id]
@@ -379,6 +441,7 @@ class SchedulerDaemon:
                 task.next_run = self._calculate_next_run(task.schedule_pattern)
             else:
                 task.next_run = None
+            self._schedule_timer(task_id, task)
         
         return execution
     
@@ -415,39 +478,121 @@ class SchedulerDaemon:
             items = raw
 
         active_filters = [flt for flt in items if flt.get('active', flt.get('enabled', True))]
+        
+        # // Chg_HH_DICT_1710: названия регионов/опыта в фильтрах -> ID HH по локальным справочникам
+        for i, flt in enumerate(active_filters):
+            for error in self.dictionaries.validate_filter(flt):
+                self.logger.warning(f"Фильтр {flt.get('id', 'unknown')}: {error}")
+            active_filters[i] = self.dictionaries.normalize_filter(flt)
+
+        # // Chg_ASYNC_FETCHER_1710: с async-загрузчиком фильтры идут параллельно на одном event loop,
+        # общий token bucket сохраняет лимит запросов к API
+        concurrency = max(1, int(task.params.get('filters_concurrency', 1))) if self.async_fetcher else 1
+        semaphore = asyncio.Semaphore(concurrency)
+        incremental = bool(task.params.get('incremental', False))
+        split_search = bool(task.params.get('split_search_space', False))
+        slices_semaphore = asyncio.Semaphore(max(1, int(task.params.get('slices_concurrency', 1))))
+
+        async def _fetch_chunk(chunk_params: Dict[str, Any]) -> Dict[str, Any]:
+            if self.async_fetcher:
+                return await self.async_fetcher.fetch_chunk(chunk_params)
+            return await asyncio.to_thread(self.fetcher.fetch_chunk, chunk_params)
+
+        async def _fetch_slices(flt: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            """
+            // Chg_SPLIT_SEARCH_1710: выдача упёрлась в лимит HH — делим по датам публикации,
+            срезы грузим параллельно, пересечения на границах схлопывает upsert по hh_id
+            """
+            if self.async_fetcher:
+                slices = await self.async_fetcher.split_search_space(flt)
+            else:
+                slices = await asyncio.to_thread(self.fetcher.split_search_space, flt)
+            if len(slices) < 2:
+                return None
+
+            async def _fetch_slice(index: int, slice_info: Dict[str, Any]) -> Dict[str, Any]:
+                async with slices_semaphore:
+                    return await _fetch_chunk({
+                        'page_start': 0,
+                        'page_end': max(1, min(int(max_pages), int(slice_info['pages']))),
+                        'filter': slice_info['filter'],
+                        'task_id': task_id,
+                        'progress_key': f"{flt.get('id', 'unknown')}#{index}"
+                    })
 
-        # Обрабатываем каждый активный фильтр
-        for flt in active_filters:
+            results = await asyncio.gather(*(_fetch_slice(i, sl) for i, sl in enumerate(slices)))
+            merged = {
+                'loaded_count': sum(int(r.get('loaded_count', 0)) for r in results),
+                'processed_pages': sum(int(r.get('processed_pages', 0)) for r in results),
+                'errors': [e for r in results for e in r.get('errors', [])],
+                'newest_published_at': self.fetcher._newest_published(
+                    [{'published_at': r.get('newest_published_at')} for r in results], None),
+                'slices': len(slices)
+            }
+            # watermark фильтра сдвигаем один раз — после всех срезов
+            if incremental:
+                await asyncio.to_thread(self.fetcher.commit_watermark, flt.get('id'), merged)
+            return merged
+
+        async def _process_filter(flt: Dict[str, Any]) -> None:
             filter_id = flt.get('id', 'unknown')
             filter_name = flt.get('name', filter_id)
             flt_params = flt.get('params', flt)
-            self.logger.info(f"Обработка фильтра: {filter_name} ({filter_id})")
-
-            try:
-                # 3.2.3. Оценка числа страниц
+            async with semaphore:
+                self.logger.info(f"Обработка фильтра: {filter_name} ({filter_id})")
                 try:
-                    est_pages = estimate_total_pages(flt_params, self.fetcher)
-                except Exception:
-                    est_pages = 10
-                page_end = max(1, min(int(max_pages), int(est_pages)))
-
-                # 3.2.4-3.2.7. Постраничная загрузка и сохранение (через v4 БД)
-                chunk_result = await asyncio.to_thread(self.fetcher.fetch_chunk, {
-                    'page_start': 0,
-                    'page_end': page_end,
-                    'filter': flt,
-                    'task_id': task_id
-                })
-
-                stats['filters_processed'] += 1
-                stats['pages_fetched'] += int(chunk_result.get('processed_pages', 0))
-                loaded = int(chunk_result.get('loaded_count', 0))
-                stats['vacancies_found'] += loaded
-                stats['vacancies_new'] += loaded
+                    # 3.2.3. Оценка числа страниц
+                    # // Chg_WATERMARK_1710: watermark читается один раз на прогон фильтра; оценка идёт
+                    # по окну date_from=watermark — её страница 0 переиспользуется fetch_chunk
+                    watermark = await asyncio.to_thread(self.fetcher.read_watermark, filter_id) if incremental else None
+                    search_flt = self.fetcher._apply_watermark(flt, watermark) if watermark else flt
+                    search_params = search_flt.get('params', search_flt)
+                    try:
+                        if self.async_fetcher:
+                            est_pages, found = await self.async_fetcher.estimate_search_size(search_params)
+                        else:
+                            est_pages, found = await asyncio.to_thread(estimate_search_size, search_params, self.fetcher)
+                    except Exception:
+                        est_pages, found = 10, 0
+                    # // Chg_SPLIT_SEARCH_1710: глубже HH_MAX_PAGES HH отвечает 400
+                    page_end = max(1, min(int(max_pages), int(est_pages), HH_MAX_PAGES))
 
-            except Exception as e:
-                self.logger.error(f"Ошибка обработки фильтра {filter_name}: {e}")
-                continue
+                    # 3.2.4-3.2.7. Постраничная загрузка и сохранение (через v4 БД)
+                    # Выдача больше лимита HH (виден только по found: pages HH не больше HH_MAX_PAGES) делится
+                    # на окна по дате; инкрементальное окно — всегда, иначе watermark перескочит недогруженное
+                    over_cap = found > HH_RESULTS_CAP
+                    chunk_result = None
+                    if over_cap and (split_search or watermark):
+                        try:
+                            chunk_result = await _fetch_slices(search_flt)
+                        except Exception as e:
+                            self.logger.warning(f"Разбиение фильтра {filter_name} не удалось, обычная загрузка: {e}")
+                    if chunk_result is None:
+                        chunk_result = await _fetch_chunk({
+                            'page_start': 0,
+                            'page_end': page_end,
+                            'filter': flt,
+                            'task_id': task_id,
+                            # // Chg_PROGRESS_PARTS_1710: фильтры идут параллельно — прогресс у каждого свой
+                            'progress_key': filter_id,
+                            'watermark': watermark
+                        })
+                        if watermark and over_cap:
+                            self.logger.warning(f"Фильтр {filter_name}: окно с {watermark} загружено не полностью "
+                                                f"({found} > {HH_RESULTS_CAP}), watermark не сдвигаем")
+                        elif incremental:
+                            await asyncio.to_thread(self.fetcher.commit_watermark, filter_id, chunk_result)
+
+                    stats['filters_processed'] += 1
+                    stats['pages_fetched'] += int(chunk_result.get('processed_pages', 0))
+                    loaded = int(chunk_result.get('loaded_count', 0))
+                    stats['vacancies_found'] += loaded
+                    stats['vacancies_new'] += loaded
+
+                except Exception as e:
+                    self.logger.error(f"Ошибка обработки фильтра {filter_name}: {e}")
+
+        await asyncio.gather(*(_process_filter(flt) for flt in active_filters))
         
         stats['end_time'] = datetime.now().isoformat()
         stats['duration_minutes'] = (datetime.fromisoformat(stats['end_time']) - 
@@ -460,29 +605,58 @@ class SchedulerDaemon:
         
         # 3.2.8. Составление списка ID работодателей
         employer_ids = self.db_v4.get_missing_employer_ids()
+        # // Chg_HTTP_CACHE_1710: устаревшие работодатели обновляются условным GET (304 — без записи raw_json)
+        refresh_hours = task.params.get('refresh_after_hours')
+        stale_ids = set()
+        if refresh_hours:
+            stale_ids = set(self.db_v4.get_stale_employer_ids(float(refresh_hours) * 3600))
+            missing_ids = set(employer_ids)
+            employer_ids = employer_ids + [eid for eid in stale_ids if eid not in missing_ids]
         
         stats = {
             'employer_ids_found': len(employer_ids),
             'employers_processed': 0,
             'employers_new': 0,
+            'employers_not_modified': 0,
             'errors': 0
         }
         
+        # // Chg_ASYNC_FETCHER_1710: параллельные запросы работодателей на event loop
+        concurrency = max(1, int(task.params.get('employers_concurrency', 1))) if self.async_fetcher else 1
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _process_employer(employer_id: str) -> None:
+            async with semaphore:
+                try:
+                    not_modified = False
+                    if employer_id in stale_ids:
+                        if self.async_fetcher:
+                            employer_data, not_modified = await self.async_fetcher.fetch_employer_if_modified(employer_id)
+                        else:
+                            employer_data, not_modified = await asyncio.to_thread(
+                                self.fetcher.fetch_employer_if_modified, employer_id)
+                    elif self.async_fetcher:
+                        employer_data = await self.async_fetcher.fetch_employer(employer_id)
+                    else:
+                        # VacancyFetcher.fetch_employer — синхронная функция; выполняем в пуле
+                        employer_data = await asyncio.to_thread(self.fetcher.fetch_employer, employer_id)
+                    # // Chg_ASYNC_FETCHER_1710: запись в SQLite — в пуле потоков, не на event loop
+                    if not_modified:
+                        await asyncio.to_thread(self.db_v4.touch_employer, employer_id)
+                        stats['employers_not_modified'] += 1
+                    elif employer_data:
+                        saved_id = await asyncio.to_thread(self.db_v4.save_employer, employer_data)
+                        if saved_id:
+                            stats['employers_new'] += 1
+                    
+                    stats['employers_processed'] += 1
+                    
+                except Exception as e:
+                    self.logger.error(f"Ошибка загрузки работодателя {employer_id}: {e}")
+                    stats['errors'] += 1
+
         # 3.2.10-3.2.11. Запрос и сохранение работодателей
-        for employer_id in employer_ids[:100]:  # Ограничиваем пакет
-            try:
-                # VacancyFetcher.fetch_employer — синхронная функция; выполняем в пуле
-                employer_data = await asyncio.to_thread(self.fetcher.fetch_employer, employer_id)
-                if employer_data:
-                    saved_id = self.db_v4.save_employer(employer_data)
-                    if saved_id:
-                        stats['employers_new'] += 1
-                
-                stats['employers_processed'] += 1
-                
-            except Exception as e:
-                self.logger.error(f"Ошибка загрузки работодателя {employer_id}: {e}")
-                stats['errors'] += 1
+        await asyncio.gather(*(_process_employer(eid) for eid in employer_ids[:100]))  # Ограничиваем пакет
         
         return stats
     
@@ -497,15 +671,28 @@ class SchedulerDaemon:
             'database_vacuumed': False
         }
         
-        # Очистка старых записей
-        cutoff_date = datetime.now() - timedelta(days=keep_days)
-        deleted_count = self.db_v4.cleanup_old_records(cutoff_date)
-        stats['old_records_deleted'] = deleted_count
-        
-        # Вакуум БД
-        if vacuum_db:
-            self.db_v4.vacuum()
-            stats['database_vacuumed'] = True
+        # // Chg_DB_MAINT_1710: сроки хранения по таблицам из config.cleanup, пакетное удаление,
+        # incremental_vacuum и checkpoint WAL вместо полного VACUUM (он блокировал загрузку)
+        cleanup_cfg = self.config.get('cleanup', {})
+        retention = {
+            'tasks': cleanup_cfg.get('keep_tasks_days', keep_days),
+            'logs': cleanup_cfg.get('keep_logs_days', keep_days),
+            'system_health': cleanup_cfg.get('keep_system_health_days', keep_days),
+            'vacancy_versions': cleanup_cfg.get('keep_vacancy_versions_days', 180),
+        }
+        maintenance = await asyncio.to_thread(
+            self.db_v4.run_maintenance,
+            retention,
+            batch_size=cleanup_cfg.get('delete_batch_size', 1000),
+            vacuum_step_pages=cleanup_cfg.get('vacuum_step_pages', 512),
+            vacuum_time_budget_sec=cleanup_cfg.get('vacuum_time_budget_sec', 5.0) if vacuum_db else 0,
+            checkpoint_mode=cleanup_cfg.get('wal_checkpoint_mode', 'TRUNCATE')
+        )
+        stats['old_records_deleted'] = sum(maintenance['deleted'].values())
+        stats['deleted_by_table'] = maintenance['deleted']
+        stats['database_vacuumed'] = maintenance['vacuum']['freed_pages'] > 0
+        stats['freed_bytes'] = maintenance['vacuum']['freed_bytes']
+        stats['wal_checkpoint'] = maintenance['checkpoint']
         
         # Очистка временных файлов
         temp_files = list(Path('data').glob('temp_*.sqlite3'))
@@ -572,6 +759,10 @@ class SchedulerDaemon:
             'batch_size': batch_size
         }
     
+    async def _execute_refresh_dictionaries(self, task: ScheduledTask) -> Dict[str, Any]:
+        """Обновление справочников HH (устаревшие по сроку 7 дней либо все при force)"""
+        return await asyncio.to_thread(self.dictionaries.refresh, bool(task.params.get('force', False)))
+    
     async def _execute_system_health(self, task: ScheduledTask) -> Dict[str, Any]:
         """Проверка состояния системы"""
         import psutil
@@ -608,6 +799,7 @@ class SchedulerDaemon:
         """Обработчик сигналов завершения"""
         self.logger.info(f"Получен сигнал {signum}, завершение работы...")
         self.shutdown_requested = True
+        self.wake()
     
     def _start_web_panel(self):
         """Автозапуск веб-панели согласно 2.4.2 с проверкой занятого порта"""
@@ -672,6 +864,8 @@ class SchedulerDaemon:
         """Запуск демона"""
         self.logger.info("Запуск планировщика задач HH-бота v4")
         self.running = True
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
         
         # Регистрируем демон в БД
         self.db_v4.register_process(
@@ -680,16 +874,23 @@ class SchedulerDaemon:
             command_line="scheduler_daemon.py"
         )
         
+        # Строки tasks, оставшиеся от упавшего процесса, — в failed/pending
+        self.db_v4.reclaim_expired_leases()
+        
         # Автостарт веб-панели
         self._start_web_panel()
         
         while self.running and not self.shutdown_requested:
             try:
+                self._wakeup.clear()
                 # Проверяем задачи для выполнения
                 await self._check_and_execute_tasks()
                 
-                # Ожидаем следующую проверку
-                await asyncio.sleep(self.check_interval)
+                # Спим до ближайшего next_run или до wake()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self._next_wakeup_delay())
+                except asyncio.TimeoutError:
+                    pass
                 
             except Exception as e:
                 self.logger.error(f"Ошибка в основном цикле планировщика: {e}")
@@ -699,23 +900,36 @@ class SchedulerDaemon:
         await self._shutdown()
     
     async def _check_and_execute_tasks(self):
-        """Проверка и выполнение задач"""
-        now = datetime.now()
-        
-        # Проверяем каждую задачу
-        for task_id, task in list(self.scheduled_tasks.items()):
-            if not task.enabled or not task.next_run:
+        """Запуск задач, чей next_run наступил (только снятые с кучи таймеров)"""
+        started = 0
+        for task_id in self.timers.pop_due(time.time()):
+            task = self.scheduled_tasks.get(task_id)
+            if not task or not task.enabled or not task.next_run:
                 continue
             
-            # Время выполнения наступило?
-            if now >= task.next_run:
-                # Проверяем лимит одновременных задач
-                if len(self.active_executions) >= self.max_concurrent_tasks:
-                    self.logger.warning(f"Достигнут лимит одновременных задач ({self.max_concurrent_tasks}), откладываем {task.name}")
-                    continue
-                
-                # Запускаем задачу
-                asyncio.create_task(self._execute_task(task_id, task))
+            # Ещё выполняется — следующий запуск поставит _execute_task по завершении
+            if task_id in self.active_executions:
+                continue
+            
+            # Проверяем лимит одновременных задач (запущенные в этом проходе ещё не в active_executions)
+            if len(self.active_executions) + started >= self.max_concurrent_tasks:
+                self.logger.warning(f"Достигнут лимит одновременных задач ({self.max_concurrent_tasks}), откладываем {task.name}")
+                self.timers.push(task_id, task.next_run.timestamp())
+                continue
+            
+            # Запускаем задачу
+            asyncio.create_task(self._execute_task(task_id, task))
+            started += 1
+    
+    def _next_wakeup_delay(self) -> float:
+        """Сколько спать до ближайшего таймера (не дольше check_interval)"""
+        if len(self.active_executions) >= self.max_concurrent_tasks:
+            # Отложенные задачи ждут слот — его освобождение разбудит цикл
+            return self.check_interval
+        next_due = self.timers.next_due()
+        if next_due is None:
+            return self.check_interval
+        return min(self.check_interval, max(0.0, next_due - time.time()))
     
     async def _shutdown(self):
         """Корректное завершение работы"""
@@ -735,8 +949,16 @@ class SchedulerDaemon:
             execution.end_time = datetime.now()
             execution.error = "Cancelled due to daemon shutdown"
         
+        self.lease_heartbeat.stop()
+        
         # Останавливаем веб-панель
         self._stop_web_panel()
+
+        if self.async_fetcher:
+            try:
+                await self.async_fetcher.aclose()
+            except Exception:
+                pass
         
         self.running = False
         self.logger.info("Планировщик остановлен")
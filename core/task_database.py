@@ -6,13 +6,265 @@
 import sqlite3
 import json
 import time
-import hashlib
 import logging
+import zlib
 from typing import Dict, List, Optional, Any
 import uuid
+import threading
 from contextlib import contextmanager
 from datetime import datetime
 
+from .content_hash import CONTENT_HASH_SCHEME, vacancy_fingerprint
+
+
+# // Chg_VAC_DIMS_1710: справочные измерения вакансий — (текстовая колонка, ключ, таблица, путь в raw_json)
+VACANCY_DIMENSIONS = (
+    ('area', 'area_key', 'dim_areas', '$.area'),
+    ('experience', 'experience_key', 'dim_experience', '$.experience'),
+    ('schedule', 'schedule_key', 'dim_schedules', '$.schedule'),
+    ('employment', 'employment_key', 'dim_employment', '$.employment'),
+    ('currency', 'currency_key', 'dim_currencies', '$.salary.currency'),
+)
+
+
+# // Chg_STATS_CACHE_1710: срок жизни кэша get_stats (окна "за сутки" устаревают и без записей)
+STATS_CACHE_TTL_SEC = 30.0
+
+# // Chg_TASK_LEASE_1710: аренда задачи по умолчанию; владелец продлевает её heartbeat'ом,
+# просроченная аренда (процесс упал или завис) возвращает задачу в pending
+TASK_LEASE_SEC = 60.0
+
+# UPDATE ... RETURNING появился в SQLite 3.35
+_RETURNING_SUPPORTED = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
+# // Chg_DB_MAINT_1710: таблицы с хранением по сроку — (колонка времени, доп. условие)
+RETENTION_TABLES = {
+    'tasks': ('finished_at', "status IN ('completed', 'failed')"),
+    'logs': ('ts', None),
+    'system_health': ('ts', None),
+    'vacancy_versions': ('created_at', None),
+}
+
+
+# // Chg_RAW_ZLIB_1710: raw_json вакансий хранится как zlib-BLOB; старые строки — TEXT
+RAW_JSON_COMPRESS_LEVEL = 6
+
+
+def encode_raw_json(text: str) -> bytes:
+    """JSON-строка -> сжатый BLOB для vacancies.raw_json"""
+    return zlib.compress(text.encode('utf-8'), RAW_JSON_COMPRESS_LEVEL)
+
+
+def decode_raw_json(value: Any) -> Optional[str]:
+    """Значение vacancies.raw_json (BLOB или legacy TEXT) -> JSON-строка"""
+    if value is None:
+        return None
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return zlib.decompress(bytes(value)).decode('utf-8')
+    return value
+
+
+class VacancyRecord(dict):
+    """
+    Строка vacancies как dict; raw_json/raw_data распаковываются только при первом обращении
+    (в итерацию и json.dumps записи исходный payload не попадает)
+    """
+
+    _LAZY_KEYS = ('raw_json', 'raw_data')
+
+    def __init__(self, row: Any):
+        data = dict(row)
+        self._payload = data.pop('raw_json', None)
+        super().__init__(data)
+
+    def __missing__(self, key):
+        if key not in self._LAZY_KEYS or self._payload is None:
+            raise KeyError(key)
+        if 'raw_json' not in self.keys():
+            self['raw_json'] = decode_raw_json(self._payload)
+        if key == 'raw_data':
+            self['raw_data'] = json.loads(self['raw_json'])
+        return dict.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key) -> bool:
+        return dict.__contains__(self, key) or (key in self._LAZY_KEYS and self._payload is not None)
+
+
+class SQLiteConnectionPool:
+    """
+    Пул соединений SQLite: одно долгоживущее соединение на поток
+    // Chg_DB_POOL_1710: PRAGMA применяются один раз при создании соединения
+    max_connections — не больше стольких соединений одновременно (с запасом на пул потоков
+    asyncio.to_thread — до 32 — и служебные потоки); при исчерпании новый поток ждёт до timeout
+    и получает sqlite3.OperationalError
+    """
+
+    def __init__(self, db_path: str, timeout: float = 30.0, max_connections: int = 64):
+        self.db_path = db_path
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.schema_ready = False
+        # Отдельно от _lock: _create_tables берёт соединения из пула
+        self.schema_lock = threading.Lock()
+        # // Chg_VAC_DIMS_1710: общие для всех TaskDatabase этого файла ключи измерений и режим хранения
+        self.dimension_keys: Dict[tuple, int] = {}
+        self.normalized_storage = False
+        self.fts_enabled = False
+        self.stats_cache: Optional[tuple] = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # // Chg_POOL_LIMIT_1710: max_connections — жёсткий лимит; при исчерпании ждём освобождения не дольше timeout
+        self._released = threading.Condition(self._lock)
+        self._connections: Dict[int, Optional[sqlite3.Connection]] = {}
+        self._stats = {
+            'created': 0,
+            'reused': 0,
+            'closed': 0,
+            'acquired': 0
+        }
+
+    def _connect(self) -> sqlite3.Connection:
+        # check_same_thread=False: соединение закрывается из другого потока при очистке мёртвых потоков
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row  # Доступ к колонкам по имени
+
+        # Настройки производительности
+        # // Chg_DB_MAINT_1710: до journal_mode — применяется только к новому файлу БД,
+        # существующий переводится однократным vacuum() (cli_v4.py db-maintenance --full-vacuum)
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA cache_size=10000")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    def _prune_dead_threads(self) -> None:
+        """Закрыть соединения потоков, которые уже завершились (вызывать под self._lock)"""
+        alive = {t.ident for t in threading.enumerate()}
+        for ident in [i for i in self._connections if i not in alive]:
+            conn = self._connections.pop(ident)
+            try:
+                conn.close()
+            except Exception:
+                pass
+            self._stats['closed'] += 1
+
+    def _reserve_slot(self, ident: int) -> None:
+        """
+        Занять место под соединение потока; при исчерпании лимита закрываются соединения
+        завершившихся потоков, затем ждём release() не дольше timeout
+        """
+        deadline = time.monotonic() + self.timeout
+        with self._released:
+            while len(self._connections) >= self.max_connections:
+                self._prune_dead_threads()
+                if len(self._connections) < self.max_connections:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise sqlite3.OperationalError(
+                        f"connection pool exhausted: {self.max_connections} connections in use"
+                    )
+                # завершение потока не сигналит — периодически проверяем живые потоки
+                self._released.wait(min(remaining, 0.1))
+            self._connections[ident] = None
+
+    @contextmanager
+    def connection(self):
+        """Выдать соединение текущего потока; незафиксированная транзакция откатывается на выходе"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            ident = threading.get_ident()
+            self._reserve_slot(ident)
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._released:
+                    self._connections.pop(ident, None)
+                    self._released.notify()
+                raise
+            with self._lock:
+                self._connections[ident] = conn
+                self._stats['created'] += 1
+                self._stats['acquired'] += 1
+            self._local.conn = conn
+            self._local.depth = 0
+        else:
+            with self._lock:
+                self._stats['reused'] += 1
+                self._stats['acquired'] += 1
+        self._local.depth += 1
+        try:
+            yield conn
+        finally:
+            self._local.depth -= 1
+            # Поведение как у conn.close(): всё, что не закоммичено, не должно утечь в следующий вызов
+            if self._local.depth == 0 and conn.in_transaction:
+                try:
+                    conn.rollback()
+                except sqlite3.Error:
+                    pass
+
+    def release(self) -> None:
+        """Закрыть соединение текущего потока и освободить место в пуле (для потоков, завершающих работу с БД)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'depth', 0):
+            return
+        self._local.conn = None
+        with self._released:
+            self._connections.pop(threading.get_ident(), None)
+            self._stats['closed'] += 1
+            self._released.notify()
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close_all(self) -> None:
+        """Закрыть все соединения пула"""
+        with self._released:
+            for conn in self._connections.values():
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+                self._stats['closed'] += 1
+            self._connections.clear()
+            self._released.notify_all()
+        self._local = threading.local()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика пула"""
+        with self._lock:
+            return {
+                **self._stats,
+                'open_connections': len(self._connections),
+                'max_connections': self.max_connections,
+                'db_path': self.db_path
+            }
+
+
+_pools: Dict[str, SQLiteConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_connection_pool(db_path: str) -> SQLiteConnectionPool:
+    """Пул соединений, общий для всех TaskDatabase одного файла в процессе"""
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = SQLiteConnectionPool(db_path)
+            _pools[db_path] = pool
+        return pool
+
+
 class TaskDatabase:
     """
     Простая обёртка для SQLite без сложных миграций
@@ -21,7 +273,14 @@ class TaskDatabase:
     def __init__(self, db_path="data/hh_v4.sqlite3"):
         self.db_path = db_path
         self.logger = logging.getLogger(__name__)
-        self._create_tables()
+        # // Chg_DB_POOL_1710: соединения берутся из общего пула, схема создаётся один раз на процесс
+        self.pool = get_connection_pool(db_path)
+        if not self.pool.schema_ready:
+            # Конструкторы из разных потоков на холодном пуле: миграции выполняет только первый
+            with self.pool.schema_lock:
+                if not self.pool.schema_ready:
+                    self._create_tables()
+                    self.pool.schema_ready = True
     
     def register_process(self, name: str, pid: int, command_line: str = "", 
                         host: str = "localhost", port: int = None):
@@ -117,9 +376,19 @@ class TaskDatabase:
                     timeout_sec INTEGER DEFAULT 3600,
                     worker_id TEXT,
                     result_json TEXT,
-                    progress_json TEXT
+                    progress_json TEXT,
+                    lease_owner TEXT,
+                    lease_expires_at REAL,
+                    heartbeat_at REAL,
+                    attempts INTEGER DEFAULT 0
                 )
             """)
+            # // Chg_TASK_LEASE_1710: колонки аренды для существующих БД
+            task_cols = {row[1] for row in conn.execute("PRAGMA table_info(tasks)").fetchall()}
+            for column, ddl in (('lease_owner', 'TEXT'), ('lease_expires_at', 'REAL'),
+                                ('heartbeat_at', 'REAL'), ('attempts', 'INTEGER DEFAULT 0')):
+                if column not in task_cols:
+                    conn.execute(f"ALTER TABLE tasks ADD COLUMN {column} {ddl}")
             
             # // Chg_EMPLOYERS_2509: таблица работодателей (v4)
             # Создание таблицы employers (не изменяет существующую схему)
@@ -219,6 +488,13 @@ class TaskDatabase:
                 # // Chg_V4HOST2_2509: флаг синхронизации с Host2
                 if 'synced_host2' not in existing_cols:
                     conn.execute("ALTER TABLE vacancies ADD COLUMN synced_host2 INTEGER DEFAULT 0")
+                # // Chg_VAC_VERSIONS_1710: номер текущей версии (история — в vacancy_versions)
+                if 'version' not in existing_cols:
+                    conn.execute("ALTER TABLE vacancies ADD COLUMN version INTEGER DEFAULT 1")
+                # // Chg_VAC_DIMS_1710: целочисленные ключи измерений
+                for _, key_col, _, _ in VACANCY_DIMENSIONS:
+                    if key_col not in existing_cols:
+                        conn.execute(f"ALTER TABLE vacancies ADD COLUMN {key_col} INTEGER")
             except sqlite3.OperationalError:
                 # Если ALTER TABLE не поддерживается в текущем контексте — игнорируем
                 pass
@@ -230,24 +506,22 @@ class TaskDatabase:
                     vacancy_id TEXT NOT NULL,
                     plugin_name TEXT NOT NULL,
                     result_json TEXT NOT NULL,
-                    created_at REAL DEFAULT (julianday('now')),
+                    created_at REAL DEFAULT (CAST(strftime('%s','now') AS REAL)),
                     FOREIGN KEY (vacancy_id) REFERENCES vacancies (id)
                 )
             """)
             
             # Индексы для производительности
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_schedule ON tasks(schedule_at)")
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_type ON tasks(type)")
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_vacancies_hh_id ON vacancies(hh_id)")
+            # // Chg_VAC_UNIQUE_1710: hh_id уникален — дедупликация и upsert через ON CONFLICT(hh_id)
+            self._migrate_vacancies_unique_hh_id(conn)
             conn.execute("CREATE INDEX IF NOT EXISTS idx_vacancies_filter ON vacancies(filter_id)")
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_vacancies_processed ON vacancies(processed_at)")
             # // Chg_DB_INDEX_1509: индексы для новых колонок
             conn.execute("CREATE INDEX IF NOT EXISTS idx_vacancies_created ON vacancies(created_at)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_vacancies_is_processed ON vacancies(is_processed)")
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_vacancies_synced_host2 ON vacancies(synced_host2)")
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_plugin_results_vacancy ON plugin_results(vacancy_id)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_system_health_ts ON system_health(ts)")
+            # // Chg_DB_INDEX_1710: составные и частичные индексы под конкретные запросы
+            self._create_query_indexes(conn)
 
             # // Chg_DB_LOGS_2409: таблица логов централизованного логирования
             conn.execute(
@@ -264,74 +538,703 @@ class TaskDatabase:
                 """
             )
             conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_ts ON logs(ts)")
+
+            # // Chg_WATERMARK_1710: high-water mark (последний published_at) для инкрементальной загрузки
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS filter_watermarks (
+                    filter_id TEXT PRIMARY KEY,
+                    last_published_at TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+
+            # // Chg_HTTP_CACHE_1710: валидаторы HTTP-ответов (ETag/Last-Modified) для условных GET
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS http_cache (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            # // Chg_HH_DICT_1710: локальный кэш справочников HH (/dictionaries, /areas)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS hh_dictionaries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    dictionary_name TEXT NOT NULL,
+                    item_id TEXT NOT NULL,
+                    item_name TEXT NOT NULL,
+                    parent_id TEXT,
+                    metadata TEXT,
+                    cached_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    UNIQUE(dictionary_name, item_id)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_dict_expires ON hh_dictionaries(expires_at)")
+
+            # // Chg_VAC_VERSIONS_1710: история изменений вакансий — обратные дельты от следующей версии
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS vacancy_versions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    vacancy_id INTEGER NOT NULL,
+                    hh_id TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    content_hash TEXT,
+                    delta TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    UNIQUE(hh_id, version)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_vacancy_versions_created ON vacancy_versions(created_at)")
+            # История удалённой вакансии не должна достаться строке, вставленной заново с тем же hh_id
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS vacancy_versions_ad AFTER DELETE ON vacancies BEGIN
+                    DELETE FROM vacancy_versions WHERE vacancy_id = old.id;
+                END
+            """)
+
+            # // Chg_VAC_DIMS_1710: таблицы измерений и совместимое представление vacancies_compat
+            self._create_vacancy_dimensions(conn)
+
+            # // Chg_VAC_FTS_1710: полнотекстовый индекс по вакансиям
+            self._create_vacancy_fts(conn)
+
+            # // Chg_STATS_CACHE_1710: счётчики для get_stats, поддерживаемые триггерами
+            self._create_stats_counters(conn)
+
+            # // Chg_TASK_TIME_1710: все отметки времени задач — unix seconds
+            self._migrate_task_time_units(conn)
+
+            # // Chg_HASH_BLAKE2_1710: пересчёт content_hash при смене схемы (db_meta создана выше)
+            self._migrate_content_hash_scheme(conn)
+
             # // Chg_COMMIT_DDL_2509: фиксируем все DDL/ALTER изменения
             try:
                 conn.commit()
             except Exception:
                 pass
     
+    # Индексы, заменённые составными (их колонки — префикс нового индекса) или не используемые запросами
+    _SUPERSEDED_INDEXES = (
+        'idx_tasks_status', 'idx_tasks_type', 'idx_vacancies_processed', 'idx_vacancies_synced_host2',
+        'idx_plugin_results_vacancy',
+    )
+
+    def _create_query_indexes(self, conn: sqlite3.Connection) -> None:
+        """
+        Индексы под горячие запросы (проверяются EXPLAIN QUERY PLAN в tests/unit):
+        частичные индексы используются, только если WHERE запроса совпадает с условием индекса дословно
+        """
+        # get_due_tasks: status = 'pending' ORDER BY schedule_at, created_at — без сортировки
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status_schedule ON tasks(status, schedule_at, created_at)")
+        # get_pending_tasks, get_tasks(status=...): status ORDER BY created_at
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status_created ON tasks(status, created_at)")
+        # get_tasks() без статуса: ORDER BY created_at DESC (окно get_stats идёт skip-scan по idx_tasks_status_created)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_created_status ON tasks(created_at, status)")
+        # get_stats: последний запуск load_vacancies
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_tasks_type_activity
+            ON tasks(type, COALESCE(finished_at, started_at, created_at))
+        """)
+        # cleanup_old_tasks / cleanup_old_records: status IN (...) AND finished_at < ?
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status_finished ON tasks(status, finished_at)")
+        # get_unsynced_vacancy_ids: COALESCE(synced_host2,0)=0 ORDER BY created_at DESC
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_vacancies_unsynced
+            ON vacancies(created_at) WHERE COALESCE(synced_host2, 0) = 0
+        """)
+        # get_unprocessed_vacancies: processed_at IS NULL ORDER BY published_at DESC
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_vacancies_unprocessed
+            ON vacancies(published_at) WHERE processed_at IS NULL
+        """)
+        # get_unanalyzed_vacancies: LEFT JOIN по (vacancy_id, plugin_name); vacancy_id — TEXT,
+        # поэтому в запросе CAST(v.id AS TEXT), иначе SQLite строит автоматический индекс на каждый вызов
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_plugin_results_vacancy_plugin
+            ON plugin_results(vacancy_id, plugin_name)
+        """)
+        for name in self._SUPERSEDED_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+    # julianday('now') для 1970-01-01; значения меньше _JULIAN_DAY_MAX — юлианские дни, а не unix seconds
+    _JULIAN_EPOCH = 2440587.5
+    _JULIAN_DAY_MAX = 1e7
+
+    def _migrate_task_time_units(self, conn: sqlite3.Connection) -> None:
+        """
+        Перевод julianday-отметок (started_at/finished_at писались julianday('now')) в unix seconds
+        Однократно; у завершённых задач без finished_at он заполняется, чтобы их удаляла очистка
+        """
+        row = conn.execute("SELECT value FROM db_meta WHERE key = 'time_unit'").fetchone()
+        if row and row[0] == 'unix':
+            return
+        converted = 0
+        for table, columns in (('tasks', ('created_at', 'started_at', 'finished_at', 'schedule_at')),
+                               ('plugin_results', ('created_at',))):
+            for col in columns:
+                cur = conn.execute(
+                    f"UPDATE {table} SET {col} = ({col} - ?) * 86400.0 WHERE {col} < ?",
+                    (self._JULIAN_EPOCH, self._JULIAN_DAY_MAX)
+                )
+                converted += max(cur.rowcount, 0)
+        conn.execute("""
+            UPDATE tasks SET finished_at = COALESCE(started_at, created_at)
+            WHERE status IN ('completed', 'failed') AND finished_at IS NULL
+        """)
+        conn.execute("INSERT OR REPLACE INTO db_meta (key, value) VALUES ('time_unit', 'unix')")
+        conn.commit()
+        if converted:
+            self.logger.info(f"Converted {converted} julianday timestamps to unix seconds")
+
+    def _migrate_vacancies_unique_hh_id(self, conn: sqlite3.Connection) -> None:
+        """Удаление дублей hh_id и создание уникального индекса (однократно)"""
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_vacancies_hh_id_unique'"
+        ).fetchone()
+        if exists:
+            return
+        # Оставляем самую раннюю строку: на её id ссылаются plugin_results
+        cur = conn.execute("""
+            DELETE FROM vacancies
+            WHERE hh_id IS NOT NULL
+              AND id NOT IN (
+                SELECT MIN(id) FROM vacancies WHERE hh_id IS NOT NULL GROUP BY hh_id
+              )
+        """)
+        if cur.rowcount:
+            self.logger.warning(f"Removed {cur.rowcount} duplicate vacancies before adding unique hh_id index")
+        conn.execute("CREATE UNIQUE INDEX idx_vacancies_hh_id_unique ON vacancies(hh_id)")
+        # Старый неуникальный индекс стал избыточным
+        conn.execute("DROP INDEX IF EXISTS idx_vacancies_hh_id")
+
+    def _create_vacancy_dimensions(self, conn: sqlite3.Connection) -> None:
+        """Таблицы измерений, служебная db_meta и представление vacancies_compat"""
+        for _, key_col, table, _ in VACANCY_DIMENSIONS:
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    id INTEGER PRIMARY KEY,
+                    hh_id TEXT NOT NULL UNIQUE,
+                    name TEXT
+                )
+            """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_vacancies_area_key ON vacancies(area_key)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_vacancies_experience_key ON vacancies(experience_key)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS db_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        """)
+        # Представление пересоздаётся при старте: в нём все текущие колонки vacancies,
+        # а текстовые измерения берутся из справочников, если в строке их нет
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(vacancies)").fetchall()]
+        dims = {text_col: (key_col, table) for text_col, key_col, table, _ in VACANCY_DIMENSIONS}
+        select = []
+        joins = []
+        for col in columns:
+            if col in dims:
+                key_col, table = dims[col]
+                select.append(f"COALESCE(v.{col}, {table}.name) AS {col}")
+                joins.append(f"LEFT JOIN {table} ON {table}.id = v.{key_col}")
+            else:
+                select.append(f"v.{col}")
+        conn.execute("DROP VIEW IF EXISTS vacancies_compat")
+        conn.execute(
+            f"CREATE VIEW vacancies_compat AS SELECT {', '.join(select)} FROM vacancies v {' '.join(joins)}"
+        )
+        row = conn.execute("SELECT value FROM db_meta WHERE key = 'vacancy_storage'").fetchone()
+        self.pool.normalized_storage = bool(row and row[0] == 'normalized')
+
+    def _migrate_content_hash_scheme(self, conn: sqlite3.Connection, batch_size: int = 1000) -> None:
+        """
+        Пересчёт content_hash по текущей схеме (однократно при её смене)
+        Иначе после смены алгоритма каждая вакансия выглядела бы изменённой и получала лишнюю версию
+        """
+        row = conn.execute("SELECT value FROM db_meta WHERE key = 'content_hash_scheme'").fetchone()
+        if row and row[0] == CONTENT_HASH_SCHEME:
+            return
+        rehashed = 0
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                "SELECT id, raw_json FROM vacancies WHERE id > ? AND raw_json IS NOT NULL ORDER BY id LIMIT ?",
+                (last_id, batch_size)
+            ).fetchall()
+            if not rows:
+                break
+            params = []
+            for r in rows:
+                try:
+                    params.append((vacancy_fingerprint(json.loads(decode_raw_json(r['raw_json']))), r['id']))
+                except (ValueError, zlib.error):
+                    continue
+            conn.executemany("UPDATE vacancies SET content_hash = ? WHERE id = ?", params)
+            conn.commit()
+            rehashed += len(params)
+            last_id = rows[-1]['id']
+        conn.execute(
+            "INSERT OR REPLACE INTO db_meta (key, value) VALUES ('content_hash_scheme', ?)", (CONTENT_HASH_SCHEME,)
+        )
+        if rehashed:
+            self.logger.info(f"content_hash recalculated for {rehashed} vacancies ({CONTENT_HASH_SCHEME})")
+
+    # Колонки vacancies в полнотекстовом индексе (description/key_skills — snippet HH)
+    _FTS_COLUMNS = ('title', 'company', 'description', 'key_skills')
+
+    def _create_vacancy_fts(self, conn: sqlite3.Connection) -> None:
+        """
+        FTS5-индекс vacancies_fts (external content) и триггеры синхронизации
+        Без FTS5 в сборке SQLite поиск работает через LIKE
+        """
+        cols = ', '.join(self._FTS_COLUMNS)
+        new_cols = ', '.join(f"new.{c}" for c in self._FTS_COLUMNS)
+        old_cols = ', '.join(f"old.{c}" for c in self._FTS_COLUMNS)
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'vacancies_fts'"
+        ).fetchone()
+        try:
+            conn.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS vacancies_fts USING fts5(
+                    {cols},
+                    content='vacancies', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2'
+                )
+            """)
+        except sqlite3.OperationalError as e:
+            self.logger.warning(f"FTS5 unavailable, vacancy search falls back to LIKE: {e}")
+            self.pool.fts_enabled = False
+            return
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS vacancies_fts_ai AFTER INSERT ON vacancies BEGIN
+                INSERT INTO vacancies_fts(rowid, {cols}) VALUES (new.id, {new_cols});
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS vacancies_fts_ad AFTER DELETE ON vacancies BEGIN
+                INSERT INTO vacancies_fts(vacancies_fts, rowid, {cols}) VALUES ('delete', old.id, {old_cols});
+            END
+        """)
+        # Только при изменении индексируемых колонок: processed_at/synced_host2 индекс не трогают
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS vacancies_fts_au AFTER UPDATE OF {cols} ON vacancies BEGIN
+                INSERT INTO vacancies_fts(vacancies_fts, rowid, {cols}) VALUES ('delete', old.id, {old_cols});
+                INSERT INTO vacancies_fts(rowid, {cols}) VALUES (new.id, {new_cols});
+            END
+        """)
+        if not exists:
+            # Индекс по уже загруженным вакансиям
+            conn.execute("INSERT INTO vacancies_fts(vacancies_fts) VALUES ('rebuild')")
+        self.pool.fts_enabled = True
+
+    @staticmethod
+    def _fts_query(query: str) -> str:
+        """
+        Пользовательский запрос -> выражение FTS5: слова в кавычках через AND,
+        'pyth*' — поиск по префиксу; спецсимволы FTS5 ('c++', '-', ':') не ломают запрос
+        """
+        terms = []
+        for token in query.split():
+            prefix = token.endswith('*')
+            token = token.rstrip('*').replace('"', '""')
+            if token:
+                terms.append(f'"{token}"' + ('*' if prefix else ''))
+        return ' '.join(terms)
+
+    def search_vacancies(self, query: str, limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+        """
+        Полнотекстовый поиск по названию, компании и описанию вакансий
+
+        Returns:
+            {'total': int, 'items': [{id, hh_id, title, company, area, published_at, url, snippet}]}
+            items упорядочены по релевантности (bm25)
+        """
+        limit = max(1, min(int(limit), 500))
+        offset = max(0, int(offset))
+        match = self._fts_query(query or '')
+        if not match:
+            return {'total': 0, 'items': []}
+        with self.get_connection() as conn:
+            if getattr(self.pool, 'fts_enabled', False):
+                total = conn.execute(
+                    "SELECT COUNT(*) FROM vacancies_fts WHERE vacancies_fts MATCH ?", (match,)
+                ).fetchone()[0]
+                rows = conn.execute("""
+                    SELECT v.id, v.hh_id, v.title, v.company, v.area, v.published_at, v.url,
+                           snippet(vacancies_fts, -1, '[', ']', '…', 12) AS snippet
+                    FROM vacancies_fts
+                    JOIN vacancies_compat v ON v.id = vacancies_fts.rowid
+                    WHERE vacancies_fts MATCH ?
+                    ORDER BY bm25(vacancies_fts)
+                    LIMIT ? OFFSET ?
+                """, (match, limit, offset)).fetchall()
+            else:
+                words = [w.rstrip('*') for w in query.split() if w.rstrip('*')]
+                where = " AND ".join(
+                    "(title LIKE ? OR company LIKE ? OR description LIKE ? OR key_skills LIKE ?)" for _ in words
+                )
+                params = [f"%{w}%" for w in words for _ in range(4)]
+                total = conn.execute(f"SELECT COUNT(*) FROM vacancies WHERE {where}", params).fetchone()[0]
+                rows = conn.execute(f"""
+                    SELECT id, hh_id, title, company, area, published_at, url, NULL AS snippet
+                    FROM vacancies_compat WHERE {where}
+                    ORDER BY COALESCE(created_at, 0) DESC
+                    LIMIT ? OFFSET ?
+                """, params + [limit, offset]).fetchall()
+        return {'total': total, 'items': [dict(row) for row in rows]}
+
+    @staticmethod
+    def _vacancy_dimension_values(vacancy_data: Dict) -> Dict[str, Optional[tuple]]:
+        """(hh_id, name) измерений вакансии; для валюты название = код"""
+        values = {}
+        for text_col, _, _, _ in VACANCY_DIMENSIONS:
+            if text_col == 'currency':
+                code = (vacancy_data.get('salary') or {}).get('currency')
+                values[text_col] = (str(code), code) if code else None
+                continue
+            item = vacancy_data.get(text_col) or {}
+            values[text_col] = (str(item['id']), item.get('name') or '') if item.get('id') is not None else None
+        return values
+
+    def _apply_dimension_keys(self, conn: sqlite3.Connection, rows: List[Dict[str, Any]]) -> None:
+        """
+        Заполнить *_key в строках vacancies (новые значения измерений добавляются в справочники)
+        // Chg_VAC_DIMS_1710: в нормализованном режиме текстовые колонки не хранятся
+        """
+        cache = self.pool.dimension_keys
+        normalized = getattr(self.pool, 'normalized_storage', False)
+        added = False
+        for text_col, key_col, table, _ in VACANCY_DIMENSIONS:
+            missing = {}
+            for row in rows:
+                value = row['dimensions'][text_col]
+                if value and (table, value[0]) not in cache:
+                    missing[value[0]] = value[1]
+            if missing:
+                conn.executemany(
+                    f"INSERT OR IGNORE INTO {table} (hh_id, name) VALUES (?, ?)", list(missing.items())
+                )
+                ids = list(missing)
+                for i in range(0, len(ids), 500):
+                    part = ids[i:i + 500]
+                    placeholders = ",".join(["?"] * len(part))
+                    for r in conn.execute(f"SELECT id, hh_id FROM {table} WHERE hh_id IN ({placeholders})", part):
+                        cache[(table, r[1])] = r[0]
+                added = True
+            for row in rows:
+                value = row['dimensions'][text_col]
+                row[key_col] = cache.get((table, value[0])) if value else None
+                if normalized and row[key_col] is not None:
+                    row[text_col] = None
+        if added:
+            # Фиксируем справочники сразу: кэш ключей не должен ссылаться на откатанные строки
+            conn.commit()
+
+    def normalize_vacancy_storage(self, drop_text: bool = True, batch_size: int = 5000) -> Dict[str, int]:
+        """
+        Миграция на нормализованное хранение измерений вакансий
+        - ключи *_key заполняются из raw_json (id HH), справочники dim_* пополняются
+        - drop_text=True: текстовые area/experience/schedule/employment/currency обнуляются,
+          дальнейшие записи хранят только ключи; читать имена — через vacancies_compat
+
+        Returns:
+            {'rows_keyed': int, 'rows_compacted': int}
+        """
+        stats = {'rows_keyed': 0, 'rows_compacted': 0}
+        with self.get_connection() as conn:
+            for _, key_col, table, path in VACANCY_DIMENSIONS:
+                id_expr = f"CAST(json_extract(raw_json, '{path}.id') AS TEXT)" if path != '$.salary.currency' \
+                    else f"json_extract(raw_json, '{path}')"
+                name_expr = f"json_extract(raw_json, '{path}.name')" if path != '$.salary.currency' \
+                    else f"json_extract(raw_json, '{path}')"
+                conn.execute(f"""
+                    INSERT OR IGNORE INTO {table} (hh_id, name)
+                    SELECT {id_expr}, MAX({name_expr}) FROM vacancies
+                    WHERE {key_col} IS NULL AND typeof(raw_json) = 'text' AND {id_expr} IS NOT NULL
+                    GROUP BY 1
+                """)
+            conn.commit()
+
+            max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM vacancies").fetchone()[0]
+            for start in range(0, max_id + 1, batch_size):
+                end = start + batch_size - 1
+                for _, key_col, table, path in VACANCY_DIMENSIONS:
+                    id_expr = f"CAST(json_extract(vacancies.raw_json, '{path}.id') AS TEXT)" \
+                        if path != '$.salary.currency' else f"json_extract(vacancies.raw_json, '{path}')"
+                    cur = conn.execute(f"""
+                        UPDATE vacancies SET {key_col} = (SELECT id FROM {table} WHERE hh_id = {id_expr})
+                        WHERE id BETWEEN ? AND ? AND {key_col} IS NULL AND typeof(raw_json) = 'text'
+                          AND {id_expr} IS NOT NULL
+                    """, (start, end))
+                    stats['rows_keyed'] += cur.rowcount or 0
+                if drop_text:
+                    sets = ", ".join(
+                        f"{text_col} = CASE WHEN {key_col} IS NOT NULL THEN NULL ELSE {text_col} END"
+                        for text_col, key_col, _, _ in VACANCY_DIMENSIONS
+                    )
+                    cur = conn.execute(f"UPDATE vacancies SET {sets} WHERE id BETWEEN ? AND ?", (start, end))
+                    stats['rows_compacted'] += cur.rowcount or 0
+                # Короткие транзакции: не блокируем загрузчики надолго
+                conn.commit()
+
+            if drop_text:
+                conn.execute(
+                    "INSERT OR REPLACE INTO db_meta (key, value) VALUES ('vacancy_storage', 'normalized')"
+                )
+                conn.commit()
+                self.pool.normalized_storage = True
+        self.logger.info(f"normalize_vacancy_storage: {stats}")
+        return stats
+
+    def compress_raw_json(self, batch_size: int = 1000) -> int:
+        """
+        Миграция raw_json вакансий из TEXT в zlib-BLOB
+        Ключи измерений заполняются заранее — их backfill читает raw_json через json_extract
+
+        Returns:
+            Количество сжатых строк
+        """
+        self.normalize_vacancy_storage(drop_text=False)
+        compressed = 0
+        last_id = 0
+        with self.get_connection() as conn:
+            while True:
+                rows = conn.execute(
+                    "SELECT id, raw_json FROM vacancies WHERE id > ? AND typeof(raw_json) = 'text' "
+                    "ORDER BY id LIMIT ?",
+                    (last_id, batch_size)
+                ).fetchall()
+                if not rows:
+                    break
+                conn.executemany(
+                    "UPDATE vacancies SET raw_json = ? WHERE id = ?",
+                    [(encode_raw_json(row['raw_json']), row['id']) for row in rows]
+                )
+                # Короткие транзакции: не блокируем загрузчики надолго
+                conn.commit()
+                compressed += len(rows)
+                last_id = rows[-1]['id']
+        self.logger.info(f"compress_raw_json: {compressed} rows compressed")
+        return compressed
+
     @contextmanager
     def get_connection(self):
-        """Context manager для соединения с БД"""
-        conn = sqlite3.connect(self.db_path, timeout=30.0)
-        conn.row_factory = sqlite3.Row  # Доступ к колонкам по имени
-        
-        # Настройки производительности
-        conn.execute("PRAGMA journal_mode=WAL")
-        conn.execute("PRAGMA synchronous=NORMAL")
-        conn.execute("PRAGMA cache_size=10000")
-        conn.execute("PRAGMA foreign_keys=ON")
-        
-        try:
+        """Context manager для соединения с БД (из пула текущего потока)"""
+        with self.pool.connection() as conn:
             yield conn
-        finally:
-            conn.close()
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Статистика пула соединений"""
+        return self.pool.get_stats()
     
     # === МЕТОДЫ ДЛЯ ЗАДАЧ ===
     
     def create_task(self, task_id: str, task_type: str, params: Dict,
-                   schedule_at: Optional[float] = None, timeout_sec: int = 300):
-        """Создание новой задачи"""
+                   schedule_at: Optional[float] = None, timeout_sec: int = 300,
+                   owner: Optional[str] = None, lease_sec: float = TASK_LEASE_SEC):
+        """
+        Создание новой задачи
+
+        owner — задачу сразу выполняет создатель (SchedulerDaemon): строка вставляется как running
+        с арендой на lease_sec (worker_id = owner), поэтому диспетчер её не захватит. Создатель
+        продлевает аренду renew_leases; если он упал, reclaim_expired_leases переводит строку в failed —
+        в pending её не вернуть: параметры понимает только создатель, он и перезапустит задачу
+        """
         current_time = time.time()
         with self.get_connection() as conn:
             # // Chg_TASK_UPSERT_2509: защищаемся от редких коллизий id (повторные регистрации)
-            conn.execute("""
-                INSERT OR IGNORE INTO tasks (id, type, params_json, created_at, schedule_at, timeout_sec)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (task_id, task_type, json.dumps(params), current_time, schedule_at, timeout_sec))
+            if owner:
+                conn.execute("""
+                    INSERT OR IGNORE INTO tasks (id, type, params_json, created_at, schedule_at, timeout_sec,
+                                                 status, started_at, heartbeat_at, lease_owner, lease_expires_at,
+                                                 worker_id, attempts)
+                    VALUES (?, ?, ?, ?, ?, ?, 'running', ?, ?, ?, ?, ?, 1)
+                """, (task_id, task_type, json.dumps(params), current_time, schedule_at, timeout_sec,
+                      current_time, current_time, owner, current_time + lease_sec, owner))
+            else:
+                conn.execute("""
+                    INSERT OR IGNORE INTO tasks (id, type, params_json, created_at, schedule_at, timeout_sec)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (task_id, task_type, json.dumps(params), current_time, schedule_at, timeout_sec))
             conn.commit()
             
         self.logger.info(f"Created task {task_id} ({task_type})")
     
-    def update_task_status(self, task_id: str, status: str, result: Dict = None, worker_id: Optional[str] = None):
-        """Обновление статуса задачи"""
+    def update_task_status(self, task_id: str, status: str, result: Dict = None, worker_id: Optional[str] = None,
+                           lease_owner: Optional[str] = None) -> bool:
+        """
+        Обновление статуса задачи
+
+        lease_owner (для completed/failed) — записать, только если аренда всё ещё у этого владельца;
+        False — аренду уже вернули в очередь и задачу выполняет кто-то другой
+        """
+        # // Chg_TASK_TIME_1710: started_at/finished_at в unix seconds, как created_at
+        now = time.time()
         with self.get_connection() as conn:
+            if status in ('completed', 'failed') and lease_owner:
+                cursor = conn.execute("""
+                    UPDATE tasks
+                    SET status = ?, finished_at = ?, result_json = ?, lease_expires_at = NULL
+                    WHERE id = ? AND status = 'running' AND lease_owner = ?
+                """, (status, now, json.dumps(result or {}), task_id, lease_owner))
+                conn.commit()
+                return cursor.rowcount > 0
             if status == 'running':
                 # // Chg_TASK_WORKER_1509: сохраняем worker_id при старте
                 if worker_id:
                     conn.execute("""
                         UPDATE tasks 
-                        SET status = ?, started_at = julianday('now'), worker_id = ?
+                        SET status = ?, started_at = ?, worker_id = ?
                         WHERE id = ?
-                    """, (status, worker_id, task_id))
+                    """, (status, now, worker_id, task_id))
                 else:
                     conn.execute("""
                         UPDATE tasks 
-                        SET status = ?, started_at = julianday('now')
+                        SET status = ?, started_at = ?
                         WHERE id = ?
-                    """, (status, task_id))
+                    """, (status, now, task_id))
             elif status in ('completed', 'failed'):
                 conn.execute("""
                     UPDATE tasks 
-                    SET status = ?, finished_at = julianday('now'), result_json = ?
+                    SET status = ?, finished_at = ?, result_json = ?, lease_expires_at = NULL
                     WHERE id = ?
-                """, (status, json.dumps(result or {}), task_id))
+                """, (status, now, json.dumps(result or {}), task_id))
             else:
-                conn.execute("""
-                    UPDATE tasks SET status = ? WHERE id = ?
+                # Арендованную running-строку не трогаем: снятие аренды сломало бы завершение владельцем
+                cursor = conn.execute("""
+                    UPDATE tasks SET status = ?
+                    WHERE id = ? AND (status != 'running' OR lease_expires_at IS NULL)
                 """, (status, task_id))
+                conn.commit()
+                return cursor.rowcount > 0
             
             conn.commit()
+        return True
+
+    # === АРЕНДА ЗАДАЧ ===
+    # // Chg_TASK_LEASE_1710: несколько процессов-диспетчеров разбирают одну очередь в SQLite.
+    # Захват — один UPDATE ... WHERE status = 'pending' RETURNING под BEGIN IMMEDIATE: из двух
+    # процессов строку получает ровно один. Владелец продлевает аренду (renew_leases),
+    # просроченную возвращает в pending любой процесс (reclaim_expired_leases)
+
+    _CLAIM_SET = """
+        SET status = 'running', started_at = :now, heartbeat_at = :now, lease_expires_at = :expires,
+            lease_owner = :owner, worker_id = :worker, attempts = COALESCE(attempts, 0) + 1
+    """
+
+    def claim_task(self, task_id: str, owner: str, lease_sec: float = TASK_LEASE_SEC,
+                   worker_id: Optional[str] = None) -> Optional[Dict]:
+        """Захватить конкретную pending-задачу; None — её уже захватил другой процесс"""
+        return self._claim("id = :task_id", {'task_id': task_id}, owner, lease_sec, worker_id)
+
+    def claim_next_task(self, owner: str, lease_sec: float = TASK_LEASE_SEC,
+                        task_types: Optional[List[str]] = None,
+                        worker_id: Optional[str] = None) -> Optional[Dict]:
+        """Захватить ближайшую готовую pending-задачу (порядок get_due_tasks); None — очередь пуста"""
+        params: Dict[str, Any] = {}
+        type_filter = ''
+        if task_types:
+            names = [f":type{i}" for i in range(len(task_types))]
+            params.update({name[1:]: value for name, value in zip(names, task_types)})
+            type_filter = f"AND type IN ({', '.join(names)})"
+        condition = f"""
+            id = (
+                SELECT id FROM tasks
+                WHERE status = 'pending' AND (schedule_at IS NULL OR schedule_at <= :now) {type_filter}
+                ORDER BY schedule_at ASC, created_at ASC
+                LIMIT 1
+            )
+        """
+        return self._claim(condition, params, owner, lease_sec, worker_id)
+
+    def _claim(self, condition: str, params: Dict[str, Any], owner: str,
+               lease_sec: float, worker_id: Optional[str]) -> Optional[Dict]:
+        now = time.time()
+        # worker_id = lease_owner означает «выполняет создатель» (create_task(owner=...)), поэтому здесь не подставляется
+        params = {**params, 'now': now, 'expires': now + lease_sec, 'owner': owner, 'worker': worker_id}
+        with self.get_connection() as conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")
+            try:
+                if _RETURNING_SUPPORTED:
+                    row = conn.execute(
+                        f"UPDATE tasks {self._CLAIM_SET} WHERE {condition} AND status = 'pending' RETURNING *",
+                        params
+                    ).fetchone()
+                else:
+                    found = conn.execute(
+                        f"SELECT id FROM tasks WHERE {condition} AND status = 'pending'", params
+                    ).fetchone()
+                    row = None
+                    if found:
+                        conn.execute(f"UPDATE tasks {self._CLAIM_SET} WHERE id = :claimed",
+                                     {**params, 'claimed': found[0]})
+                        row = conn.execute("SELECT * FROM tasks WHERE id = ?", (found[0],)).fetchone()
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        if row is None:
+            return None
+        task = dict(row)
+        task['params'] = json.loads(task['params_json']) if task.get('params_json') else {}
+        return task
+
+    def renew_leases(self, owner: str, task_ids: List[str], lease_sec: float = TASK_LEASE_SEC) -> int:
+        """Heartbeat: продлить аренду задач владельца; возвращает число продлённых"""
+        if not task_ids:
+            return 0
+        now = time.time()
+        placeholders = ','.join('?' * len(task_ids))
+        with self.get_connection() as conn:
+            cursor = conn.execute(f"""
+                UPDATE tasks SET heartbeat_at = ?, lease_expires_at = ?
+                WHERE status = 'running' AND lease_owner = ? AND id IN ({placeholders})
+            """, (now, now + lease_sec, owner, *task_ids))
+            conn.commit()
+            return cursor.rowcount
+
+    def reclaim_expired_leases(self, max_attempts: int = 3) -> Dict[str, int]:
+        """
+        Вернуть в pending задачи с просроченной арендой; исчерпавшие max_attempts — в failed.
+        Задачи, которые выполнял их создатель (create_task(owner=...), worker_id = lease_owner), — сразу в failed.
+        Задачи без срока аренды (running до появления аренды) не трогаются
+        """
+        now = time.time()
+        error = json.dumps({'error': f'Lease expired, attempts exhausted ({max_attempts})'})
+        owner_error = json.dumps({'error': 'Lease expired, owner process stopped'})
+        with self.get_connection() as conn:
+            # Дешёвая проверка чтением (status = 'running' — единицы строк по индексу status): в простое без блокировки на запись
+            expired = conn.execute(
+                "SELECT 1 FROM tasks WHERE status = 'running' AND lease_expires_at < ? LIMIT 1", (now,)
+            ).fetchone()
+            if not expired:
+                return {'requeued': 0, 'failed': 0}
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")
+            try:
+                failed = conn.execute("""
+                    UPDATE tasks SET status = 'failed', finished_at = ?, result_json = ?, lease_expires_at = NULL
+                    WHERE status = 'running' AND lease_expires_at < ? AND worker_id = lease_owner
+                """, (now, owner_error, now)).rowcount
+                failed += conn.execute("""
+                    UPDATE tasks SET status = 'failed', finished_at = ?, result_json = ?, lease_expires_at = NULL
+                    WHERE status = 'running' AND lease_expires_at < ? AND COALESCE(attempts, 0) >= ?
+                """, (now, error, now, max_attempts)).rowcount
+                requeued = conn.execute("""
+                    UPDATE tasks
+                    SET status = 'pending', started_at = NULL, worker_id = NULL,
+                        lease_owner = NULL, lease_expires_at = NULL
+                    WHERE status = 'running' AND lease_expires_at < ?
+                """, (now,)).rowcount
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        if failed or requeued:
+            self.logger.warning(f"Expired task leases: {requeued} requeued, {failed} failed")
+        return {'requeued': requeued, 'failed': failed}
     
     def update_task_progress(self, task_id: str, progress: Dict):
         """Обновление прогресса задачи"""
@@ -363,6 +1266,23 @@ class TaskDatabase:
             
             return tasks
     
+    def get_next_schedule_at(self, after_ts: float) -> Optional[float]:
+        """Ближайший schedule_at pending-задач позже after_ts (диапазон по idx_tasks_status_schedule)"""
+        with self.get_connection() as conn:
+            row = conn.execute("""
+                SELECT MIN(schedule_at) FROM tasks
+                WHERE status = 'pending' AND schedule_at > ?
+            """, (after_ts,)).fetchone()
+            return row[0] if row else None
+
+    def get_data_version(self) -> int:
+        """
+        PRAGMA data_version соединения текущего потока: меняется после коммита
+        любого другого соединения (другой поток или процесс) — дешёвая проверка «были ли записи»
+        """
+        with self.get_connection() as conn:
+            return conn.execute("PRAGMA data_version").fetchone()[0]
+
     def get_task(self, task_id: str) -> Optional[Dict]:
         """Получение задачи по ID"""
         with self.get_connection() as conn:
@@ -396,90 +1316,176 @@ class TaskDatabase:
             
             return [dict(row) for row in cursor.fetchall()]
     
-    def get_stats(self) -> Dict:
-        """Получение статистики по задачам и вакансиям"""
-        with self.get_connection() as conn:
-            # Статистика задач за последний день
-            # // Chg_STATS_TIME_1509: сравнение по unix timestamp (created_at хранится как seconds)
-            cursor = conn.execute("""
-                SELECT 
-                    status,
-                    COUNT(*) as count
-                FROM tasks 
-                WHERE created_at > strftime('%s','now','-1 day')
-                GROUP BY status
-            """)
-            
-            task_stats = {}
-            for row in cursor.fetchall():
-                task_stats[row['status']] = row['count']
-            
-            # Статистика вакансий
-            # // Chg_STATS_TIME_1509: используем created_at и unix timestamp для "сегодня"
-            cursor = conn.execute("""
-                SELECT 
-                    COUNT(*) as total_vacancies,
-                    COUNT(CASE WHEN is_processed = 1 THEN 1 END) as processed_vacancies,
-                    COUNT(CASE WHEN created_at > strftime('%s','now','-1 day') THEN 1 END) as today_vacancies
-                FROM vacancies
+    def _create_stats_counters(self, conn: sqlite3.Connection) -> None:
+        """
+        Таблица stats_counters: итоги по вакансиям и счётчик generation,
+        который триггеры увеличивают при любой записи, влияющей на get_stats
+        """
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stats_counters'"
+        ).fetchone()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS stats_counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS vacancies_stats_ai AFTER INSERT ON vacancies BEGIN
+                UPDATE stats_counters
+                SET value = value + CASE name WHEN 'vacancies_processed' THEN COALESCE(new.is_processed, 0) = 1 ELSE 1 END
+                WHERE name IN ('vacancies_total', 'vacancies_processed', 'generation');
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS vacancies_stats_ad AFTER DELETE ON vacancies BEGIN
+                UPDATE stats_counters
+                SET value = value - CASE name WHEN 'vacancies_processed' THEN COALESCE(old.is_processed, 0) = 1 ELSE 1 END
+                WHERE name IN ('vacancies_total', 'vacancies_processed');
+                UPDATE stats_counters SET value = value + 1 WHERE name = 'generation';
+            END
+        """)
+        # UPSERT обновляет is_processed тем же значением — такие строки триггер пропускает
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS vacancies_stats_au AFTER UPDATE OF is_processed ON vacancies
+            WHEN (COALESCE(old.is_processed, 0) = 1) IS NOT (COALESCE(new.is_processed, 0) = 1) BEGIN
+                UPDATE stats_counters
+                SET value = value + CASE WHEN COALESCE(new.is_processed, 0) = 1 THEN 1 ELSE -1 END
+                WHERE name = 'vacancies_processed';
+                UPDATE stats_counters SET value = value + 1 WHERE name = 'generation';
+            END
+        """)
+        for event, columns in (('ai', 'INSERT'), ('ad', 'DELETE'),
+                               ('au', 'UPDATE OF status, started_at, finished_at')):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS tasks_stats_{event} AFTER {columns} ON tasks BEGIN
+                    UPDATE stats_counters SET value = value + 1 WHERE name = 'generation';
+                END
             """)
-            
-            vacancy_stats = dict(cursor.fetchone())
-            
-            # // Chg_VAC_ADDED_1509: метрика добавленных за последний запуск (окно 10 минут)
-            try:
-                last_row = conn.execute(
-                    """
-                    SELECT created_at, started_at, finished_at
-                    FROM tasks
-                    WHERE type = 'load_vacancies'
-                    ORDER BY COALESCE(finished_at, started_at, created_at) DESC
-                    LIMIT 1
-                    """
-                ).fetchone()
-                added_last_run = 0
-                last_run_at_iso = None
-                if last_row:
-                    created_at = last_row['created_at']  # seconds
-                    started_at = last_row['started_at']  # julian day
-                    finished_at = last_row['finished_at']  # julian day
-                    candidates = []
-                    if created_at:
-                        candidates.append(created_at)
-                    def _jd_to_sec(v):
-                        return (v - 2440587.5) * 86400.0 if v else None
-                    if started_at:
-                        st = _jd_to_sec(started_at)
-                        if st: candidates.append(st)
-                    if finished_at:
-                        ft = _jd_to_sec(finished_at)
-                        if ft: candidates.append(ft)
-                    candidates = [t for t in candidates if t]
-                    if candidates:
-                        last_ts = max(candidates)
-                        window_start = last_ts - 600.0
-                        # // Chg_VAC_ADDED_WINDOW_1509: жёсткое окно [last_ts-600, last_ts]
-                        row2 = conn.execute(
-                            "SELECT COUNT(*) AS cnt FROM vacancies WHERE created_at BETWEEN ? AND ?",
-                            (window_start, last_ts)
-                        ).fetchone()
-                        added_last_run = row2['cnt'] if row2 else 0
-                        try:
-                            last_run_at_iso = datetime.fromtimestamp(last_ts).isoformat()
-                        except Exception:
-                            last_run_at_iso = None
-                vacancy_stats['added_last_run_10m_window'] = added_last_run
-                vacancy_stats['last_run_at'] = last_run_at_iso
-            except Exception:
-                vacancy_stats['added_last_run_10m_window'] = 0
-                vacancy_stats['last_run_at'] = None
-            # // Chg_VAC_ADDED_1509 end
-            
-            return {
-                'tasks': task_stats,
-                'vacancies': vacancy_stats,
-                'timestamp': datetime.now().isoformat()
-            }
+        if not exists:
+            # Начальные значения — один полный проход по уже загруженным вакансиям
+            row = conn.execute("""
+                SELECT COUNT(*), COUNT(CASE WHEN is_processed = 1 THEN 1 END) FROM vacancies
+            """).fetchone()
+            conn.executemany(
+                "INSERT OR IGNORE INTO stats_counters (name, value) VALUES (?, ?)",
+                [('vacancies_total', row[0]), ('vacancies_processed', row[1]), ('generation', 0)]
+            )
+
+    def _read_stats_counters(self, conn: sqlite3.Connection) -> Dict[str, int]:
+        return {row['name']: row['value'] for row in conn.execute("SELECT name, value FROM stats_counters")}
+
+    def get_stats(self, max_age_sec: float = STATS_CACHE_TTL_SEC) -> Dict:
+        """
+        Получение статистики по задачам и вакансиям
+
+        // Chg_STATS_CACHE_1710: итоги по вакансиям берутся из stats_counters (O(1));
+        результат кэшируется на max_age_sec и сбрасывается, как только
+        меняется stats_counters.generation (запись в vacancies/tasks из любого процесса).
+        max_age_sec=0 — пересчитать без кэша
+        """
+        with self.get_connection() as conn:
+            counters = self._read_stats_counters(conn)
+            generation = counters.get('generation')
+            cached = self.pool.stats_cache
+            now = time.time()
+            if cached and cached[0] == generation and now - cached[1] < max_age_sec:
+                return self._copy_stats(cached[2])
+            stats = self._compute_stats(conn, counters)
+            stats['generation'] = generation
+        self.pool.stats_cache = (generation, now, stats)
+        return self._copy_stats(stats)
+
+    @staticmethod
+    def _copy_stats(stats: Dict) -> Dict:
+        """Копия для вызывающего кода (web/server.py дописывает в ответ system_info)"""
+        return {key: dict(value) if isinstance(value, dict) else value for key, value in stats.items()}
+
+    def _compute_stats(self, conn: sqlite3.Connection, counters: Dict[str, int]) -> Dict:
+        """Пересчёт get_stats: оконные метрики идут по индексам created_at"""
+        # Статистика задач за последний день
+        # // Chg_STATS_TIME_1509: сравнение по unix timestamp (created_at хранится как seconds)
+        cursor = conn.execute("""
+            SELECT 
+                status,
+                COUNT(*) as count
+            FROM tasks 
+            WHERE created_at > strftime('%s','now','-1 day')
+            GROUP BY status
+        """)
+        
+        task_stats = {}
+        for row in cursor.fetchall():
+            task_stats[row['status']] = row['count']
+        
+        # Статистика вакансий
+        # // Chg_STATS_TIME_1509: используем created_at и unix timestamp для "сегодня"
+        cursor = conn.execute("""
+            SELECT COUNT(*) as today_vacancies
+            FROM vacancies
+            WHERE created_at > strftime('%s','now','-1 day')
+        """)
+        
+        vacancy_stats = {
+            'total_vacancies': counters.get('vacancies_total', 0),
+            'processed_vacancies': counters.get('vacancies_processed', 0),
+            'today_vacancies': cursor.fetchone()['today_vacancies']
+        }
+        
+        # // Chg_VAC_ADDED_1509: метрика добавленных за последний запуск (окно 10 минут)
+        try:
+            last_row = conn.execute(
+                """
+                SELECT created_at, started_at, finished_at
+                FROM tasks
+                WHERE type = 'load_vacancies'
+                ORDER BY COALESCE(finished_at, started_at, created_at) DESC
+                LIMIT 1
+                """
+            ).fetchone()
+            added_last_run = 0
+            last_run_at_iso = None
+            if last_row:
+                # // Chg_TASK_TIME_1710: все три отметки в unix seconds
+                candidates = [t for t in (last_row['created_at'], last_row['started_at'], last_row['finished_at']) if t]
+                if candidates:
+                    last_ts = max(candidates)
+                    window_start = last_ts - 600.0
+                    # // Chg_VAC_ADDED_WINDOW_1509: жёсткое окно [last_ts-600, last_ts]
+                    row2 = conn.execute(
+                        "SELECT COUNT(*) AS cnt FROM vacancies WHERE created_at BETWEEN ? AND ?",
+                        (window_start, last_ts)
+                    ).fetchone()
+                    added_last_run = row2['cnt'] if row2 else 0
+                    try:
+                        last_run_at_iso = datetime.fromtimestamp(last_ts).isoformat()
+                    except Exception:
+                        last_run_at_iso = None
+            vacancy_stats['added_last_run_10m_window'] = added_last_run
+            vacancy_stats['last_run_at'] = last_run_at_iso
+        except Exception:
+            vacancy_stats['added_last_run_10m_window'] = 0
+            vacancy_stats['last_run_at'] = None
+        # // Chg_VAC_ADDED_1509 end
+
+        # // Chg_STATS_CACHE_1710: размер БД и число активных воркеров — в том же кэше;
+        # захват/завершение задачи меняет tasks.status и сбрасывает его через generation
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        row = conn.execute(
+            "SELECT COUNT(DISTINCT worker_id) AS cnt FROM tasks WHERE status = 'running' AND worker_id IS NOT NULL"
+        ).fetchone()
+        storage_stats = {
+            'db_size_bytes': int(page_count) * int(page_size),
+            'active_workers': row['cnt'] if row else 0
+        }
+        
+        return {
+            'tasks': task_stats,
+            'vacancies': vacancy_stats,
+            'storage': storage_stats,
+            'timestamp': datetime.now().isoformat()
+        }
 
     # // Chg_DB_LOGS_2409: внутренний метод записи строки лога в БД
     def _write_log_record(self, ts: float, level: str, module: str, func: str, message: str, context_json: Optional[str] = None) -> None:
@@ -496,43 +1502,216 @@ class TaskDatabase:
         except Exception:
             # не выбрасываем наружу, чтобы не мешать основному потоку
             pass
-    
+
+    # // Chg_DB_LOG_ASYNC_1710: пачка строк (ts, level, module, func, message, context_json) одной транзакцией
+    def write_log_records(self, rows: List[tuple]) -> None:
+        """Запись пачки логов (ошибки пробрасываются — их учитывает DbLogHandler)"""
+        with self.get_connection() as conn:
+            conn.executemany(
+                """
+                INSERT INTO logs (ts, level, module, func, message, context_json)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                rows
+            )
+            conn.commit()
+
     def cleanup_old_tasks(self, days_to_keep=7) -> Dict:
         """Очистка старых задач"""
         cutoff_time = time.time() - (days_to_keep * 24 * 3600)
         
-        with self.get_connection() as conn:
-            # Подсчитываем что будем удалять
-            cursor = conn.execute("""
-                SELECT COUNT(*) as count FROM tasks 
-                WHERE status IN ('completed', 'failed') 
-                  AND finished_at < ?
-            """, (cutoff_time,))
-            
-            count_to_delete = cursor.fetchone()['count']
-            
-            # Удаляем старые задачи
-            cursor = conn.execute("""
-                DELETE FROM tasks 
-                WHERE status IN ('completed', 'failed') 
-                  AND finished_at < ?
-            """, (cutoff_time,))
-            
-            deleted_count = cursor.rowcount
-            conn.commit()
-            
-            # VACUUM для освобождения места
-            conn.execute("VACUUM")
+        # // Chg_DB_MAINT_1710: пакетное удаление и incremental_vacuum вместо полного VACUUM,
+        # который переписывал весь файл и блокировал запись загрузчика
+        deleted_count = self.delete_expired('tasks', cutoff_time)
+        vacuum = self.incremental_vacuum()
         
         self.logger.info(f"Cleaned up {deleted_count} old tasks")
         
         return {
             'cleaned_count': deleted_count,
+            'cleaned_bytes': vacuum['freed_bytes'],
             'days_kept': days_to_keep
         }
+
+    # === ОБСЛУЖИВАНИЕ БД ===
+
+    def delete_expired(self, table: str, cutoff_ts: float, batch_size: int = 1000,
+                       pause_sec: float = 0.0) -> int:
+        """
+        Удалить строки table из RETENTION_TABLES старше cutoff_ts пакетами по batch_size
+        Каждый пакет — отдельная короткая транзакция: блокировка записи не держится на всё удаление
+        """
+        ts_col, condition = RETENTION_TABLES[table]
+        where = f"{ts_col} < ?" + (f" AND {condition}" if condition else "")
+        deleted = 0
+        while True:
+            with self.get_connection() as conn:
+                cur = conn.execute(
+                    f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} WHERE {where} LIMIT ?)",
+                    (cutoff_ts, batch_size)
+                )
+                conn.commit()
+            count = max(cur.rowcount, 0)
+            deleted += count
+            if count < batch_size:
+                return deleted
+            if pause_sec:
+                time.sleep(pause_sec)
+
+    def incremental_vacuum(self, step_pages: int = 512, time_budget_sec: float = 5.0) -> Dict[str, Any]:
+        """
+        Вернуть свободные страницы файлу шагами по step_pages, пока не кончится freelist или time_budget_sec
+        Работает при auto_vacuum=INCREMENTAL; для старых файлов без него возвращает mode='none'
+        """
+        with self.get_connection() as conn:
+            mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            free_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            free_after = free_before
+            if mode == 2:
+                deadline = time.monotonic() + time_budget_sec
+                while free_after and time.monotonic() < deadline:
+                    # executescript: в sqlite3 execute() делает один шаг прагмы — одну страницу
+                    conn.executescript(f"PRAGMA incremental_vacuum({int(step_pages)});")
+                    free_after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return {
+            'mode': {0: 'none', 1: 'full', 2: 'incremental'}.get(mode, str(mode)),
+            'freed_pages': free_before - free_after,
+            'freed_bytes': (free_before - free_after) * page_size,
+            'free_pages_left': free_after,
+        }
+
+    def checkpoint_wal(self, mode: str = 'TRUNCATE', busy_timeout_ms: int = 1000) -> Dict[str, int]:
+        """
+        PRAGMA wal_checkpoint(mode) с коротким ожиданием: при активных читателях/писателях
+        возвращает busy=1 и не ждёт (checkpoint повторится в следующем обслуживании)
+        """
+        mode = mode.upper()
+        if mode not in ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'):
+            raise ValueError(f"Unknown wal_checkpoint mode: {mode}")
+        with self.get_connection() as conn:
+            conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+            try:
+                busy, log_frames, checkpointed = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+            finally:
+                conn.execute(f"PRAGMA busy_timeout = {int(self.pool.timeout * 1000)}")
+        return {'busy': busy, 'log_frames': log_frames, 'checkpointed': checkpointed}
+
+    def run_maintenance(self, retention_days: Dict[str, float], batch_size: int = 1000,
+                        vacuum_step_pages: int = 512, vacuum_time_budget_sec: float = 5.0,
+                        checkpoint_mode: Optional[str] = 'TRUNCATE') -> Dict[str, Any]:
+        """
+        Обслуживание без блокировки загрузки: удаление по срокам хранения (таблица -> дней),
+        incremental_vacuum и checkpoint WAL
+
+        Returns:
+            {'deleted': {таблица: строк}, 'vacuum': {...}, 'checkpoint': {...} | None}
+        """
+        now = time.time()
+        deleted = {}
+        for table, days in retention_days.items():
+            if table not in RETENTION_TABLES or days is None or days <= 0:
+                continue
+            deleted[table] = self.delete_expired(table, now - float(days) * 86400, batch_size=batch_size)
+        result = {
+            'deleted': deleted,
+            'vacuum': self.incremental_vacuum(vacuum_step_pages, vacuum_time_budget_sec),
+            'checkpoint': self.checkpoint_wal(checkpoint_mode) if checkpoint_mode else None,
+        }
+        self.logger.info(f"DB maintenance: {result}")
+        return result
     
     # === МЕТОДЫ ДЛЯ ВАКАНСИЙ ===
     
+    # // Chg_VAC_BULK_1710: общий разбор вакансии для save_vacancy и save_vacancies_bulk
+    _VACANCY_COLUMNS = (
+        'hh_id', 'title', 'company', 'employer_id',
+        'salary_from', 'salary_to', 'currency',
+        'experience', 'schedule', 'employment',
+        'description', 'key_skills', 'area',
+        'published_at', 'url',
+        'filter_id', 'content_hash', 'raw_json',
+        'area_key', 'experience_key', 'schedule_key', 'employment_key', 'currency_key'
+    )
+
+    def _vacancy_row(self, vacancy_data: Dict, filter_id: str = None) -> Dict[str, Any]:
+        """Значения колонок vacancies (включая content_hash) для ответа HH API"""
+        # // Chg_HASH_BLAKE2_1710: отпечаток значимых полей без сериализации всего словаря
+        content_hash = vacancy_fingerprint(vacancy_data)
+
+        employer = vacancy_data.get('employer', {})
+        salary = vacancy_data.get('salary') or {}
+        experience = vacancy_data.get('experience', {})
+        schedule = vacancy_data.get('schedule', {})
+        employment = vacancy_data.get('employment', {})
+        snippet = vacancy_data.get('snippet', {})
+        area = vacancy_data.get('area', {})
+
+        return {
+            'hh_id': str(vacancy_data.get('id')),  # Chg_22_1509: external_id → hh_id
+            'title': vacancy_data.get('name', ''),
+            'company': employer.get('name', '') if employer else '',
+            'employer_id': str(employer.get('id', '')) if employer and employer.get('id') else None,
+            'salary_from': salary.get('from') if salary else None,
+            'salary_to': salary.get('to') if salary else None,
+            'currency': salary.get('currency') if salary else None,
+            'experience': experience.get('name', '') if experience else '',
+            'schedule': schedule.get('name', '') if schedule else '',
+            'employment': employment.get('name', '') if employment else '',
+            'description': snippet.get('responsibility', '') if snippet else '',
+            'key_skills': snippet.get('requirement', '') if snippet else '',
+            'area': area.get('name', '') if area else '',
+            'published_at': vacancy_data.get('published_at', ''),
+            'url': vacancy_data.get('alternate_url', ''),
+            'filter_id': filter_id,
+            'content_hash': content_hash,
+            'raw_json': encode_raw_json(json.dumps(vacancy_data, ensure_ascii=False)),
+            # *_key заполняет _apply_dimension_keys
+            'dimensions': self._vacancy_dimension_values(vacancy_data)
+        }
+
+    def _upsert_vacancy_params(self, row: Dict[str, Any], now_ts: float) -> tuple:
+        # processed_at по умолчанию NULL; created_at/updated_at/is_processed заполняем сразу
+        return tuple(row[c] for c in self._VACANCY_COLUMNS) + (None, now_ts, now_ts, 0)
+
+    # Вставка или обновление одним запросом. При апдейте не трогаем processed_at/created_at,
+    # а неизменённые строки (тот же content_hash) не переписываем вовсе.
+    # IS NOT вместо != : у старых строк content_hash может быть NULL
+    _UPSERT_VACANCY_SQL = """
+        INSERT INTO vacancies (
+            hh_id, title, company, employer_id,
+            salary_from, salary_to, currency,
+            experience, schedule, employment,
+            description, key_skills, area,
+            published_at, url,
+            filter_id, content_hash, raw_json,
+            area_key, experience_key, schedule_key, employment_key, currency_key,
+            processed_at, created_at, updated_at, is_processed
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(hh_id) DO UPDATE SET
+            title = excluded.title, company = excluded.company, employer_id = excluded.employer_id,
+            salary_from = excluded.salary_from, salary_to = excluded.salary_to, currency = excluded.currency,
+            experience = excluded.experience, schedule = excluded.schedule, employment = excluded.employment,
+            description = excluded.description, key_skills = excluded.key_skills, area = excluded.area,
+            published_at = excluded.published_at, url = excluded.url,
+            filter_id = excluded.filter_id, content_hash = excluded.content_hash, raw_json = excluded.raw_json,
+            area_key = excluded.area_key, experience_key = excluded.experience_key,
+            schedule_key = excluded.schedule_key, employment_key = excluded.employment_key,
+            currency_key = excluded.currency_key,
+            version = COALESCE(vacancies.version, 1) + 1,
+            updated_at = excluded.updated_at
+        WHERE vacancies.content_hash IS NOT excluded.content_hash
+    """
+
+    # // Chg_VAC_VERSIONS_1710: вставка новой строки или чтение прежней версии изменившейся — одним запросом.
+    # SET — пустое присваивание (триггеры FTS и счётчиков не срабатывают), поэтому RETURNING отдаёт
+    # строку до изменения; для неизменившейся строки WHERE ложно и RETURNING пуст
+    _INSERT_OR_PREVIOUS_VACANCY_SQL = _UPSERT_VACANCY_SQL.split('ON CONFLICT')[0] + """
+        ON CONFLICT(hh_id) DO UPDATE SET hh_id = vacancies.hh_id
+        WHERE vacancies.content_hash IS NOT excluded.content_hash
+        RETURNING id, hh_id, content_hash, raw_json, version
+    """
+
     def save_vacancy(self, vacancy_data: Dict, filter_id: str = None) -> bool:
         """
         Сохранение вакансии с дедупликацией по content_hash
@@ -541,119 +1720,44 @@ class TaskDatabase:
         try:
             # // Chg_VAC_SAVE_1509: подробное логирование входящих данных
             # // Chg_LOGVERB_2509: понижаем уровень детализации до DEBUG
-            self.logger.debug(f"save_vacancy: input={json.dumps(vacancy_data, ensure_ascii=False)[:800]}, filter_id={filter_id}")
-            self.logger.debug(f"save_vacancy: received id={vacancy_data.get('id')} filter_id={filter_id}")
-            # Создаем контент для хеширования (исключаем изменяемые поля)
-            content_for_hash = {
-                'id': vacancy_data.get('id'),
-                'name': vacancy_data.get('name'),
-                'employer': vacancy_data.get('employer', {}).get('name', ''),
-                'snippet': vacancy_data.get('snippet', {}),
-                'salary': vacancy_data.get('salary'),
-                'area': vacancy_data.get('area', {}),
-                'published_at': vacancy_data.get('published_at')
-            }
-            content_hash = hashlib.md5(json.dumps(content_for_hash, sort_keys=True).encode()).hexdigest()
-            
-            # Извлекаем данные
-            hh_id = str(vacancy_data.get('id'))  # Chg_22_1509: external_id → hh_id
-            title = vacancy_data.get('name', '')
-            employer = vacancy_data.get('employer', {})
-            company = employer.get('name', '') if employer else ''
-            employer_id = str(employer.get('id', '')) if employer and employer.get('id') else None
-            
-            salary = vacancy_data.get('salary') or {}
-            salary_from = salary.get('from') if salary else None
-            salary_to = salary.get('to') if salary else None
-            currency = salary.get('currency') if salary else None
-            
-            experience = vacancy_data.get('experience', {})
-            experience_name = experience.get('name', '') if experience else ''
-            
-            schedule = vacancy_data.get('schedule', {})
-            schedule_name = schedule.get('name', '') if schedule else ''
-            
-            employment = vacancy_data.get('employment', {})
-            employment_name = employment.get('name', '') if employment else ''
-            
-            snippet = vacancy_data.get('snippet', {})
-            description = snippet.get('responsibility', '') if snippet else ''
-            key_skills = snippet.get('requirement', '') if snippet else ''
-            
-            area = vacancy_data.get('area', {})
-            area_name = area.get('name', '') if area else ''
-            
-            published_at = vacancy_data.get('published_at', '')
-            url = vacancy_data.get('alternate_url', '')
-            
-            raw_json = json.dumps(vacancy_data, ensure_ascii=False)
+            # // Chg_HASH_BLAKE2_1710: json.dumps входа только при включённом DEBUG
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("save_vacancy: input=%.800s, filter_id=%s",
+                                  json.dumps(vacancy_data, ensure_ascii=False), filter_id)
+            row = self._vacancy_row(vacancy_data, filter_id)
+            hh_id = row['hh_id']
             
             with self.get_connection() as conn:
-                # Проверяем существование по hh_id (исправлено!)
-                cursor = conn.execute(
-                    "SELECT content_hash FROM vacancies WHERE hh_id = ?", 
-                    (hh_id,)
-                )
-                existing = cursor.fetchone()
+                self._apply_dimension_keys(conn, [row])
+                now_ts = time.time()
+                params = self._upsert_vacancy_params(row, now_ts)
+                if _RETURNING_SUPPORTED:
+                    # Новая строка вставлена (RETURNING — она сама) или получена прежняя версия изменившейся
+                    previous = conn.execute(self._INSERT_OR_PREVIOUS_VACANCY_SQL, params).fetchone()
+                    changed = previous is not None
+                    if changed and previous['content_hash'] != row['content_hash']:
+                        conn.execute(self._UPSERT_VACANCY_SQL, params)
+                        self._record_versions(conn, [previous], {hh_id: row}, now_ts)
+                else:
+                    previous = conn.execute(
+                        "SELECT id, hh_id, content_hash, raw_json, version FROM vacancies WHERE hh_id = ?", (hh_id,)
+                    ).fetchone()
+                    # // Chg_VAC_UNIQUE_1710: один INSERT ... ON CONFLICT вместо SELECT + INSERT/UPDATE
+                    # rowcount = 0, если строка уже есть и content_hash не изменился
+                    changed = conn.execute(self._UPSERT_VACANCY_SQL, params).rowcount > 0
+                    if changed and previous is not None:
+                        self._record_versions(conn, [previous], {hh_id: row}, now_ts)
+                conn.commit()
                 
-                if existing and existing['content_hash'] == content_hash:
+                if not changed:
                     # Контент не изменился
                     # // Chg_VAC_SAVE_1509: логируем пропуск без изменений
                     # // Chg_LOGVERB_2509: переводим в DEBUG
                     self.logger.debug(f"save_vacancy: skip unchanged hh_id={hh_id}")
                     return False
                 
-                current_time = time.time()
-                
-                if existing:
-                    # Обновляем существующую запись
-                    # // Chg_VAC_SAVE_1509: не трогаем processed_at при апдейте; обновляем updated_at
-                    conn.execute("""
-                        UPDATE vacancies SET
-                            title = ?, company = ?, employer_id = ?,
-                            salary_from = ?, salary_to = ?, currency = ?,
-                            experience = ?, schedule = ?, employment = ?,
-                            description = ?, key_skills = ?, area = ?,
-                            published_at = ?, url = ?, updated_at = ?,
-                            filter_id = ?, content_hash = ?, raw_json = ?
-                        WHERE hh_id = ?
-                    """, (
-                        title, company, employer_id,
-                        salary_from, salary_to, currency,
-                        experience_name, schedule_name, employment_name,
-                        description, key_skills, area_name,
-                        published_at, url, current_time,
-                        filter_id, content_hash, raw_json,
-                        hh_id
-                    ))
-                    # // Chg_LOGVERB_2509: понижаем уровень до DEBUG, чтобы INFO не засорялся
-                    self.logger.debug(f"save_vacancy: updated hh_id={hh_id}")
-                else:
-                    # Вставляем новую запись
-                    # // Chg_VAC_SAVE_1509: processed_at по умолчанию NULL; добавляем created_at/updated_at/is_processed
-                    conn.execute("""
-                        INSERT INTO vacancies (
-                            hh_id, title, company, employer_id,
-                            salary_from, salary_to, currency,
-                            experience, schedule, employment,
-                            description, key_skills, area,
-                            published_at, url, processed_at,
-                            filter_id, content_hash, raw_json,
-                            created_at, updated_at, is_processed
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        hh_id, title, company, employer_id,
-                        salary_from, salary_to, currency,
-                        experience_name, schedule_name, employment_name,
-                        description, key_skills, area_name,
-                        published_at, url, None,
-                        filter_id, content_hash, raw_json,
-                        current_time, current_time, 0
-                    ))
-                    # // Chg_LOGVERB_2509: понижаем уровень до DEBUG
-                    self.logger.debug(f"save_vacancy: inserted hh_id={hh_id}")
-                
-                conn.commit()
+                # // Chg_LOGVERB_2509: понижаем уровень до DEBUG, чтобы INFO не засорялся
+                self.logger.debug(f"save_vacancy: saved hh_id={hh_id}")
                 return True
                 
         except Exception as e:
@@ -661,12 +1765,199 @@ class TaskDatabase:
             self.logger.exception(f"save_vacancy error for hh_id={vacancy_data.get('id')}: {e}")
             print(f"Ошибка сохранения вакансии: {e}")
             return False
+
+    # // Chg_VAC_VERSIONS_1710: история версий вакансий без полных копий payload
+    @staticmethod
+    def _vacancy_delta(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+        """Обратная дельта: поля верхнего уровня, которые нужно вернуть, чтобы из new получить old"""
+        return {
+            'set': {key: value for key, value in old.items() if key not in new or new[key] != value},
+            'unset': [key for key in new if key not in old]
+        }
+
+    @staticmethod
+    def _apply_vacancy_delta(payload: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+        result = dict(payload)
+        result.update(delta.get('set', {}))
+        for key in delta.get('unset', []):
+            result.pop(key, None)
+        return result
+
+    def _record_versions(self, conn: sqlite3.Connection, previous_rows: List[Any],
+                         new_rows: Dict[str, Dict[str, Any]], now_ts: float) -> None:
+        """Записать дельты предыдущих версий изменившихся вакансий (в транзакции вызывающего)"""
+        params = []
+        for prev in previous_rows:
+            new_row = new_rows.get(prev['hh_id'])
+            if new_row is None or prev['content_hash'] == new_row['content_hash'] or prev['raw_json'] is None:
+                continue
+            old_payload = json.loads(decode_raw_json(prev['raw_json']))
+            new_payload = json.loads(decode_raw_json(new_row['raw_json']))
+            delta = self._vacancy_delta(old_payload, new_payload)
+            params.append((prev['id'], prev['hh_id'], prev['version'] or 1, prev['content_hash'],
+                           json.dumps(delta, ensure_ascii=False), now_ts))
+        if params:
+            # OR IGNORE: версия уже записана параллельным загрузчиком
+            conn.executemany("""
+                INSERT OR IGNORE INTO vacancy_versions (vacancy_id, hh_id, version, content_hash, delta, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, params)
+
+    def get_vacancy_versions(self, hh_id: str) -> List[Dict[str, Any]]:
+        """
+        История версий вакансии (от ранних к текущей)
+
+        Returns:
+            [{'version', 'content_hash', 'changed_fields', 'created_at', 'prev_version_id', 'current'}];
+            записи vacancy_versions и последней — текущая версия из vacancies (current=True).
+            Версии, удалённые по сроку хранения, в списке отсутствуют
+        """
+        with self.get_connection() as conn:
+            current = conn.execute(
+                "SELECT id, content_hash, COALESCE(version, 1) AS version, updated_at FROM vacancies WHERE hh_id = ?",
+                (str(hh_id),)
+            ).fetchone()
+            if current is None:
+                return []
+            # vacancy_id: история строки, удалённой и вставленной заново, к текущей не относится
+            rows = conn.execute(
+                "SELECT id, version, content_hash, delta, created_at FROM vacancy_versions "
+                "WHERE hh_id = ? AND vacancy_id = ? AND version < ? ORDER BY version",
+                (str(hh_id), current['id'], current['version'])
+            ).fetchall()
+        versions = []
+        prev_id = None
+        for row in rows:
+            delta = json.loads(row['delta'])
+            versions.append({
+                'version': row['version'],
+                'content_hash': row['content_hash'],
+                # поля, изменившиеся при переходе к следующей версии
+                'changed_fields': sorted(set(delta.get('set', {})) | set(delta.get('unset', []))),
+                'created_at': row['created_at'],
+                'prev_version_id': prev_id,
+                'current': False
+            })
+            prev_id = row['id']
+        versions.append({
+            'version': current['version'],
+            'content_hash': current['content_hash'],
+            'changed_fields': [],
+            'created_at': current['updated_at'],
+            'prev_version_id': prev_id,
+            'current': True
+        })
+        return versions
+
+    def reconstruct_vacancy_version(self, hh_id: str, version: int) -> Optional[Dict[str, Any]]:
+        """
+        Payload вакансии HH в указанной версии (текущий raw_json + обратные дельты).
+        None — версии нет или в цепочке дельт разрыв (удалены по сроку хранения, остались от удалённой строки)
+        """
+        with self.get_connection() as conn:
+            current = conn.execute(
+                "SELECT id, raw_json, COALESCE(version, 1) AS version FROM vacancies WHERE hh_id = ?", (str(hh_id),)
+            ).fetchone()
+            if current is None or current['raw_json'] is None or not 1 <= version <= current['version']:
+                return None
+            deltas = conn.execute(
+                "SELECT version, delta FROM vacancy_versions "
+                "WHERE hh_id = ? AND vacancy_id = ? AND version >= ? AND version < ? ORDER BY version DESC",
+                (str(hh_id), current['id'], version, current['version'])
+            ).fetchall()
+        # Без непрерывной цепочки дельт версию точно не восстановить
+        if [row['version'] for row in deltas] != list(range(current['version'] - 1, version - 1, -1)):
+            self.logger.warning(f"reconstruct_vacancy_version: incomplete history for hh_id={hh_id}")
+            return None
+        payload = json.loads(decode_raw_json(current['raw_json']))
+        for row in deltas:
+            payload = self._apply_vacancy_delta(payload, json.loads(row['delta']))
+        return payload
+
+    def save_vacancies_bulk(self, items: List[Dict], filter_id: str = None) -> Dict[str, int]:
+        """
+        Пакетное сохранение страницы вакансий одной транзакцией
+        // Chg_VAC_BULK_1710: один SELECT ... IN (...) по hh_id, executemany upsert и один commit
+
+        Returns:
+            {'new': int, 'updated': int, 'unchanged': int, 'errors': int}
+        """
+        result = {'new': 0, 'updated': 0, 'unchanged': 0, 'errors': 0}
+        rows: Dict[str, Dict[str, Any]] = {}
+        for vacancy_data in items or []:
+            try:
+                row = self._vacancy_row(vacancy_data, filter_id)
+            except Exception as e:
+                self.logger.error(f"save_vacancies_bulk: bad item id={vacancy_data.get('id') if isinstance(vacancy_data, dict) else None}: {e}")
+                result['errors'] += 1
+                continue
+            if row['hh_id'] in rows:
+                # Дубликат внутри страницы — сохраняем последнюю версию
+                result['unchanged'] += 1
+            rows[row['hh_id']] = row
+        if not rows:
+            return result
+
+        try:
+            with self.get_connection() as conn:
+                existing: Dict[str, str] = {}
+                hh_ids = list(rows)
+                # SQLite ограничивает число параметров запроса — режем на части
+                for i in range(0, len(hh_ids), 500):
+                    part = hh_ids[i:i + 500]
+                    placeholders = ",".join(["?"] * len(part))
+                    cur = conn.execute(
+                        f"SELECT hh_id, content_hash FROM vacancies WHERE hh_id IN ({placeholders})",
+                        part
+                    )
+                    existing.update({r['hh_id']: r['content_hash'] for r in cur.fetchall()})
+
+                now_ts = time.time()
+                changed = []
+                new_count = updated_count = unchanged_count = 0
+                for hh_id, row in rows.items():
+                    if hh_id not in existing:
+                        new_count += 1
+                    elif existing[hh_id] != row['content_hash']:
+                        updated_count += 1
+                    else:
+                        unchanged_count += 1
+                        continue
+                    changed.append(row)
+
+                # Старые payload'ы изменившихся вакансий — для дельт vacancy_versions
+                previous = []
+                updated_ids = [row['hh_id'] for row in changed if row['hh_id'] in existing]
+                for i in range(0, len(updated_ids), 500):
+                    part = updated_ids[i:i + 500]
+                    placeholders = ",".join(["?"] * len(part))
+                    previous.extend(conn.execute(
+                        f"SELECT id, hh_id, content_hash, raw_json, version FROM vacancies WHERE hh_id IN ({placeholders})",
+                        part
+                    ).fetchall())
+
+                # Upsert, а не INSERT: строка могла появиться от параллельного загрузчика после SELECT
+                if changed:
+                    self._apply_dimension_keys(conn, changed)
+                    conn.executemany(self._UPSERT_VACANCY_SQL,
+                                     [self._upsert_vacancy_params(row, now_ts) for row in changed])
+                    self._record_versions(conn, previous, rows, now_ts)
+                conn.commit()
+                result['new'] += new_count
+                result['updated'] += updated_count
+                result['unchanged'] += unchanged_count
+        except Exception as e:
+            self.logger.exception(f"save_vacancies_bulk error (filter_id={filter_id}, items={len(rows)}): {e}")
+            result['errors'] += len(rows)
+
+        self.logger.debug(f"save_vacancies_bulk: filter_id={filter_id} {result}")
+        return result
     
     def get_unprocessed_vacancies(self, limit: int = 100) -> List[Dict]:
         """Получение необработанных вакансий для pipeline"""
         with self.get_connection() as conn:
             cursor = conn.execute("""
-                SELECT * FROM vacancies 
+                SELECT * FROM vacancies_compat
                 WHERE processed_at IS NULL 
                 ORDER BY published_at DESC 
                 LIMIT ?
@@ -674,9 +1965,8 @@ class TaskDatabase:
         
             vacancies = []
             for row in cursor.fetchall():
-                vacancy = dict(row)
-                if vacancy['raw_json']:
-                    vacancy['raw_data'] = json.loads(vacancy['raw_json'])
+                # // Chg_RAW_ZLIB_1710: raw_data распаковывается лениво, при обращении
+                vacancy = VacancyRecord(row)
                 if vacancy['key_skills']:
                     vacancy['key_skills_list'] = json.loads(vacancy['key_skills'])
                 vacancies.append(vacancy)
@@ -690,7 +1980,7 @@ class TaskDatabase:
             cursor = conn.execute(
                 """
                 SELECT id, hh_id, title, company, area, published_at, url, filter_id, created_at
-                FROM vacancies
+                FROM vacancies_compat
                 ORDER BY COALESCE(created_at, 0) DESC, published_at DESC
                 LIMIT ?
                 """,
@@ -710,6 +2000,38 @@ class TaskDatabase:
             """, (now_ts, now_ts, vacancy_id))
             conn.commit()
 
+    # // Chg_WATERMARK_1710: watermark фильтров для инкрементальной загрузки
+    def get_filter_watermark(self, filter_id: str) -> Optional[str]:
+        """Последний сохранённый published_at для фильтра"""
+        with self.get_connection() as conn:
+            row = conn.execute(
+                "SELECT last_published_at FROM filter_watermarks WHERE filter_id = ?",
+                (filter_id,)
+            ).fetchone()
+            return row['last_published_at'] if row else None
+
+    def set_filter_watermark(self, filter_id: str, published_at: str) -> None:
+        """Сохранить published_at как watermark фильтра (сравнение — на стороне вызывающего)"""
+        with self.get_connection() as conn:
+            conn.execute("""
+                INSERT INTO filter_watermarks (filter_id, last_published_at, updated_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT(filter_id) DO UPDATE SET
+                    last_published_at = excluded.last_published_at,
+                    updated_at = excluded.updated_at
+            """, (filter_id, published_at, time.time()))
+            conn.commit()
+
+    def reset_filter_watermark(self, filter_id: Optional[str] = None) -> int:
+        """Сбросить watermark фильтра (или всех) — следующая загрузка будет полной"""
+        with self.get_connection() as conn:
+            if filter_id:
+                cur = conn.execute("DELETE FROM filter_watermarks WHERE filter_id = ?", (filter_id,))
+            else:
+                cur = conn.execute("DELETE FROM filter_watermarks")
+            conn.commit()
+            return cur.rowcount or 0
+
     # // Chg_TASKS_API_1509: метод для получения задач (для web/api)
     def get_tasks(self, status: Optional[object] = None, limit: int = 50, offset: int = 0) -> List[Dict]:
         """Получить список задач с пагинацией"""
@@ -734,9 +2056,9 @@ class TaskDatabase:
         """Сохранение результата работы плагина"""
         with self.get_connection() as conn:
             conn.execute("""
-                INSERT INTO plugin_results (vacancy_id, plugin_name, result_json)
-                VALUES (?, ?, ?)
-            """, (vacancy_id, plugin_name, json.dumps(result, ensure_ascii=False)))
+                INSERT INTO plugin_results (vacancy_id, plugin_name, result_json, created_at)
+                VALUES (?, ?, ?, ?)
+            """, (vacancy_id, plugin_name, json.dumps(result, ensure_ascii=False), time.time()))
             conn.commit()
     
     def get_vacancy_count_by_filter(self) -> Dict[str, int]:
@@ -757,7 +2079,11 @@ class TaskDatabase:
 
     # // Chg_V3_COMPAT_2509: методы-замены для функционала из v3 (VacancyDatabase)
     def vacuum(self) -> None:
-        """VACUUM БД"""
+        """
+        Полный VACUUM БД (переписывает файл, блокирует запись на всё время)
+        // Chg_DB_MAINT_1710: для плановой очистки — run_maintenance(); здесь — однократный перевод
+        старого файла в auto_vacuum=INCREMENTAL
+        """
         with self.get_connection() as conn:
             conn.execute("VACUUM")
 
@@ -767,18 +2093,7 @@ class TaskDatabase:
             cutoff_ts = cutoff_date.timestamp()
         except Exception:
             cutoff_ts = time.time() - 7*24*3600
-        with self.get_connection() as conn:
-            cur = conn.execute(
-                """
-                DELETE FROM tasks
-                WHERE status IN ('completed','failed')
-                  AND COALESCE(finished_at, 0) < ?
-                """,
-                (cutoff_ts,)
-            )
-            deleted = cur.rowcount
-            conn.commit()
-        return deleted or 0
+        return self.delete_expired('tasks', cutoff_ts)
 
     def get_missing_employer_ids(self, limit: int = 1000) -> List[str]:
         """Список employer_id из vacancies, отсутствующих в employers"""
@@ -797,6 +2112,106 @@ class TaskDatabase:
             )
             return [row[0] for row in cursor.fetchall()]
 
+    def get_stale_employer_ids(self, max_age_sec: float, limit: int = 1000) -> List[str]:
+        """hh_id работодателей, не обновлявшихся дольше max_age_sec (самые старые первыми)"""
+        with self.get_connection() as conn:
+            cursor = conn.execute(
+                "SELECT hh_id FROM employers WHERE COALESCE(updated_at, 0) < ? ORDER BY updated_at LIMIT ?",
+                (time.time() - max_age_sec, limit)
+            )
+            return [str(row[0]) for row in cursor.fetchall()]
+
+    def touch_employer(self, hh_id: str) -> None:
+        """Отметить работодателя как проверенного (304 Not Modified) без перезаписи raw_json"""
+        with self.get_connection() as conn:
+            conn.execute("UPDATE employers SET updated_at=? WHERE hh_id=?", (time.time(), hh_id))
+            conn.commit()
+
+    # // Chg_HH_DICT_1710: справочники HH
+    def replace_dictionary(self, name: str, items: List[Dict[str, Any]], ttl_sec: float) -> int:
+        """Заменить элементы справочника (id, name, parent_id, metadata) одной транзакцией"""
+        now_ts = time.time()
+        rows = [
+            (name, str(item['id']), item.get('name') or '', item.get('parent_id'),
+             json.dumps(item['metadata'], ensure_ascii=False) if item.get('metadata') is not None else None,
+             now_ts, now_ts + ttl_sec)
+            for item in items
+        ]
+        with self.get_connection() as conn:
+            conn.execute("DELETE FROM hh_dictionaries WHERE dictionary_name = ?", (name,))
+            conn.executemany("""
+                INSERT OR REPLACE INTO hh_dictionaries
+                    (dictionary_name, item_id, item_name, parent_id, metadata, cached_at, expires_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+            conn.commit()
+        return len(rows)
+
+    def extend_dictionaries(self, names: List[str], ttl_sec: float) -> None:
+        """Продлить срок актуальности справочников без перезаписи (ответ 304)"""
+        if not names:
+            return
+        placeholders = ",".join("?" * len(names))
+        with self.get_connection() as conn:
+            conn.execute(
+                f"UPDATE hh_dictionaries SET expires_at = ? WHERE dictionary_name IN ({placeholders})",
+                [time.time() + ttl_sec, *names]
+            )
+            conn.commit()
+
+    def get_dictionary_items(self, name: str) -> List[Dict[str, Any]]:
+        """Элементы справочника из локального кэша"""
+        with self.get_connection() as conn:
+            cursor = conn.execute(
+                "SELECT item_id, item_name, parent_id, metadata FROM hh_dictionaries "
+                "WHERE dictionary_name = ? ORDER BY id",
+                (name,)
+            )
+            return [
+                {
+                    'id': row['item_id'],
+                    'name': row['item_name'],
+                    'parent_id': row['parent_id'],
+                    'metadata': json.loads(row['metadata']) if row['metadata'] else None
+                }
+                for row in cursor.fetchall()
+            ]
+
+    def get_dictionaries_expiry(self) -> Dict[str, float]:
+        """Срок актуальности каждого закэшированного справочника (unix seconds)"""
+        with self.get_connection() as conn:
+            cursor = conn.execute(
+                "SELECT dictionary_name, MIN(expires_at) FROM hh_dictionaries GROUP BY dictionary_name"
+            )
+            return {row[0]: row[1] for row in cursor.fetchall()}
+
+    # // Chg_HTTP_CACHE_1710: валидаторы для условных GET к HH API
+    def get_http_validators(self, url: str) -> Optional[Dict[str, Any]]:
+        """ETag/Last-Modified последнего ответа 200 по URL"""
+        with self.get_connection() as conn:
+            row = conn.execute(
+                "SELECT etag, last_modified FROM http_cache WHERE url = ?", (url,)
+            ).fetchone()
+            return dict(row) if row else None
+
+    def save_http_validators(self, url: str, etag: Optional[str], last_modified: Optional[str]) -> None:
+        """Сохранить валидаторы ответа; без ETag и Last-Modified запись удаляется"""
+        with self.get_connection() as conn:
+            if not etag and not last_modified:
+                conn.execute("DELETE FROM http_cache WHERE url = ?", (url,))
+            else:
+                conn.execute("""
+                    INSERT INTO http_cache (url, etag, last_modified, updated_at)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(url) DO UPDATE SET
+                        etag = excluded.etag,
+                        last_modified = excluded.last_modified,
+                        updated_at = excluded.updated_at
+                    WHERE http_cache.etag IS NOT excluded.etag
+                       OR http_cache.last_modified IS NOT excluded.last_modified
+                """, (url, etag, last_modified, time.time()))
+            conn.commit()
+
     def save_employer(self, employer_data: Dict) -> Optional[int]:
         """Upsert работодателя по hh_id"""
         try:
@@ -851,21 +2266,22 @@ class TaskDatabase:
     def get_unanalyzed_vacancies(self, limit: int = 50, new_only: bool = True) -> List[Dict]:
         """Вакансии без результата анализа host3_analysis"""
         with self.get_connection() as conn:
-            where = ""
+            # // Chg_DB_INDEX_1710: при new_only=False условие "AND p.id IS NULL" оставалось без WHERE
+            conditions = ["p.id IS NULL"]
             params: List[Any] = []  # type: ignore
             if new_only:
-                where = "WHERE v.created_at > strftime('%s','now','-7 day')"
+                conditions.insert(0, "v.created_at > strftime('%s','now','-7 day')")
             sql = f"""
-                SELECT v.* FROM vacancies v
-                LEFT JOIN plugin_results p ON p.vacancy_id = v.id AND p.plugin_name = 'host3_analysis'
-                {where}
-                AND p.id IS NULL
+                SELECT v.* FROM vacancies_compat v
+                LEFT JOIN plugin_results p
+                    ON p.vacancy_id = CAST(v.id AS TEXT) AND p.plugin_name = 'host3_analysis'
+                WHERE {' AND '.join(conditions)}
                 ORDER BY v.created_at DESC
                 LIMIT ?
             """
             params.append(limit)
             cur = conn.execute(sql, params)
-            return [dict(row) for row in cur.fetchall()]
+            return [VacancyRecord(row) for row in cur.fetchall()]
 
     def save_analysis_result(self, vacancy_id: int, analysis: Dict) -> None:
         """Сохранить результат анализа как plugin_result"""
@@ -923,20 +2339,73 @@ class TaskDatabase:
                 (f'-{days} day',)
             ).fetchone()
             new_vacancies = row['cnt'] if row else 0
-            # В v4 нет версионирования — считаем новые версии = 0
+            # // Chg_VAC_VERSIONS_1710: новые версии — записи истории изменений за период
+            new_versions = conn.execute(
+                "SELECT COUNT(*) FROM vacancy_versions WHERE created_at > strftime('%s','now', ?)",
+                (f'-{days} day',)
+            ).fetchone()[0]
             result = {
                 'vacancies': {
                     'new_vacancies': new_vacancies,
-                    'new_versions': 0,
+                    'new_versions': new_versions,
                     'duplicates_skipped': 0,
                     'efficiency_percentage': 100 if new_vacancies else 0,
-                    'total_changes': new_vacancies
+                    'total_changes': new_vacancies + new_versions
                 },
                 'employers': {
                     'total_changes': conn.execute("SELECT COUNT(*) FROM employers WHERE created_at > strftime('%s','now', ?)", (f'-{days} day',)).fetchone()[0] if True else 0
                 },
                 'summary': {
-                    'total_operations': new_vacancies
+                    'total_operations': new_vacancies + new_versions
                 }
             }
             return result
+
+
+class LeaseHeartbeat:
+    """
+    // Chg_TASK_LEASE_1710: продление аренды задач владельца из отдельного потока.
+    Не зависит от цикла владельца: asyncio-цикл SchedulerDaemon выполняет и блокирующие шаги,
+    которые могут занять его дольше срока аренды. Поток запускается при первом add()
+    """
+
+    def __init__(self, db: 'TaskDatabase', owner: str, lease_sec: float = TASK_LEASE_SEC):
+        self.db = db
+        self.owner = owner
+        self.lease_sec = lease_sec
+        self._task_ids: set = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.logger = logging.getLogger(__name__)
+
+    def add(self, task_id: str) -> None:
+        with self._lock:
+            self._task_ids.add(task_id)
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="lease-heartbeat", daemon=True)
+                self._thread.start()
+
+    def discard(self, task_id: str) -> None:
+        with self._lock:
+            self._task_ids.discard(task_id)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.lease_sec / 3):
+            with self._lock:
+                task_ids = list(self._task_ids)
+            if not task_ids:
+                continue
+            try:
+                renewed = self.db.renew_leases(self.owner, task_ids, self.lease_sec)
+                if renewed < len(task_ids):
+                    self.logger.warning(f"Lost lease on {len(task_ids) - renewed} running task(s) of {self.owner}")
+            except Exception as e:
+                self.logger.error(f"Lease heartbeat error: {e}")
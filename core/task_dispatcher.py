@@ -12,9 +12,13 @@ from logging.handlers import RotatingFileHandler
 import json
 import queue
 import signal
+import os
+import socket
 from typing import Dict, List, Optional, Any
 from dataclasses import dataclass, field
-from .task_database import TaskDatabase
+from .task_database import TaskDatabase, TASK_LEASE_SEC
+from .progress_reporter import ProgressReporter
+from .task_queue import TaskQueue
 
 # Импорты новых хостов
 try:
@@ -32,11 +36,14 @@ class Task:
     params: Dict
     timeout_sec: int = 300
     chunk_size: int = 500
+    # // Chg_TASK_PRIORITY_1710: None — params['priority'] или приоритет по типу (см. core.task_queue)
+    priority: Optional[int] = None
 
 class TaskDispatcher:
     """
     Синхронный диспетчер задач с threading
     - Chunked processing для больших объёмов
+    - Приоритетная очередь с лимитами конкурентности по типам задач
     - Timeout monitoring
     - Graceful shutdown
     """
@@ -44,7 +51,6 @@ class TaskDispatcher:
     def __init__(self, max_workers=3, chunk_size=500, config: Dict[str, Any] = None):
         self.max_workers = max_workers
         self.chunk_size = chunk_size
-        self.task_queue = queue.Queue()
         self.workers: List[threading.Thread] = []
         self.running = False
         self.current_tasks: Dict[str, Dict] = {}
@@ -52,6 +58,29 @@ class TaskDispatcher:
         
         # Configuration
         self.config = config or {}
+        dispatcher_config = self.config.get('task_dispatcher') or {}
+        # // Chg_PROGRESS_THROTTLE_1710: интервал записи прогресса задач в БД
+        self.progress_flush_interval = float(dispatcher_config.get('progress_flush_interval_sec', 2.0))
+        # // Chg_EVENT_SCHEDULE_1710: цикл мониторинга спит до ближайшего schedule_at, но не дольше
+        # monitor_interval_sec (проверка таймаутов); add_task будит его сразу
+        self.monitor_interval = max(0.1, float(dispatcher_config.get('monitor_interval_sec', 1.0)))
+        # PRAGMA data_version меняют и коммиты своих потоков (воркеры, логи, прогресс), поэтому это лишь
+        # признак задач, созданных другими процессами (веб-панель, CLI), — и проверяется он реже
+        self.external_poll_interval = max(self.monitor_interval,
+                                          float(dispatcher_config.get('external_poll_interval_sec', 10.0)))
+        self._wakeup = threading.Event()
+        # // Chg_TASK_LEASE_1710: задачи захватываются арендой в БД — несколько процессов-диспетчеров
+        # делят одну очередь; аренда продлевается каждые lease_sec/3, просроченная возвращается в pending
+        self.lease_sec = float(dispatcher_config.get('task_lease_sec', TASK_LEASE_SEC))
+        self.max_attempts = int(dispatcher_config.get('failed_task_retry_limit', 3))
+        self.lease_owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._next_lease_check = 0.0
+        # // Chg_TASK_PRIORITY_1710: очередь по приоритету; лимиты по типам и конфликты учитываются в памяти
+        self.task_queue = TaskQueue(
+            type_limits=dispatcher_config.get('type_concurrency_limits'),
+            conflicts=dispatcher_config.get('conflicting_task_types'),
+            priority_enabled=dispatcher_config.get('priority_queue_enabled', True)
+        )
         
         # Database
         self.db = TaskDatabase()
@@ -160,7 +189,8 @@ class TaskDispatcher:
         """Запуск диспетчера"""
         self.running = True
         
-        # Загружаем существующие pending задачи из БД
+        # Возвращаем задачи упавших процессов и загружаем существующие pending задачи из БД
+        self.db.reclaim_expired_leases(self.max_attempts)
         self._load_pending_tasks()
         
         # Запуск worker threads
@@ -186,11 +216,11 @@ class TaskDispatcher:
                 task = Task(
                     id=task_data['id'],
                     type=task_data['type'],
-                    params=json.loads(task_data.get('params_json', '{}')),
+                    params=json.loads(task_data.get('params_json') or '{}'),
                     timeout_sec=task_data.get('timeout_sec', 3600)
                 )
-                self.task_queue.put(task)
-                self.logger.info(f"Loaded pending task {task.id} ({task.type})")
+                if self.task_queue.put(task):
+                    self.logger.info(f"Loaded pending task {task.id} ({task.type})")
             
             if pending_tasks:
                 self.logger.info(f"Loaded {len(pending_tasks)} pending tasks from database")
@@ -200,14 +230,21 @@ class TaskDispatcher:
     def _worker_loop(self, worker_id: str):
         """Цикл обработки задач worker'ом"""
         while self.running:
+            task = None
             try:
-                # Получение задачи (блокирующее, с таймаутом)
+                # Получение задачи (блокирующее, с таймаутом); выдаются только допустимые к запуску
                 task = self.task_queue.get(timeout=1.0)
                 
+                # // Chg_TASK_LEASE_1710: атомарный захват строки; None — задачу взял другой процесс
+                if not self.db.claim_task(task.id, self.lease_owner, self.lease_sec, worker_id=worker_id):
+                    self.logger.info(f"Task {task.id} already claimed by another dispatcher, skipped")
+                    continue
+                
                 # Регистрация текущей задачи
                 with self.lock:
                     self.current_tasks[worker_id] = {
                         'task_id': task.id,
+                        'type': task.type,
                         'started_at': time.time(),
                         'timeout': task.timeout_sec
                     }
@@ -226,17 +263,13 @@ class TaskDispatcher:
                 with self.lock:
                     self.current_tasks.pop(worker_id, None)
                 
-                try:
-                    self.task_queue.task_done()
-                except:
-                    pass
+                if task is not None:
+                    self.task_queue.task_done(task)
     
     def _execute_task(self, worker_id: str, task: Task):
         """Выполнение конкретной задачи"""
         try:
-            # // Chg_TASK_WORKER_1509: сохраняем worker_id при переходе в running
-            self.db.update_task_status(task.id, 'running', worker_id=worker_id)
-            
+            # // Chg_TASK_WORKER_1509 + Chg_TASK_LEASE_1710: running и worker_id выставлены при захвате (claim_task)
             if task.type == 'load_vacancies':
                 result = self._handle_load_vacancies(worker_id, task)
             elif task.type == 'process_pipeline':
@@ -246,12 +279,14 @@ class TaskDispatcher:
             else:
                 raise ValueError(f"Unknown task type: {task.type}")
             
-            self.db.update_task_status(task.id, 'completed', result)
-            self.logger.info(f"Task {task.id} completed successfully")
+            if self.db.update_task_status(task.id, 'completed', result, lease_owner=self.lease_owner):
+                self.logger.info(f"Task {task.id} completed successfully")
+            else:
+                self.logger.warning(f"Task {task.id} finished after losing its lease (expired or timed out); result not saved")
             
         except Exception as e:
             self.logger.error(f"Task {task.id} failed: {e}")
-            self.db.update_task_status(task.id, 'failed', {'error': str(e)})
+            self.db.update_task_status(task.id, 'failed', {'error': str(e)}, lease_owner=self.lease_owner)
     
     def _handle_load_vacancies(self, worker_id: str, task: Task) -> Dict:
         """
@@ -267,36 +302,64 @@ class TaskDispatcher:
         
         fetcher = VacancyFetcher()
         loaded_total = 0
+        # // Chg_WATERMARK_1710: watermark фильтра читается один раз на прогон и сдвигается после
+        # последнего chunk'а — все chunk'и грузят одно и то же окно date_from
+        filter_id = (filter_params.get('filter') or {}).get('id')
+        incremental = fetcher.incremental_enabled(filter_params)
+        watermark = fetcher.read_watermark(filter_id) if incremental else None
+        run_result = {'newest_published_at': None, 'errors': []}
+        # Итог прогона для прогресса: completed / interrupted / timeout / failed
+        final_state = 'completed'
+        # // Chg_PROGRESS_THROTTLE_1710: прогресс по chunk'ам — в БД не чаще progress_flush_interval
+        progress = ProgressReporter(self.db, task.id, self.progress_flush_interval)
         
-        for chunk_idx in range(chunk_count):
-            # Проверка на прерывание
-            if not self.running:
-                self.logger.info(f"Task {task.id} interrupted during chunk {chunk_idx}")
-                break
+        try:
+            for chunk_idx in range(chunk_count):
+                # Проверка на прерывание
+                if not self.running:
+                    self.logger.info(f"Task {task.id} interrupted during chunk {chunk_idx}")
+                    final_state = 'interrupted'
+                    break
+                    
+                # Проверка таймаута
+                if self._is_task_timeout(worker_id):
+                    self.logger.warning(f"Task {task.id} timed out at chunk {chunk_idx}")
+                    final_state = 'timeout'
+                    break
                 
-            # Проверка таймаута
-            if self._is_task_timeout(worker_id):
-                self.logger.warning(f"Task {task.id} timed out at chunk {chunk_idx}")
-                break
-            
-            # Загрузка части данных
-            chunk_params = filter_params.copy()
-            chunk_params['page_start'] = chunk_idx * (task.chunk_size // 100)
-            chunk_params['page_end'] = chunk_params['page_start'] + (task.chunk_size // 100)
-            
-            chunk_result = fetcher.fetch_chunk(chunk_params)
-            loaded_total += chunk_result['loaded_count']
-            
-            self.logger.info(f"Worker {worker_id}: chunk {chunk_idx+1}/{chunk_count}, "
-                           f"loaded {loaded_total} vacancies")
-            
-            # Прерывание если страница пустая
-            if chunk_result['loaded_count'] == 0:
-                break
+                # Загрузка части данных
+                chunk_params = filter_params.copy()
+                chunk_params['page_start'] = chunk_idx * (task.chunk_size // 100)
+                chunk_params['page_end'] = chunk_params['page_start'] + (task.chunk_size // 100)
+                chunk_params['watermark'] = watermark
+                
+                chunk_result = fetcher.fetch_chunk(chunk_params)
+                loaded_total += chunk_result['loaded_count']
+                run_result['errors'].extend(chunk_result.get('errors', []))
+                run_result['newest_published_at'] = fetcher._newest_published(
+                    [{'published_at': chunk_result.get('newest_published_at')}], run_result['newest_published_at'])
+                
+                self.logger.info(f"Worker {worker_id}: chunk {chunk_idx+1}/{chunk_count}, "
+                               f"loaded {loaded_total} vacancies")
+                progress.update(chunk_progress=f"{chunk_idx + 1}/{chunk_count}", vacancies_loaded=loaded_total)
+                
+                # Прерывание если страница пустая (loaded_count = 0 бывает и у страниц без изменений);
+                # пустой chunk из одних ошибок — сбой загрузки, а не конец выдачи
+                if chunk_result.get('processed_pages', 0) == 0:
+                    if chunk_result.get('errors'):
+                        final_state = 'failed'
+                    break
+        except Exception:
+            progress.close('failed')
+            raise
+        if incremental and final_state == 'completed':
+            fetcher.commit_watermark(filter_id, run_result)
+        progress.close(final_state)
         
         return {
             'loaded_count': loaded_total,
-            'chunks_processed': chunk_idx + 1 if 'chunk_idx' in locals() else 0
+            'chunks_processed': chunk_idx + 1 if 'chunk_idx' in locals() else 0,
+            'final_state': final_state
         }
     
     def _handle_process_pipeline(self, worker_id: str, task: Task) -> Dict:
@@ -326,12 +389,38 @@ class TaskDispatcher:
         return elapsed > task_info['timeout']
     
     def _monitor_loop(self):
-        """Цикл мониторинга для прерывания зависших задач"""
+        """
+        Цикл мониторинга: прерывание зависших задач и запуск запланированных.
+        get_due_tasks выполняется только при событии: add_task, наступил ближайший schedule_at,
+        аренды вернули задачи в pending или (не чаще external_poll_interval) изменился
+        PRAGMA data_version — задачу мог создать другой процесс (веб-панель, CLI)
+        """
+        data_version = None
+        next_schedule_at = None
+        next_external_poll = 0.0
         while self.running:
             try:
+                woken = self._wakeup.is_set()
+                self._wakeup.clear()
                 self._check_timeouts()
-                self._check_schedule()
-                time.sleep(10)  # Проверка каждые 10 секунд
+                if self._maintain_leases():
+                    woken = True
+                
+                now = time.time()
+                due = woken or (next_schedule_at is not None and next_schedule_at <= now)
+                if now >= next_external_poll:
+                    next_external_poll = now + self.external_poll_interval
+                    version = self.db.get_data_version()
+                    if version != data_version:
+                        data_version = version
+                        due = True
+                if due:
+                    next_schedule_at = self._check_schedule()
+                
+                wait = self.monitor_interval
+                if next_schedule_at is not None:
+                    wait = min(wait, max(0.0, next_schedule_at - time.time()))
+                self._wakeup.wait(wait)
             except KeyboardInterrupt:
                 self._handle_shutdown()
                 break
@@ -339,8 +428,25 @@ class TaskDispatcher:
                 self.logger.error(f"Monitor loop error: {e}")
                 time.sleep(5)
     
+    def _maintain_leases(self) -> bool:
+        """Heartbeat своих задач и возврат просроченных аренд; True — в pending вернулись задачи"""
+        now = time.time()
+        if now < self._next_lease_check:
+            return False
+        self._next_lease_check = now + self.lease_sec / 3
+        
+        with self.lock:
+            task_ids = [info['task_id'] for info in self.current_tasks.values() if not info.get('timed_out')]
+        if task_ids:
+            renewed = self.db.renew_leases(self.lease_owner, task_ids, self.lease_sec)
+            if renewed < len(task_ids):
+                self.logger.warning(f"Lost lease on {len(task_ids) - renewed} running task(s)")
+        
+        reclaimed = self.db.reclaim_expired_leases(self.max_attempts)
+        return reclaimed['requeued'] > 0
+    
     def _check_timeouts(self):
-        """Проверка и прерывание зависших задач"""
+        """Проверка и прерывание зависших задач (каждая просроченная задача помечается один раз)"""
         current_time = time.time()
         
         with self.lock:
@@ -348,29 +454,32 @@ class TaskDispatcher:
             for worker_id, task_info in self.current_tasks.items():
                 elapsed = current_time - task_info['started_at']
                 
-                if elapsed > task_info['timeout']:
-                    timeout_tasks.append((worker_id, task_info))
+                if elapsed > task_info['timeout'] and not task_info.get('timed_out'):
+                    # воркер ещё выполняет задачу и уберёт запись сам; повторно её не обрабатываем
+                    task_info['timed_out'] = True
+                    timeout_tasks.append((worker_id, task_info, elapsed))
         
-        for worker_id, task_info in timeout_tasks:
+        for worker_id, task_info, elapsed in timeout_tasks:
             self.logger.warning(f"TIMEOUT: Task {task_info['task_id']} "
                               f"on worker {worker_id} (elapsed: {elapsed:.1f}s)")
             
             # Помечаем задачу как failed
+            # // Chg_TASK_LEASE_1710: только пока аренда у этого процесса — задачу могли вернуть в очередь
             self.db.update_task_status(
                 task_info['task_id'], 
                 'failed', 
-                {'error': f'Timeout after {elapsed:.1f}s'}
+                {'error': f'Timeout after {elapsed:.1f}s'},
+                lease_owner=self.lease_owner
             )
     
-    def _check_schedule(self):
-        """Проверка и запуск запланированных задач"""
+    def _check_schedule(self) -> Optional[float]:
+        """Проверка и запуск запланированных задач; возвращает ближайший будущий schedule_at"""
         due_tasks = self.db.get_due_tasks()
         
         for task_data in due_tasks:
-            # Проверяем конфликты: если такой тип задач уже выполняется
-            if self._has_running_task_type(task_data['type']):
-                self.logger.info(f"Skipping scheduled task {task_data['id']}: "
-                               f"task type {task_data['type']} already running")
+            # // Chg_TASK_PRIORITY_1710: задача уже в очереди или выполняется — не дублируем.
+            # Конфликты типов проверяет очередь при выдаче задачи воркеру
+            if task_data['id'] in self.task_queue:
                 continue
             
             # Создаём объект задачи
@@ -382,31 +491,33 @@ class TaskDispatcher:
             )
             
             # Добавляем в очередь
-            self.task_queue.put(task)
-            # // Chg_STATUS_1509: normalize 'queued' -> 'pending' (start)
-            self.db.update_task_status(task.id, 'pending')
+            if not self.task_queue.put(task):
+                continue
+            if not self.task_queue.can_start(task):
+                self.logger.info(f"Scheduled task {task.id} waits: conflicting {task.type} task is running")
+            # // Chg_TASK_LEASE_1710: get_due_tasks отдаёт только pending-строки — статус не переписываем:
+            # воркер мог уже захватить задачу, и запись 'pending' сняла бы его аренду
             self.logger.info(f"Pending scheduled task: {task.id} ({task.type})")
-            # // Chg_STATUS_1509: normalize 'queued' -> 'pending' (end)
+        
+        return self.db.get_next_schedule_at(time.time())
     
     def _has_running_task_type(self, task_type: str) -> bool:
-        """Проверка выполнения задач данного типа"""
-        with self.lock:
-            for worker_id, task_info in self.current_tasks.items():
-                # Получаем тип текущей задачи из БД
-                current_task = self.db.get_task(task_info['task_id'])
-                if current_task and current_task['type'] == task_type:
-                    return True
-        return False
+        """Проверка выполнения задач данного типа (счётчик очереди, без запросов к БД)"""
+        return self.task_queue.is_running_type(task_type)
     
     def add_task(self, task_type: str, params: Dict, 
                  schedule_at: Optional[float] = None,
                  timeout_sec: int = 300,
-                 chunk_size: int = None) -> str:
-        """Добавление задачи в очередь"""
+                 chunk_size: int = None,
+                 priority: Optional[int] = None) -> str:
+        """Добавление задачи в очередь (priority: core.task_queue.PRIORITY_*; меньше — раньше)"""
         import uuid
         
         task_id = str(uuid.uuid4())
         chunk_size = chunk_size or self.chunk_size
+        if priority is not None:
+            # сохраняем в params, чтобы приоритет пережил перезапуск диспетчера
+            params = {**params, 'priority': priority}
         
         # Сохранение в БД
         self.db.create_task(
@@ -427,14 +538,14 @@ class TaskDispatcher:
                 chunk_size=chunk_size
             )
             
+            # create_task вставляет строку как pending; после put воркер может захватить её сразу
             self.task_queue.put(task)
-            # // Chg_STATUS_1509: normalize 'queued' -> 'pending' (start)
-            self.db.update_task_status(task_id, 'pending')
             self.logger.info(f"Added immediate task (pending): {task_id} ({task_type})")
-            # // Chg_STATUS_1509: normalize 'queued' -> 'pending' (end)
         else:
             self.logger.info(f"Scheduled task: {task_id} ({task_type}) "
                            f"for {time.ctime(schedule_at)}")
+            # // Chg_EVENT_SCHEDULE_1710: пересчитать ближайший срок в цикле мониторинга
+            self._wakeup.set()
         
         return task_id
     
@@ -472,6 +583,7 @@ class TaskDispatcher:
             'running': self.running,
             'workers_count': len(self.workers),
             'queue_size': self.task_queue.qsize(),
+            'queue': self.task_queue.get_stats(),
             'current_tasks': current_tasks_info,
             'stats': self.db.get_stats()
         }
@@ -480,6 +592,7 @@ class TaskDispatcher:
         """Graceful shutdown"""
         self.logger.info("Shutting down task dispatcher...")
         self.running = False
+        self._wakeup.set()
         
         # Ждём завершения текущих задач
         for worker in self.workers:
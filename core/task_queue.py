@@ -0,0 +1,264 @@
+"""
+Очередь задач TaskDispatcher HH Tool v4
+
+// Chg_TASK_PRIORITY_1710: приоритетная очередь в памяти вместо FIFO queue.Queue.
+Задачи индексируются по id (повторная постановка той же задачи игнорируется), выполняющиеся —
+счётчиками по типу и ключам конкурентности, поэтому решения о запуске не ходят в БД.
+Правила: лимит одновременных задач на тип, не более одной load_vacancies на фильтр,
+конфликтующие типы (cleanup) не выполняются одновременно с загрузкой.
+Задача, которую сейчас запустить нельзя, снимается с кучи и ждёт («паркуется») по ресурсу,
+который её блокирует; task_done возвращает в кучу только задачи освободившегося ресурса.
+
+// Chg_EVENT_SCHEDULE_1710: TimerHeap — таймеры по ключу для планировщиков, которые спят
+ровно до ближайшего срока вместо опроса с фиксированным интервалом.
+"""
+
+import heapq
+import itertools
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Приоритеты: меньше — раньше
+PRIORITY_URGENT = 0      # ручной запуск из UI/CLI
+PRIORITY_NORMAL = 5      # задачи по расписанию
+PRIORITY_BACKGROUND = 9  # обслуживание
+
+DEFAULT_TYPE_PRIORITY = {
+    'load_vacancies': PRIORITY_NORMAL,
+    'process_pipeline': PRIORITY_NORMAL,
+    'cleanup': PRIORITY_BACKGROUND,
+}
+
+# Максимум одновременно выполняемых задач каждого типа (тип без лимита — только max_workers)
+DEFAULT_TYPE_LIMITS = {
+    'load_vacancies': 2,
+    'process_pipeline': 1,
+    'cleanup': 1,
+}
+
+# Типы, которые не выполняются одновременно (отношение симметрично)
+DEFAULT_CONFLICTS = {
+    'cleanup': ('load_vacancies', 'process_pipeline'),
+}
+
+
+def task_priority(task) -> int:
+    """Приоритет задачи: явный task.priority, params['priority'] или значение по типу"""
+    value = getattr(task, 'priority', None)
+    if value is None:
+        value = (getattr(task, 'params', None) or {}).get('priority')
+    if value is None:
+        value = DEFAULT_TYPE_PRIORITY.get(task.type, PRIORITY_NORMAL)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return PRIORITY_NORMAL
+
+
+def concurrency_key(task) -> Optional[Tuple[str, str]]:
+    """Ключ, по которому допускается только одна выполняющаяся задача (load_vacancies — фильтр)"""
+    if task.type != 'load_vacancies':
+        return None
+    filter_data = (getattr(task, 'params', None) or {}).get('filter') or {}
+    filter_id = filter_data.get('id') or filter_data.get('name')
+    return (task.type, str(filter_id)) if filter_id else None
+
+
+class TaskQueue:
+    """
+    Приоритетная очередь с учётом выполняющихся задач.
+    get() выдаёт самую приоритетную задачу, которую можно запустить сейчас;
+    после выполнения воркер обязан вызвать task_done(task).
+    """
+
+    def __init__(self, type_limits: Optional[Dict[str, int]] = None,
+                 conflicts: Optional[Dict[str, Iterable[str]]] = None,
+                 priority_enabled: bool = True):
+        self.type_limits = dict(DEFAULT_TYPE_LIMITS if type_limits is None else type_limits)
+        self.conflicts: Dict[str, set] = {}
+        for task_type, others in (DEFAULT_CONFLICTS if conflicts is None else conflicts).items():
+            for other in others:
+                self.conflicts.setdefault(task_type, set()).add(other)
+                self.conflicts.setdefault(other, set()).add(task_type)
+        self.priority_enabled = priority_enabled
+
+        self._cond = threading.Condition()
+        self._heap: List[list] = []           # [priority, seq, task_id]
+        self._seq = itertools.count()
+        self._pending: Dict[str, tuple] = {}  # task_id -> (Task, запись кучи)
+        self._running: Dict[str, Any] = {}    # task_id -> Task в работе
+        self._running_by_type: Dict[str, int] = {}
+        self._running_keys: set = set()
+        self._parked: Dict[tuple, List[list]] = {}  # блокирующий ресурс -> записи кучи
+
+    def __contains__(self, task_id: str) -> bool:
+        with self._cond:
+            return task_id in self._pending or task_id in self._running
+
+    def put(self, task, priority: Optional[int] = None) -> bool:
+        """Поставить задачу; False — задача с таким id уже в очереди или выполняется"""
+        with self._cond:
+            if task.id in self._pending or task.id in self._running:
+                return False
+            if priority is None:
+                priority = task_priority(task) if self.priority_enabled else PRIORITY_NORMAL
+            entry = [priority, next(self._seq), task.id]
+            self._pending[task.id] = (task, entry)
+            heapq.heappush(self._heap, entry)
+            self._cond.notify()
+            return True
+
+    def get(self, timeout: Optional[float] = None):
+        """Взять задачу, допустимую к запуску; queue.Empty, если за timeout такой не нашлось"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                task = self._pop_runnable()
+                if task is not None:
+                    return task
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise queue.Empty
+                self._cond.wait(remaining)
+
+    def task_done(self, task) -> None:
+        """Освободить слоты типа и ключа конкурентности выполненной задачи"""
+        with self._cond:
+            if self._running.pop(task.id, None) is None:
+                return
+            left = self._running_by_type.get(task.type, 0) - 1
+            if left > 0:
+                self._running_by_type[task.type] = left
+            else:
+                self._running_by_type.pop(task.type, None)
+                self._unpark(('conflict', task.type))
+            key = concurrency_key(task)
+            self._running_keys.discard(key)
+            self._unpark(('type', task.type))
+            if key is not None:
+                self._unpark(('key', key))
+            self._cond.notify_all()
+
+    def remove(self, task_id: str) -> bool:
+        """Убрать задачу из очереди (запись в куче или среди ждущих удаляется лениво)"""
+        with self._cond:
+            return self._pending.pop(task_id, None) is not None
+
+    def is_running_type(self, task_type: str) -> bool:
+        with self._cond:
+            return self._running_by_type.get(task_type, 0) > 0
+
+    def can_start(self, task) -> bool:
+        """Можно ли запустить задачу при текущем наборе выполняющихся"""
+        with self._cond:
+            return self._admissible(task)
+
+    def qsize(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'queued': len(self._pending),
+                'running': len(self._running),
+                'running_by_type': dict(self._running_by_type),
+                'priority_enabled': self.priority_enabled,
+            }
+
+    # --- внутреннее (под self._cond) ---
+
+    def _blocker(self, task) -> Optional[tuple]:
+        """Ресурс, из-за которого задачу сейчас не запустить (None — можно запускать)"""
+        limit = self.type_limits.get(task.type)
+        if limit is not None and self._running_by_type.get(task.type, 0) >= limit:
+            return ('type', task.type)
+        for other in self.conflicts.get(task.type, ()):
+            if self._running_by_type.get(other):
+                return ('conflict', other)
+        key = concurrency_key(task)
+        if key is not None and key in self._running_keys:
+            return ('key', key)
+        return None
+
+    def _admissible(self, task) -> bool:
+        return self._blocker(task) is None
+
+    def _unpark(self, blocker: tuple) -> None:
+        for entry in self._parked.pop(blocker, ()):
+            heapq.heappush(self._heap, entry)
+
+    def _pop_runnable(self):
+        # Каждая запись паркуется не чаще одного раза на освобождение ресурса — без пересортировки кучи
+        chosen = None
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            item = self._pending.get(entry[2])
+            if item is None or item[1] is not entry:
+                continue  # удалена или уже выдана
+            task = item[0]
+            blocker = self._blocker(task)
+            if blocker is None:
+                chosen = task
+                break
+            self._parked.setdefault(blocker, []).append(entry)
+        if chosen is None:
+            return None
+
+        del self._pending[chosen.id]
+        self._running[chosen.id] = chosen
+        self._running_by_type[chosen.type] = self._running_by_type.get(chosen.type, 0) + 1
+        key = concurrency_key(chosen)
+        if key is not None:
+            self._running_keys.add(key)
+        return chosen
+
+
+class TimerHeap:
+    """
+    Таймеры по ключу на куче: push() ставит или переносит срок, pop_due() забирает наступившие.
+    Перенесённые и снятые таймеры удаляются из кучи лениво
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._heap: List[tuple] = []          # (due, seq, key)
+        self._due: Dict[Any, float] = {}
+        self._seq = itertools.count()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._due)
+
+    def push(self, key: Any, due: float) -> None:
+        with self._lock:
+            self._due[key] = due
+            heapq.heappush(self._heap, (due, next(self._seq), key))
+
+    def discard(self, key: Any) -> None:
+        with self._lock:
+            self._due.pop(key, None)
+
+    def next_due(self) -> Optional[float]:
+        """Ближайший срок (None — таймеров нет)"""
+        with self._lock:
+            self._drop_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float) -> List[Any]:
+        """Снять и вернуть ключи с due <= now в порядке сроков"""
+        with self._lock:
+            keys = []
+            self._drop_stale()
+            while self._heap and self._heap[0][0] <= now:
+                _, _, key = heapq.heappop(self._heap)
+                del self._due[key]
+                keys.append(key)
+                self._drop_stale()
+            return keys
+
+    def _drop_stale(self) -> None:
+        while self._heap and self._due.get(self._heap[0][2]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
@@ -2,6 +2,7 @@
 HH Tool v4 - Plugins
 """
 
-from .fetcher_v4 import VacancyFetcher, FilterManager, estimate_total_pages
+from .fetcher_v4 import VacancyFetcher, FilterManager, estimate_total_pages, estimate_search_size
+from .fetcher_async_v4 import AsyncVacancyFetcher
 
-__all__ = ['VacancyFetcher', 'FilterManager', 'estimate_total_pages']
+__all__ = ['VacancyFetcher', 'AsyncVacancyFetcher', 'FilterManager', 'estimate_total_pages', 'estimate_search_size']
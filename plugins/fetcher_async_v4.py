@@ -0,0 +1,337 @@
+"""
+Асинхронный загрузчик вакансий для HH Tool v4 (httpx.AsyncClient)
+
+// Chg_ASYNC_FETCHER_1710: тот же API, что у VacancyFetcher, но fetch_chunk/fetch_employer — корутины.
+Backoff, fallback на безопасный User-Agent, ротация auth-профилей, token bucket и
+сохранение в БД общие с синхронным загрузчиком. httpx — опциональная зависимость:
+без него AsyncVacancyFetcher недоступен, а планировщик работает через синхронный VacancyFetcher.
+"""
+
+import asyncio
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from .fetcher_v4 import (
+    VacancyFetcher,
+    ExponentialBackoff,
+    pages_from_response,
+    SPLIT_MAX_SLICES,
+    mark_provider_failed,
+    rotate_to_next_provider,
+)
+
+
+class AsyncVacancyFetcher(VacancyFetcher):
+    """
+    Асинхронный загрузчик вакансий
+    - HTTP-запросы выполняются на event loop без потока на запрос
+    - Страницы chunk'а запрашиваются параллельно (concurrent_pages), обрабатываются по порядку
+    - Ошибки API приводятся к requests.RequestException, как в синхронном загрузчике
+    """
+
+    def __init__(self, config: Optional[Dict] = None, rate_limit_delay=1.0, database=None):
+        if httpx is None:
+            raise ImportError("AsyncVacancyFetcher requires httpx (pip install httpx)")
+        super().__init__(config=config, rate_limit_delay=rate_limit_delay, database=database)
+        self.request_timeout = float(self.config.get('request_timeout_sec', 30))
+        self._client: Optional["httpx.AsyncClient"] = None
+
+    @staticmethod
+    def available() -> bool:
+        """Доступен ли асинхронный HTTP-клиент"""
+        return httpx is not None
+
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.request_timeout)
+        return self._client
+
+    async def aclose(self) -> None:
+        """Закрыть HTTP-клиент"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def _request(self, url: str, params: Optional[Dict] = None,
+                       allow_404: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        GET с rate limit, backoff (1s->4s->16s->64s) и fallback'ами UA/авторизации
+
+        Returns:
+            JSON ответа или None при 404 (если allow_404)
+        """
+        resp = await self._get_response(url, params)
+        if resp.status_code == 404:
+            if allow_404:
+                return None
+            raise requests.RequestException(f"HTTP 404 for {url}")
+        return self._json(resp, url)
+
+    @staticmethod
+    def _json(resp: "httpx.Response", url: str) -> Dict[str, Any]:
+        try:
+            return resp.json()
+        except json.JSONDecodeError as e:
+            raise requests.RequestException(f"Invalid JSON from {url}: {e}")
+
+    async def _get_response(self, url: str, params: Optional[Dict] = None,
+                            extra_headers: Optional[Dict[str, str]] = None) -> "httpx.Response":
+        """Ответ с кодом < 400 либо 404; остальные ошибки — requests.RequestException"""
+        backoff = ExponentialBackoff(base_delay=self.backoff.base_delay, max_retries=self.backoff.max_retries)
+        while True:
+            delay = self.rate_limiter.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            try:
+                # Заголовки session с переопределениями fallback'ов: UA и снятие Authorization видны обоим загрузчикам
+                headers = self.get_headers()
+                headers.update(extra_headers or {})
+                resp = await self.client.get(url, params=params, headers=headers)
+            except httpx.TransportError as e:
+                if backoff.retry_count < backoff.max_retries:
+                    wait = backoff.get_delay()
+                    backoff.retry_count += 1
+                    self.logger.warning(f"Network error for {url}: {e}; retry in {wait:.1f}s")
+                    await asyncio.sleep(wait)
+                    continue
+                raise requests.RequestException(f"Network error for {url}: {e}")
+
+            self._inc_stat('requests_made')
+            self.logger.debug(f"_request: url={resp.url} status={resp.status_code}")
+            status = resp.status_code
+
+            if status == 404:
+                return resp
+            # Fallback: при первом 400 пробуем безопасный UA один раз
+            if status == 400 and not self.ua_fallback_used:
+                self.ua_fallback_used = True
+                old = self._override_header('User-Agent', self.safe_browser_ua)
+                self.logger.warning(f"Switching User-Agent from '{old}' to safe browser UA and retrying")
+                continue
+            if status in (401, 403):
+                # // Chg_AUTH_ROTATE_1909: помечаем профиль и переходим к следующему
+                if self.current_auth_provider:
+                    mark_provider_failed(self.current_auth_provider.get('name'))
+                    self.current_auth_provider = rotate_to_next_provider("download")
+                if 'Authorization' in self.get_headers() and not self.auth_disabled_fallback_used:
+                    self.auth_disabled_fallback_used = True
+                    self._override_header('Authorization', None)
+                    self.logger.warning("Dropping Authorization header due to %s; retrying unauthenticated", status)
+                    continue
+            if (status >= 500 or status == 429) and backoff.should_retry(status):
+                wait = backoff.get_delay()
+                backoff.retry_count += 1
+                self.logger.warning(f"HTTP {status} for {url}; retry in {wait:.1f}s")
+                await asyncio.sleep(wait)
+                continue
+            if status >= 400:
+                self.logger.error(f"HTTP error {status} for {url}; body={resp.text[:500]}")
+                raise requests.RequestException(f"HTTP {status} for {url}")
+            return resp
+
+    async def _fetch_page_data(self, filter_params: Dict, page: int) -> Dict:
+        """Загрузка одной страницы вакансий: весь ответ API (items, found, pages)"""
+        url = f"{self.base_url}/vacancies"
+        data = await self._request(url, self._build_request_params(filter_params, page)) or {}
+        self.logger.debug(f"Page {page}/{data.get('pages', 0)}, found {len(data.get('items', []))} items, "
+                          f"total: {data.get('found', 0)}")
+        return data
+
+    async def _fetch_page(self, filter_params: Dict, page: int) -> List[Dict]:
+        """Загрузка одной страницы вакансий"""
+        data = await self._fetch_page_data(filter_params, page)
+        return data.get('items', [])
+
+    async def _get_page(self, filter_params: Dict, page: int) -> List[Dict]:
+        """Страница из кэша оценки либо запрос к API"""
+        items = self._take_prefetched_page(filter_params, page)
+        if items is not None:
+            return items
+        return await self._fetch_page(filter_params, page)
+
+    async def estimate_total_pages(self, filter_params: Dict) -> int:
+        """Оценка числа страниц по странице 0; сама страница переиспользуется в fetch_chunk"""
+        return (await self.estimate_search_size(filter_params))[0]
+
+    async def estimate_search_size(self, filter_params: Dict) -> Tuple[int, int]:
+        """(страниц, found) по странице 0 — как fetcher_v4.estimate_search_size"""
+        try:
+            data = await self._fetch_page_data(filter_params, 0)
+            self._remember_page(filter_params, 0, data.get('items', []))
+            return pages_from_response(data), int(data.get('found') or 0)
+        except Exception as e:
+            self.logger.error(f"Failed to estimate pages: {e}")
+            return 20, 0
+
+    async def split_search_space(self, filter_params: Dict, max_slices: int = SPLIT_MAX_SLICES) -> List[Dict]:
+        """Разбиение выдачи больше лимита HH на окна по дате — как VacancyFetcher.split_search_space"""
+        pending = [self._search_window(filter_params)]
+        slices = []
+        while pending:
+            date_from, date_to = pending.pop(0)
+            slice_filter = self._slice_filter(filter_params, date_from, date_to)
+            data = await self._fetch_page_data(slice_filter, 0)
+            halves = self._split_window(date_from, date_to, data, len(slices) + len(pending), max_slices)
+            if halves:
+                pending[:0] = halves
+                continue
+            self._remember_page(slice_filter, 0, data.get('items', []))
+            slices.append({'filter': slice_filter, 'found': int(data.get('found') or 0),
+                           'pages': pages_from_response(data)})
+        self.logger.info(f"Search space split into {len(slices)} slices (async)")
+        return slices
+
+    async def fetch_chunk(self, params: Dict) -> Dict:
+        """
+        Загрузка части вакансий (chunk) — параметры и результат как у VacancyFetcher.fetch_chunk
+        """
+        page_start = params.get('page_start', 0)
+        page_end = params.get('page_end', 10)
+        filter_params = params.get('filter', {})
+        task_id = params.get('task_id')
+        concurrency = max(1, int(params.get('concurrency') or self.concurrent_pages))
+        progress_key = params.get('progress_key')
+        if task_id:
+            self._begin_task_progress(task_id)
+
+        max_pages = filter_params.get('max_pages')
+        if max_pages and max_pages > 0:
+            page_end = min(page_end, page_start + max_pages)
+
+        # Watermark прогона передаёт вызывающий (см. VacancyFetcher.fetch_chunk)
+        watermark = params.get('watermark')
+        if watermark:
+            filter_params = self._apply_watermark(filter_params, watermark)
+
+        loaded_count = 0
+        processed_pages = 0
+        errors = []
+        last_successful_page = page_start - 1
+        newest_published = None
+
+        self.logger.debug(f"Starting async chunk: pages {page_start}-{page_end}, concurrency={concurrency}")
+
+        tasks: Dict[int, asyncio.Task] = {}
+        next_page = page_start
+        while next_page < page_end and len(tasks) < concurrency:
+            tasks[next_page] = asyncio.ensure_future(self._get_page(filter_params, next_page))
+            next_page += 1
+
+        try:
+            for page in range(page_start, page_end):
+                task = tasks.pop(page)
+                try:
+                    vacancies = await task
+
+                    if not vacancies:
+                        self.logger.debug(f"No more vacancies on page {page}, stopping chunk")
+                        break
+
+                    # SQLite — синхронный; одна транзакция на страницу в пуле потоков
+                    saved_count = await asyncio.to_thread(self._save_vacancies, vacancies, filter_params.get('id'))
+                    loaded_count += saved_count
+                    processed_pages += 1
+                    last_successful_page = page
+
+                    if task_id:
+                        # запись прогресса в БД (раз в progress_flush_interval_sec) — тоже не на event loop
+                        await asyncio.to_thread(self._update_task_progress, task_id, {
+                            'current_page': page,
+                            'pages_processed': processed_pages,
+                            'vacancies_loaded': loaded_count,
+                            'chunk_progress': f"{page - page_start + 1}/{page_end - page_start}"
+                        }, progress_key)
+
+                    newest_published = self._newest_published(vacancies, newest_published)
+
+                    if len(vacancies) < 50:
+                        self.logger.debug(f"Page {page} has only {len(vacancies)} vacancies, likely last page")
+                        break
+
+                except requests.RequestException as e:
+                    self.logger.error(f"Failed to fetch page {page}: {e}")
+                    errors.append({'page': page, 'error': str(e)})
+                    self._inc_stat('errors_count')
+
+                except Exception as e:
+                    self.logger.error(f"Unexpected error on page {page}: {e}")
+                    errors.append({'page': page, 'error': str(e)})
+                    self._inc_stat('errors_count')
+                    break
+
+                if next_page < page_end:
+                    tasks[next_page] = asyncio.ensure_future(self._get_page(filter_params, next_page))
+                    next_page += 1
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+        if task_id:
+            await asyncio.to_thread(self._flush_task_progress, task_id)
+
+        result = {
+            'loaded_count': loaded_count,
+            'processed_pages': processed_pages,
+            'errors': errors,
+            'last_page': last_successful_page,
+            'newest_published_at': newest_published,
+            'stats': self._stats_snapshot()
+        }
+
+        self.logger.info(f"Chunk completed: {loaded_count} vacancies from {processed_pages} pages (async)")
+        return result
+
+    async def fetch_employer(self, employer_id: str) -> Optional[Dict]:
+        """Загрузка данных работодателя по ID из HH API"""
+        data, _ = await self._fetch_employer(employer_id, conditional=False)
+        return data
+
+    async def fetch_employer_if_modified(self, employer_id: str) -> Tuple[Optional[Dict], bool]:
+        """Условная загрузка работодателя — как VacancyFetcher.fetch_employer_if_modified"""
+        return await self._fetch_employer(employer_id, conditional=True)
+
+    async def fetch_json_if_modified(self, url: str, conditional: bool = True) -> Tuple[Optional[Dict], bool]:
+        """Условный GET JSON-ресурса — как VacancyFetcher.fetch_json_if_modified"""
+        headers = await asyncio.to_thread(self._conditional_headers, url) if conditional else {}
+        resp = await self._get_response(url, extra_headers=headers)
+        if resp.status_code == 304:
+            self._inc_stat('not_modified')
+            return None, True
+        if resp.status_code == 404:
+            return None, False
+        data = self._json(resp, url)
+        await asyncio.to_thread(self._store_validators, url, resp.headers)
+        return data, False
+
+    async def _fetch_employer(self, employer_id: str, conditional: bool) -> Tuple[Optional[Dict], bool]:
+        try:
+            data, not_modified = await self.fetch_json_if_modified(
+                f"{self.base_url}/employers/{employer_id}", conditional)
+            if not_modified:
+                self.logger.debug(f"Employer {employer_id} not modified (304)")
+            elif data is None:
+                self.logger.debug(f"Employer {employer_id} not found (404)")
+            return data, not_modified
+        except requests.RequestException as e:
+            self.logger.error(f"API employer request failed for {employer_id}: {e}")
+            return None, False
+        except Exception as e:
+            self.logger.error(f"Unexpected error fetching employer {employer_id}: {e}")
+            return None, False
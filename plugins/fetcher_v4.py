@@ -7,14 +7,19 @@ import requests
 import time
 import logging
 import json
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
+from datetime import datetime, timedelta
 import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
 # Опциональные импорты для совместимости
 try:
     from core.task_database import TaskDatabase
+    from core.progress_reporter import ProgressReporter
 except ImportError:
     TaskDatabase = None
+    ProgressReporter = None
 
 try:
     from core.auth import apply_auth_headers, mark_provider_failed, rotate_to_next_provider, choose_provider
@@ -87,6 +92,70 @@ class ExponentialBackoff:
         """Reset backoff state for new request"""
         self.retry_count = 0
 
+class TokenBucket:
+    """
+    Потокобезопасный token bucket для ограничения частоты запросов к HH API
+    // Chg_TOKEN_BUCKET_1710: один bucket на процесс для всех загрузчиков
+    """
+
+    def __init__(self, rate_limit_delay: float = 1.0, capacity: int = 1):
+        # rate_limit_delay — интервал пополнения одного токена в секундах
+        self.rate_limit_delay = max(0.0, float(rate_limit_delay))
+        self.capacity = max(1, int(capacity))
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        if self.rate_limit_delay <= 0:
+            self.tokens = float(self.capacity)
+        else:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) / self.rate_limit_delay)
+        self.updated_at = now
+
+    def reserve(self) -> float:
+        """
+        Занять токен без ожидания; возвращает, сколько секунд нужно подождать до запроса
+        (токен резервируется сразу, поэтому подходит и для asyncio.sleep)
+        """
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens -= 1.0
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens * self.rate_limit_delay
+
+    def acquire(self) -> float:
+        """Блокирующее получение токена; возвращает время ожидания в секундах"""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+_rate_limiters: Dict[float, TokenBucket] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(rate_limit_delay: float) -> TokenBucket:
+    """Общий для процесса token bucket для заданной задержки между запросами"""
+    key = float(rate_limit_delay)
+    with _rate_limiters_lock:
+        bucket = _rate_limiters.get(key)
+        if bucket is None:
+            bucket = TokenBucket(rate_limit_delay=key)
+            _rate_limiters[key] = bucket
+        return bucket
+
+
+# // Chg_SPLIT_SEARCH_1710: HH API отдаёт не больше 2000 результатов на один поисковый запрос
+HH_RESULTS_CAP = 2000
+# глубже этой страницы (per_page=100) HH отвечает 400
+HH_MAX_PAGES = HH_RESULTS_CAP // 100
+SPLIT_MIN_WINDOW_SEC = 60
+SPLIT_MAX_SLICES = 64
+
+
 class VacancyFetcher:
     """
     Синхронный загрузчик с chunked processing
@@ -129,6 +198,11 @@ class VacancyFetcher:
             'Accept': 'application/json',
             'Accept-Language': 'ru'
         })
+        # // Chg_SESSION_HEADERS_1710: session.headers после __init__ не меняются — сессию делят потоки
+        # загрузки страниц; fallback'и (безопасный UA, запрос без Authorization) — переопределения,
+        # которые передаются в каждый запрос (None убирает заголовок сессии)
+        self._header_overrides: Dict[str, Optional[str]] = {}
+        self._headers_lock = threading.Lock()
         
         self.rate_limit_delay = rate_limit_delay
         
@@ -136,6 +210,15 @@ class VacancyFetcher:
         # Rate limiting (простой)
         self.last_request = 0
         self.min_delay = rate_limit_delay
+        # // Chg_TOKEN_BUCKET_1710: общий для процесса лимитер и число страниц "в полёте"
+        self.rate_limiter = get_rate_limiter(rate_limit_delay)
+        self.concurrent_pages = max(1, int(self.config.get('concurrent_pages', 1) or 1))
+        self._stats_lock = threading.Lock()
+        self._prefetched_pages: Dict[str, tuple] = {}
+        # // Chg_PROGRESS_THROTTLE_1710: прогресс задач пишется в БД не чаще progress_flush_interval_sec
+        self.progress_flush_interval = float(self.config.get('progress_flush_interval_sec', 2.0))
+        self._progress_reporters: Dict[str, 'ProgressReporter'] = {}
+        self._progress_refs: Dict[str, int] = {}
         
         # Database
         self.db = database or (TaskDatabase() if TaskDatabase else None)
@@ -153,10 +236,29 @@ class VacancyFetcher:
         
         # // Chg_AUTH_ROTATE_1909: Track current auth provider for rotation
         self.current_auth_provider = choose_provider("download")
+        # // Chg_AUTH_FALLBACK_1509: флаг одноразового отключения авторизации при 401/403
+        self.auth_disabled_fallback_used = False
     
     def get_headers(self) -> Dict[str, str]:
         """Получить текущие заголовки HTTP"""
-        return dict(self.session.headers)
+        headers = dict(self.session.headers)
+        headers.update(self._request_headers())
+        return {name: value for name, value in headers.items() if value is not None}
+    
+    def _request_headers(self, extra: Optional[Dict[str, str]] = None) -> Dict[str, Optional[str]]:
+        """Заголовки конкретного запроса: переопределения fallback'ов плюс extra"""
+        with self._headers_lock:
+            headers = dict(self._header_overrides)
+        if extra:
+            headers.update(extra)
+        return headers
+    
+    def _override_header(self, name: str, value: Optional[str]) -> Optional[str]:
+        """Подменить заголовок для всех следующих запросов (None — не отправлять); возвращает прежний"""
+        with self._headers_lock:
+            old = self._header_overrides.get(name, self.session.headers.get(name))
+            self._header_overrides[name] = value
+        return old
     
     def search_vacancies(self, text: str = "", per_page: int = 100, **kwargs) -> Dict:
         """Поиск вакансий через API HH.ru"""
@@ -172,15 +274,15 @@ class VacancyFetcher:
             # Применяем задержку для rate limiting
             time.sleep(self.rate_limit_delay)
             
-            response = self.session.get(url, params=params, timeout=30)
+            response = self.session.get(url, params=params, headers=self._request_headers(), timeout=30)
             
             if response.status_code == 400 and not self.ua_fallback_used:
                 # Fallback на безопасный User-Agent при 400 ошибке
                 logging.warning("400 error, trying safe browser UA fallback")
-                self.session.headers['User-Agent'] = self.safe_browser_ua
+                self._override_header('User-Agent', self.safe_browser_ua)
                 self.ua_fallback_used = True
                 
-                response = self.session.get(url, params=params, timeout=30)
+                response = self.session.get(url, params=params, headers=self._request_headers(), timeout=30)
             
             response.raise_for_status()
             return response.json()
@@ -224,7 +326,8 @@ class VacancyFetcher:
                 'page_start': int,
                 'page_end': int, 
                 'filter': dict,
-                'task_id': str (optional)
+                'task_id': str (optional),
+                'watermark': str (optional) — watermark фильтра, прочитанный в начале прогона
             }
         
         Returns:
@@ -246,21 +349,37 @@ class VacancyFetcher:
             page_end = min(page_end, page_start + max_pages)
             self.logger.debug(f"Limited pages to max_pages={max_pages}, new page_end={page_end}")
         
+        # // Chg_WATERMARK_1710: инкрементальный режим — только вакансии новее watermark фильтра.
+        # Watermark читает (read_watermark) и сдвигает (commit_watermark) вызывающий — один раз на прогон
+        # фильтра, а не на каждый chunk: иначе второй chunk получил бы date_from, сдвинутый первым
+        watermark = params.get('watermark')
+        if watermark:
+            filter_params = self._apply_watermark(filter_params, watermark)
+        
+        # // Chg_PROGRESS_PARTS_1710: параллельные chunk'и одной задачи (фильтры, срезы) пишут прогресс
+        # каждый в свою часть progress_key; запись закрывается после последнего chunk'а задачи
+        progress_key = params.get('progress_key')
+        if task_id:
+            self._begin_task_progress(task_id)
+        
+        concurrency = max(1, int(params.get('concurrency') or self.concurrent_pages))
+        if concurrency > 1 and page_end - page_start > 1:
+            return self._fetch_chunk_concurrent(filter_params, page_start, page_end, task_id, concurrency,
+                                                progress_key)
+        
         loaded_count = 0
         processed_pages = 0
         errors = []
         last_successful_page = page_start - 1
+        newest_published = None
         
         self.logger.debug(f"Starting chunk: pages {page_start}-{page_end}")
         
         for page in range(page_start, page_end):
             self.logger.debug(f"fetch_chunk: requesting page {page}")
             try:
-                # Rate limiting
-                self._wait_for_rate_limit()
-                
-                # Запрос к API
-                vacancies = self._fetch_page(filter_params, page)
+                # Запрос к API (с rate limiting) или страница, уже загруженная при оценке
+                vacancies = self._get_page(filter_params, page)
                 self.logger.debug(f"fetch_chunk: page {page} got {len(vacancies)} vacancies")
                 
                 if not vacancies:
@@ -283,7 +402,9 @@ class VacancyFetcher:
                         'pages_processed': processed_pages,
                         'vacancies_loaded': loaded_count,
                         'chunk_progress': f"{page - page_start + 1}/{page_end - page_start}"
-                    })
+                    }, progress_key)
+                
+                newest_published = self._newest_published(vacancies, newest_published)
                 
                 # Прерывание если страница пустая или мало вакансий
                 if len(vacancies) < 50:  # Меньше ожидаемого количества
@@ -294,7 +415,7 @@ class VacancyFetcher:
                 error_msg = f"Failed to fetch page {page}: {e}"
                 self.logger.error(error_msg)
                 errors.append({'page': page, 'error': str(e)})
-                self.stats['errors_count'] += 1
+                self._inc_stat('errors_count')
                 
                 # Продолжаем со следующей страницей при ошибке
                 continue
@@ -303,48 +424,289 @@ class VacancyFetcher:
                 error_msg = f"Unexpected error on page {page}: {e}"
                 self.logger.error(error_msg)
                 errors.append({'page': page, 'error': str(e)})
-                self.stats['errors_count'] += 1
+                self._inc_stat('errors_count')
                 
                 # При неожиданной ошибке прерываем chunk
                 break
         
+        if task_id:
+            self._flush_task_progress(task_id)
+        
         result = {
             'loaded_count': loaded_count,
             'processed_pages': processed_pages,
             'errors': errors,
             'last_page': last_successful_page,
-            'stats': self.stats.copy()
+            'newest_published_at': newest_published,
+            'stats': self._stats_snapshot()
         }
         
         self.logger.info(f"Chunk completed: {loaded_count} vacancies from {processed_pages} pages")
         return result
     
-    def _wait_for_rate_limit(self):
-        """Простой rate limiting"""
-        elapsed = time.time() - self.last_request
-        if elapsed < self.min_delay:
-            sleep_time = self.min_delay - elapsed
-            time.sleep(sleep_time)
-        self.last_request = time.time()
-    
-    def _fetch_page(self, filter_params: Dict, page: int) -> List[Dict]:
+    def _fetch_chunk_concurrent(self, filter_params: Dict, page_start: int, page_end: int,
+                                task_id: Optional[str], concurrency: int,
+                                progress_key: Optional[str] = None) -> Dict:
         """
-        Загрузка одной страницы с экспоненциальным backoff и ротацией профилей
+        Загрузка страниц chunk'а с N запросами одновременно
+        // Chg_CONCURRENT_PAGES_1710: запросы идут через общий token bucket,
+        // сохранение, прогресс и остановка на короткой странице — строго по порядку страниц
+        """
+        loaded_count = 0
+        processed_pages = 0
+        errors = []
+        last_successful_page = page_start - 1
+        newest_published = None
         
-        // Chg_BACKOFF_1909: Enhanced with exponential backoff and auth rotation
+        self.logger.debug(f"Starting concurrent chunk: pages {page_start}-{page_end}, concurrency={concurrency}")
         
-        Args:
-            filter_params: параметры фильтра вакансий
-            page: номер страницы
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="fetch-page") as pool:
+            futures = {}
+            next_page = page_start
+            # Держим в полёте не больше concurrency страниц, чтобы не тратить квоту API после последней страницы
+            while next_page < page_end and len(futures) < concurrency:
+                futures[next_page] = pool.submit(self._get_page, filter_params, next_page)
+                next_page += 1
             
-        Returns:
-            список вакансий или пустой список при ошибке
-        """
-        # // Chg_DIAG_1509: логируем параметры запроса
-        self.logger.debug(f"_fetch_page: filter_params={json.dumps(filter_params, ensure_ascii=False)}, page={page}")
+            for page in range(page_start, page_end):
+                future = futures.pop(page)
+                try:
+                    vacancies = future.result()
+                    self.logger.debug(f"fetch_chunk: page {page} got {len(vacancies)} vacancies")
+                    
+                    if not vacancies:
+                        self.logger.debug(f"No more vacancies on page {page}, stopping chunk")
+                        break
+                    
+                    saved_count = self._save_vacancies(vacancies, filter_params.get('id'))
+                    loaded_count += saved_count
+                    processed_pages += 1
+                    last_successful_page = page
+                    
+                    self.logger.debug(f"Page {page}: loaded {saved_count}/{len(vacancies)} vacancies")
+                    
+                    if task_id:
+                        self._update_task_progress(task_id, {
+                            'current_page': page,
+                            'pages_processed': processed_pages,
+                            'vacancies_loaded': loaded_count,
+                            'chunk_progress': f"{page - page_start + 1}/{page_end - page_start}"
+                        }, progress_key)
+                    
+                    newest_published = self._newest_published(vacancies, newest_published)
+                    
+                    if len(vacancies) < 50:
+                        self.logger.debug(f"Page {page} has only {len(vacancies)} vacancies, likely last page")
+                        break
+                
+                except requests.RequestException as e:
+                    self.logger.error(f"Failed to fetch page {page}: {e}")
+                    errors.append({'page': page, 'error': str(e)})
+                    self._inc_stat('errors_count')
+                
+                except Exception as e:
+                    self.logger.error(f"Unexpected error on page {page}: {e}")
+                    errors.append({'page': page, 'error': str(e)})
+                    self._inc_stat('errors_count')
+                    break
+                
+                if next_page < page_end:
+                    futures[next_page] = pool.submit(self._get_page, filter_params, next_page)
+                    next_page += 1
+            
+            # Ещё не начатые запросы отменяем; уже выполняющиеся дожидаемся и игнорируем
+            for future in futures.values():
+                future.cancel()
         
-        url = "https://api.hh.ru/vacancies"
+        if task_id:
+            self._flush_task_progress(task_id)
+        
+        result = {
+            'loaded_count': loaded_count,
+            'processed_pages': processed_pages,
+            'errors': errors,
+            'last_page': last_successful_page,
+            'newest_published_at': newest_published,
+            'stats': self._stats_snapshot()
+        }
+        
+        self.logger.info(f"Chunk completed: {loaded_count} vacancies from {processed_pages} pages (concurrency={concurrency})")
+        return result
+    
+    # // Chg_WATERMARK_1710: инкрементальная загрузка по published_at
+    def incremental_enabled(self, params: Dict) -> bool:
+        """Включён ли инкрементальный режим: params['incremental'] или config['incremental_fetch']"""
+        enabled = params.get('incremental', self.config.get('incremental_fetch', False))
+        return bool(enabled) and hasattr(self.db, 'get_filter_watermark')
+    
+    def read_watermark(self, filter_id: Optional[str]) -> Optional[str]:
+        """Watermark фильтра на начало прогона (None — полная загрузка)"""
+        if not filter_id:
+            return None
+        return self.db.get_filter_watermark(filter_id)
+    
+    def _apply_watermark(self, filter_params: Dict, watermark: str) -> Dict:
+        """Фильтр с date_from=watermark и сортировкой по дате публикации"""
+        fp = dict(filter_params.get('params', filter_params))
+        # HH API не принимает period вместе с date_from
+        fp.pop('period', None)
+        fp.pop('search_period', None)
+        fp['date_from'] = watermark
+        fp['order_by'] = 'publication_time'
+        if 'params' in filter_params:
+            return {**filter_params, 'params': fp}
+        return fp
+    
+    @staticmethod
+    def _parse_published_at(value: Optional[str]) -> Optional[datetime]:
+        if not value:
+            return None
+        try:
+            # Формат HH: 2025-09-20T10:00:00+0300
+            return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S%z')
+        except (TypeError, ValueError):
+            try:
+                return datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                return None
+    
+    def _newest_published(self, items: List[Dict], current: Optional[str]) -> Optional[str]:
+        """Самый поздний published_at среди items и current"""
+        newest, newest_dt = current, self._parse_published_at(current)
+        for item in items:
+            value = item.get('published_at')
+            dt = self._parse_published_at(value)
+            if dt is not None and (newest_dt is None or dt > newest_dt):
+                newest, newest_dt = value, dt
+        return newest
+    
+    def commit_watermark(self, filter_id: Optional[str], result: Dict) -> None:
+        """
+        Сдвинуть watermark фильтра вперёд после последнего chunk'а прогона.
+        result — итог всего прогона ('newest_published_at', 'errors'); при ошибках watermark не двигается
+        """
+        newest = result.get('newest_published_at')
+        if not filter_id or not newest or result.get('errors'):
+            return
+        try:
+            current = self.db.get_filter_watermark(filter_id)
+            current_dt = self._parse_published_at(current)
+            newest_dt = self._parse_published_at(newest)
+            if current_dt is None or (newest_dt is not None and newest_dt > current_dt):
+                self.db.set_filter_watermark(filter_id, newest)
+                self.logger.debug(f"Watermark for filter {filter_id} moved to {newest}")
+        except Exception as e:
+            self.logger.error(f"Failed to update watermark for filter {filter_id}: {e}")
+    
+    # // Chg_SPLIT_SEARCH_1710: разбиение выдачи больше лимита HH (2000 результатов) на окна по дате
+    def split_search_space(self, filter_params: Dict, max_slices: int = SPLIT_MAX_SLICES) -> List[Dict]:
+        """
+        Делит окно публикации фильтра пополам, пока в каждом окне не станет <= HH_RESULTS_CAP вакансий
         
+        Returns:
+            Список срезов {'filter', 'found', 'pages'} в хронологическом порядке;
+            страница 0 каждого среза уже загружена и переиспользуется fetch_chunk
+        """
+        pending = [self._search_window(filter_params)]
+        slices = []
+        while pending:
+            date_from, date_to = pending.pop(0)
+            slice_filter = self._slice_filter(filter_params, date_from, date_to)
+            self._wait_for_rate_limit()
+            data = self._fetch_page_data(slice_filter, 0)
+            halves = self._split_window(date_from, date_to, data, len(slices) + len(pending), max_slices)
+            if halves:
+                pending[:0] = halves
+                continue
+            self._remember_page(slice_filter, 0, data.get('items', []))
+            slices.append({'filter': slice_filter, 'found': int(data.get('found') or 0),
+                           'pages': pages_from_response(data)})
+        self.logger.info(f"Search space split into {len(slices)} slices")
+        return slices
+    
+    def _search_window(self, filter_params: Dict) -> Tuple[datetime, datetime]:
+        """Окно публикации фильтра: date_from/date_to либо последние period дней (по умолчанию HH — 30)"""
+        fp = filter_params.get('params', filter_params)
+        now = datetime.now().astimezone().replace(microsecond=0)
+        date_to = self._parse_published_at(fp.get('date_to')) or now
+        date_from = self._parse_published_at(fp.get('date_from'))
+        if date_from is None:
+            period = fp.get('period', fp.get('search_period')) or 30
+            date_from = date_to - timedelta(days=int(period))
+        return date_from, date_to
+    
+    def _slice_filter(self, filter_params: Dict, date_from: datetime, date_to: datetime) -> Dict:
+        fp = dict(filter_params.get('params', filter_params))
+        fp.pop('period', None)
+        fp.pop('search_period', None)
+        fp['date_from'] = date_from.strftime('%Y-%m-%dT%H:%M:%S%z')
+        fp['date_to'] = date_to.strftime('%Y-%m-%dT%H:%M:%S%z')
+        if 'params' in filter_params:
+            return {**filter_params, 'params': fp}
+        return fp
+    
+    def _split_window(self, date_from: datetime, date_to: datetime, data: Dict,
+                      slices_count: int, max_slices: int) -> Optional[List[Tuple[datetime, datetime]]]:
+        """Две половины окна, если в нём больше лимита HH и делить ещё можно, иначе None"""
+        found = int(data.get('found') or 0)
+        if found <= HH_RESULTS_CAP:
+            return None
+        window_sec = (date_to - date_from).total_seconds()
+        if window_sec <= SPLIT_MIN_WINDOW_SEC or slices_count + 2 > max_slices:
+            self.logger.warning(f"Slice {date_from.isoformat()}..{date_to.isoformat()} has {found} vacancies "
+                                f"and cannot be split further; results beyond {HH_RESULTS_CAP} are skipped")
+            return None
+        middle = (date_from + timedelta(seconds=window_sec / 2)).replace(microsecond=0)
+        return [(date_from, middle), (middle, date_to)]
+    
+    def _get_page(self, filter_params: Dict, page: int) -> List[Dict]:
+        """Страница из кэша оценки (estimate_total_pages) либо запрос к API с rate limiting"""
+        items = self._take_prefetched_page(filter_params, page)
+        if items is not None:
+            self.logger.debug(f"fetch_chunk: page {page} reused from estimate_total_pages")
+            return items
+        self._wait_for_rate_limit()
+        return self._fetch_page(filter_params, page)
+    
+    # // Chg_ESTIMATE_PAGE0_1710: страница 0, загруженная при оценке, не запрашивается повторно
+    PREFETCH_TTL_SEC = 300
+    
+    def _prefetch_key(self, filter_params: Dict, page: int) -> str:
+        request_params = self._build_request_params(filter_params, page)
+        return json.dumps(request_params, sort_keys=True, ensure_ascii=False)
+    
+    def _remember_page(self, filter_params: Dict, page: int, items: List[Dict]) -> None:
+        now = time.time()
+        with self._stats_lock:
+            # Выбрасываем невостребованные страницы, чтобы кэш не рос
+            for key in [k for k, (ts, _) in self._prefetched_pages.items() if now - ts > self.PREFETCH_TTL_SEC]:
+                del self._prefetched_pages[key]
+            self._prefetched_pages[self._prefetch_key(filter_params, page)] = (now, items)
+    
+    def _take_prefetched_page(self, filter_params: Dict, page: int) -> Optional[List[Dict]]:
+        with self._stats_lock:
+            entry = self._prefetched_pages.pop(self._prefetch_key(filter_params, page), None)
+        if entry is None or time.time() - entry[0] > self.PREFETCH_TTL_SEC:
+            return None
+        return entry[1]
+    
+    def _inc_stat(self, key: str, value: int = 1) -> None:
+        """Потокобезопасное увеличение счётчика статистики"""
+        with self._stats_lock:
+            self.stats[key] = self.stats.get(key, 0) + value
+    
+    def _stats_snapshot(self) -> Dict:
+        """Копия статистики, согласованная с _inc_stat"""
+        with self._stats_lock:
+            return self.stats.copy()
+    
+    def _wait_for_rate_limit(self):
+        """Rate limiting через общий для процесса token bucket"""
+        self.rate_limiter.acquire()
+        self.last_request = time.time()
+    
+    def _build_request_params(self, filter_params: Dict, page: int, per_page: int = 100) -> Dict:
+        """Параметры запроса /vacancies для фильтра (общие для sync и async загрузчиков)"""
         # // Chg_FILTER_PARAMS_1509: нормализация вложенных params (start)
         # Фильтры в config/filters.json имеют структуру { id, name, params: {...} }
         # Приведём к плоскому виду для запроса в HH API
@@ -353,7 +715,7 @@ class VacancyFetcher:
         # Базовые параметры запроса (минимум). Не отправляем лишние поля по умолчанию.
         request_params = {
             'page': page,
-            'per_page': 100  # максимум на странице
+            'per_page': per_page  # максимум на странице — 100
         }
         
         # Добавляем параметры фильтра
@@ -373,6 +735,11 @@ class VacancyFetcher:
             request_params['salary'] = fp['salary']
         if 'only_with_salary' in fp:
             request_params['only_with_salary'] = fp['only_with_salary']
+        # // Chg_WATERMARK_1710: инкрементальная загрузка (ISO 8601)
+        if 'date_from' in fp and fp['date_from']:
+            request_params['date_from'] = fp['date_from']
+        if 'date_to' in fp and fp['date_to']:
+            request_params['date_to'] = fp['date_to']
         # Параметр периода у HH API — search_period
         if 'period' in fp and fp['period'] is not None:
             request_params['search_period'] = fp['period']
@@ -389,19 +756,49 @@ class VacancyFetcher:
             elif isinstance(sf, str) and sf.strip():
                 request_params['search_field'] = sf.strip()
         # // Chg_FILTER_PARAMS_1509: нормализация вложенных params (end)
+        return request_params
+    
+    def _fetch_page(self, filter_params: Dict, page: int) -> List[Dict]:
+        """
+        Загрузка одной страницы вакансий
+        
+        Returns:
+            список вакансий (items)
+        """
+        return self._fetch_page_data(filter_params, page).get('items', [])
+    
+    def _fetch_page_data(self, filter_params: Dict, page: int) -> Dict:
+        """
+        Загрузка одной страницы с экспоненциальным backoff и ротацией профилей
+        
+        // Chg_BACKOFF_1909: Enhanced with exponential backoff and auth rotation
+        // Chg_ESTIMATE_PAGE0_1710: возвращаем весь ответ — items вместе с found/pages
+        
+        Args:
+            filter_params: параметры фильтра вакансий
+            page: номер страницы
+            
+        Returns:
+            ответ HH API: {'items': [...], 'found': int, 'pages': int, ...}
+        """
+        # // Chg_DIAG_1509: логируем параметры запроса
+        self.logger.debug(f"_fetch_page: filter_params={json.dumps(filter_params, ensure_ascii=False)}, page={page}")
+        
+        url = "https://api.hh.ru/vacancies"
+        request_params = self._build_request_params(filter_params, page)
         
         try:
             self.logger.debug(f"Requesting page {page} with params: {request_params}")
 
             def _do_request():
-                resp = self.session.get(url, params=request_params, timeout=30)
+                resp = self.session.get(url, params=request_params, headers=self._request_headers(), timeout=30)
                 self.logger.debug(f"_fetch_page: url={resp.url} status={resp.status_code}")
                 resp.raise_for_status()
                 return resp
 
             response = _do_request()
             
-            self.stats['requests_made'] += 1
+            self._inc_stat('requests_made')
             
             data = response.json()
             items = data.get('items', [])
@@ -412,7 +809,7 @@ class VacancyFetcher:
             total_found = data.get('found', 0)
             self.logger.debug(f"Page {page}/{total_pages}, found {len(items)} items, total: {total_found}")
             
-            return items
+            return data
             
         except requests.Timeout:
             self.logger.error(f"Timeout fetching page {page}")
@@ -427,31 +824,30 @@ class VacancyFetcher:
             # Fallback: при первом 400 пробуем безопасный UA один раз
             if status == 400 and not self.ua_fallback_used:
                 self.ua_fallback_used = True
-                old = self.session.headers.get('User-Agent')
-                self.session.headers['User-Agent'] = self.safe_browser_ua
+                old = self._override_header('User-Agent', self.safe_browser_ua)
                 self.logger.warning(f"Switching User-Agent from '{old}' to safe browser UA and retrying")
-                resp = self.session.get(url, params=request_params, timeout=30)
+                resp = self.session.get(url, params=request_params, headers=self._request_headers(), timeout=30)
                 self.logger.debug(f"_fetch_page(retry): url={resp.url} status={resp.status_code}")
                 resp.raise_for_status()
-                self.stats['requests_made'] += 1
+                self._inc_stat('requests_made')
                 data = resp.json()
                 items = data.get('items', [])
                 self.logger.debug(f"_fetch_page(retry): got {len(items)} items, total={data.get('found', 0)}")
-                return items
+                return data
             # // Chg_AUTH_FALLBACK_1509: при 401/403 и наличии Authorization — отключаем и пробуем без него
             if status in (401, 403) and not self.auth_disabled_fallback_used:
-                if 'Authorization' in self.session.headers:
+                if 'Authorization' in self.get_headers():
                     self.auth_disabled_fallback_used = True
-                    old_auth = self.session.headers.pop('Authorization', None)
+                    self._override_header('Authorization', None)
                     self.logger.warning("Dropping Authorization header due to %s; retrying unauthenticated", status)
-                    resp = self.session.get(url, params=request_params, timeout=30)
+                    resp = self.session.get(url, params=request_params, headers=self._request_headers(), timeout=30)
                     self.logger.debug(f"_fetch_page(retry-noauth): url={resp.url} status={resp.status_code}")
                     resp.raise_for_status()
-                    self.stats['requests_made'] += 1
+                    self._inc_stat('requests_made')
                     data = resp.json()
                     items = data.get('items', [])
                     self.logger.debug(f"_fetch_page(retry-noauth): got {len(items)} items, total={data.get('found', 0)}")
-                    return items
+                    return data
             if status == 429:
                 self.logger.warning(f"Rate limit hit on page {page}, waiting longer")
                 time.sleep(5)
@@ -470,24 +866,28 @@ class VacancyFetcher:
         """
         Загрузка данных работодателя по ID из HH API
         """
+        data, _ = self._fetch_employer(employer_id, conditional=False)
+        return data
+    
+    def fetch_employer_if_modified(self, employer_id: str) -> Tuple[Optional[Dict], bool]:
+        """
+        Условная загрузка работодателя (If-None-Match / If-Modified-Since)
+        
+        Returns:
+            (данные, False) — работодатель загружен; (None, True) — не изменился (304)
+        """
+        return self._fetch_employer(employer_id, conditional=True)
+    
+    def _fetch_employer(self, employer_id: str, conditional: bool) -> Tuple[Optional[Dict], bool]:
         try:
-            # Простой rate limit для единичных запросов
-            self._wait_for_rate_limit()
-            url = f"{self.base_url}/employers/{employer_id}"
-            resp = self.session.get(url, timeout=30)
-            if resp.status_code == 400 and not self.ua_fallback_used:
-                old = self.session.headers.get('User-Agent')
-                self.session.headers['User-Agent'] = self.safe_browser_ua
-                self.ua_fallback_used = True
-                self.logger.warning(f"Switching User-Agent from '{old}' to safe browser UA and retrying (employer)")
-                resp = self.session.get(url, timeout=30)
-            if resp.status_code == 404:
+            data, not_modified = self.fetch_json_if_modified(f"{self.base_url}/employers/{employer_id}", conditional)
+            if not_modified:
+                self.logger.debug(f"Employer {employer_id} not modified (304)")
+            elif data is None:
                 self.logger.debug(f"Employer {employer_id} not found (404)")
-                return None
-            resp.raise_for_status()
-            data = resp.json()
-            self.logger.debug(f"Fetched employer {employer_id}")
-            return data
+            else:
+                self.logger.debug(f"Fetched employer {employer_id}")
+            return data, not_modified
         except requests.exceptions.RequestException as e:
             self.logger.error(f"API employer request failed for {employer_id}: {e}")
             if hasattr(e, 'response') and e.response is not None:
@@ -495,10 +895,63 @@ class VacancyFetcher:
                     self.logger.error(f"Response body: {e.response.text[:500]}")
                 except Exception:
                     pass
-            return None
+            return None, False
         except Exception as e:
             self.logger.error(f"Unexpected error fetching employer {employer_id}: {e}")
-            return None
+            return None, False
+    
+    def fetch_json_if_modified(self, url: str, conditional: bool = True) -> Tuple[Optional[Dict], bool]:
+        """
+        GET JSON-ресурса HH API (работодатель, справочник) с условными заголовками
+        
+        Returns:
+            (данные, False) — ответ 200; (None, True) — 304; (None, False) — 404
+        Raises:
+            requests.RequestException при прочих ошибках
+        """
+        # Простой rate limit для единичных запросов
+        self._wait_for_rate_limit()
+        conditional_headers = self._conditional_headers(url) if conditional else {}
+        resp = self.session.get(url, headers=self._request_headers(conditional_headers), timeout=30)
+        if resp.status_code == 400 and not self.ua_fallback_used:
+            old = self._override_header('User-Agent', self.safe_browser_ua)
+            self.ua_fallback_used = True
+            self.logger.warning(f"Switching User-Agent from '{old}' to safe browser UA and retrying ({url})")
+            resp = self.session.get(url, headers=self._request_headers(conditional_headers), timeout=30)
+        if resp.status_code == 304:
+            self._inc_stat('not_modified')
+            return None, True
+        if resp.status_code == 404:
+            return None, False
+        resp.raise_for_status()
+        data = resp.json()
+        self._store_validators(url, resp.headers)
+        return data, False
+    
+    # // Chg_HTTP_CACHE_1710: валидаторы ответов хранятся в http_cache БД
+    def _conditional_headers(self, url: str) -> Dict[str, str]:
+        """If-None-Match / If-Modified-Since по сохранённым валидаторам URL"""
+        if not hasattr(self.db, 'get_http_validators'):
+            return {}
+        try:
+            validators = self.db.get_http_validators(url) or {}
+        except Exception as e:
+            self.logger.debug(f"http_cache lookup failed for {url}: {e}")
+            return {}
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+        return headers
+    
+    def _store_validators(self, url: str, response_headers) -> None:
+        if not hasattr(self.db, 'save_http_validators'):
+            return
+        try:
+            self.db.save_http_validators(url, response_headers.get('ETag'), response_headers.get('Last-Modified'))
+        except Exception as e:
+            self.logger.debug(f"http_cache update failed for {url}: {e}")
     
     def _save_vacancies(self, vacancies: List[Dict], filter_id: str = None) -> int:
         """
@@ -513,29 +966,69 @@ class VacancyFetcher:
         """
         saved_count = 0
         
+        # // Chg_VAC_BULK_1710: вся страница сохраняется одной транзакцией
+        if hasattr(self.db, 'save_vacancies_bulk'):
+            counts = self.db.save_vacancies_bulk(vacancies, filter_id)
+            saved_count = counts.get('new', 0) + counts.get('updated', 0)
+            # страницы разных фильтров сохраняются из нескольких потоков — счётчики под _stats_lock
+            self._inc_stat('vacancies_loaded', saved_count)
+            self._inc_stat('errors_count', counts.get('errors', 0))
+            return saved_count
+        
         for vacancy in vacancies:
             try:
                 # save_vacancy возвращает True если вакансия новая или изменилась
                 if self.db.save_vacancy(vacancy, filter_id):
                     saved_count += 1
-                    self.stats['vacancies_loaded'] += 1
+                    self._inc_stat('vacancies_loaded')
                     
             except Exception as e:
                 self.logger.error(f"Failed to save vacancy {vacancy.get('id', 'unknown')}: {e}")
-                self.stats['errors_count'] += 1
+                self._inc_stat('errors_count')
         
         return saved_count
     
-    def _update_task_progress(self, task_id: str, progress: Dict):
-        """Обновление прогресса задачи"""
-        try:
-            self.db.update_task_progress(task_id, {
-                **progress,
-                'timestamp': time.time(),
-                'stats': self.stats.copy()
-            })
-        except Exception as e:
-            self.logger.error(f"Failed to update task progress: {e}")
+    def _update_task_progress(self, task_id: str, progress: Dict, progress_key: Optional[str] = None):
+        """
+        Обновление прогресса задачи
+        // Chg_PROGRESS_THROTTLE_1710: в памяти и progress_channel; в БД (со снимком stats) —
+        не чаще progress_flush_interval_sec и в конце chunk'а.
+        С progress_key — прогресс части задачи, итоги страниц/вакансий суммируются по частям
+        """
+        if self.db is None or ProgressReporter is None:
+            return
+        with self._stats_lock:
+            reporter = self._progress_reporters.get(task_id)
+            if reporter is None:
+                reporter = ProgressReporter(self.db, task_id, self.progress_flush_interval,
+                                            snapshot=lambda: {'stats': self._stats_snapshot()},
+                                            totals=('pages_processed', 'vacancies_loaded'))
+                self._progress_reporters[task_id] = reporter
+        if progress_key:
+            reporter.update_part(str(progress_key), **progress)
+        else:
+            reporter.update(**progress)
+    
+    def _begin_task_progress(self, task_id: str):
+        """Начало chunk'а задачи: прогресс закрывается, когда завершатся все её chunk'и"""
+        with self._stats_lock:
+            self._progress_refs[task_id] = self._progress_refs.get(task_id, 0) + 1
+    
+    def _flush_task_progress(self, task_id: str):
+        """Записать накопленный прогресс задачи (конец chunk'а)"""
+        with self._stats_lock:
+            refs = self._progress_refs.pop(task_id, 1) - 1
+            if refs > 0:
+                self._progress_refs[task_id] = refs
+                reporter = self._progress_reporters.get(task_id)
+            else:
+                reporter = self._progress_reporters.pop(task_id, None)
+        if reporter is None:
+            return
+        if refs > 0:
+            reporter.flush()
+        else:
+            reporter.close()
     
     def get_stats(self) -> Dict:
         """Получение статистики работы"""
@@ -597,34 +1090,35 @@ class FilterManager:
 def estimate_total_pages(filter_params: Dict, fetcher: VacancyFetcher) -> int:
     """
     Оценка общего количества страниц для фильтра
-    Делает один запрос для получения total count
+    // Chg_ESTIMATE_PAGE0_1710: один запрос страницы 0 — метаданные found/pages берутся из него,
+    // а сами вакансии страницы 0 сохраняются в fetcher и переиспользуются fetch_chunk
+    """
+    return estimate_search_size(filter_params, fetcher)[0]
+
+
+def estimate_search_size(filter_params: Dict, fetcher: VacancyFetcher) -> Tuple[int, int]:
+    """
+    (страниц, found) по странице 0 — как estimate_total_pages.
+    pages HH не превышает HH_MAX_PAGES, выход за лимит выдачи виден только по found
     """
     try:
-        # Запрашиваем первую страницу для получения общего количества
-        vacancies_data = fetcher._fetch_page(filter_params, 0)
-        
-        # Делаем запрос к API для получения метаданных
-        url = "https://api.hh.ru/vacancies"
-        request_params = {
-            'page': 0,
-            'per_page': 1,  # Минимум для получения метаданных
-            **{k: v for k, v in filter_params.items() if k != 'id'}
-        }
-        
-        response = fetcher.session.get(url, params=request_params, timeout=10)
-        response.raise_for_status()
-        
-        data = response.json()
-        total_found = data.get('found', 0)
-        per_page = 100  # Стандартное количество на странице
-        
-        estimated_pages = (total_found + per_page - 1) // per_page  # Округление вверх
-        
-        return min(estimated_pages, 2000)  # HH API ограничивает результаты
+        fetcher._wait_for_rate_limit()
+        data = fetcher._fetch_page_data(filter_params, 0)
+        fetcher._remember_page(filter_params, 0, data.get('items', []))
+        return pages_from_response(data), int(data.get('found') or 0)
         
     except Exception as e:
         logging.getLogger(__name__).error(f"Failed to estimate pages: {e}")
-        return 20  # Значение по умолчанию
+        return 20, 0  # Значение по умолчанию; found неизвестен
+
+
+def pages_from_response(data: Dict, per_page: int = 100) -> int:
+    """Число страниц по ответу HH API (pages, либо found / per_page с округлением вверх)"""
+    total_pages = data.get('pages')
+    if total_pages is None:
+        total_found = data.get('found', 0)
+        total_pages = (total_found + per_page - 1) // per_page  # Округление вверх
+    return min(int(total_pages), 2000)  # HH API ограничивает результаты
 
 # Экспортируем VacancyFetcher и создаем алиас HHVacancyFetcher для совместимости
 HHVacancyFetcher = VacancyFetcher
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Микро-бенчмарк хеширования вакансий: прежний MD5 поверх json.dumps(sort_keys=True)
+против core.content_hash (blake2b по каноническому кортежу), плюс стоимость отключённого DEBUG-лога
+Запуск: python scripts/bench_content_hash.py [--count 100000]
+"""
+import argparse
+import hashlib
+import json
+import logging
+import random
+import sys
+import time
+
+sys.path.append('.')
+from core.content_hash import vacancy_fingerprint
+
+
+def synthetic_vacancies(count: int, seed: int = 42):
+    rnd = random.Random(seed)
+    areas = [('1', 'Москва'), ('2', 'Санкт-Петербург'), ('3', 'Екатеринбург'), ('4', 'Новосибирск')]
+    for i in range(count):
+        area_id, area_name = rnd.choice(areas)
+        salary_from = rnd.choice([None, 80000, 120000, 200000])
+        yield {
+            'id': str(10_000_000 + i),
+            'name': f'Python developer {i % 500}',
+            'employer': {'id': str(i % 3000), 'name': f'Company {i % 3000}'},
+            'salary': {'from': salary_from, 'to': None, 'currency': 'RUR', 'gross': False} if salary_from else None,
+            'area': {'id': area_id, 'name': area_name, 'url': f'https://api.hh.ru/areas/{area_id}'},
+            'published_at': f'2025-09-{1 + i % 28:02d}T10:00:00+0300',
+            'snippet': {
+                'requirement': 'Опыт разработки на <highlighttext>Python</highlighttext> от 3 лет. Django, PostgreSQL.',
+                'responsibility': 'Разработка и поддержка backend-сервисов, code review, участие в архитектуре.',
+            },
+            'experience': {'id': 'between3And6', 'name': 'От 3 до 6 лет'},
+            'schedule': {'id': 'remote', 'name': 'Удаленная работа'},
+            'alternate_url': f'https://hh.ru/vacancy/{10_000_000 + i}',
+        }
+
+
+def legacy_hash(vacancy_data):
+    """Хеш TaskDatabase до Chg_HASH_BLAKE2_1710"""
+    content_for_hash = {
+        'id': vacancy_data.get('id'),
+        'name': vacancy_data.get('name'),
+        'employer': vacancy_data.get('employer', {}).get('name', ''),
+        'snippet': vacancy_data.get('snippet', {}),
+        'salary': vacancy_data.get('salary'),
+        'area': vacancy_data.get('area', {}),
+        'published_at': vacancy_data.get('published_at')
+    }
+    return hashlib.md5(json.dumps(content_for_hash, sort_keys=True).encode()).hexdigest()
+
+
+def bench(name, func, items):
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<36} {elapsed:8.3f}s  {elapsed / len(items) * 1e6:7.2f} us/vacancy")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=100_000)
+    args = parser.parse_args()
+
+    items = list(synthetic_vacancies(args.count))
+    logger = logging.getLogger('bench')
+    logger.setLevel(logging.INFO)
+
+    print(f"Synthetic vacancies: {len(items)}")
+    old = bench("md5(json.dumps(sort_keys=True))", legacy_hash, items)
+    new = bench("blake2b(canonical tuple)", vacancy_fingerprint, items)
+    print(f"Hashing speedup: x{old / new:.1f}")
+
+    eager = bench("eager debug f-string (DEBUG off)",
+                  lambda v: logger.debug(f"save_vacancy: input={json.dumps(v, ensure_ascii=False)[:800]}"), items)
+    lazy = bench("guarded debug (DEBUG off)",
+                 lambda v: logger.isEnabledFor(logging.DEBUG) and logger.debug(
+                     "save_vacancy: input=%.800s", json.dumps(v, ensure_ascii=False)), items)
+    print(f"Debug formatting saved: {eager - lazy:.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+Unit-тесты core.content_hash: один отпечаток для ответа HH API и core.models.Vacancy
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from core.content_hash import vacancy_fingerprint
+from core.models import Vacancy
+
+
+PAYLOAD = {
+    'id': '101',
+    'name': 'Python developer',
+    'employer': {'id': '7', 'name': 'ACME'},
+    'salary': {'from': 150000, 'to': None, 'currency': 'RUR'},
+    'area': {'id': '1', 'name': 'Москва'},
+    'published_at': '2025-09-20T10:00:00+0300',
+    'snippet': {'requirement': 'Django', 'responsibility': 'Backend'},
+    'alternate_url': 'https://hh.ru/vacancy/101',
+}
+
+
+def test_model_and_payload_fingerprints_agree():
+    vacancy = Vacancy(hh_id='101', title='Python developer', employer_name='ACME', employer_id='7',
+                      salary_from=150000, currency='RUR', area_name='Москва',
+                      published_at='2025-09-20T10:00:00+0300',
+                      snippet_description='Django', description='Backend')
+    assert vacancy.content_hash == vacancy_fingerprint(PAYLOAD)
+
+
+def test_fingerprint_ignores_unrelated_fields_and_tracks_content():
+    base = vacancy_fingerprint(PAYLOAD)
+    assert vacancy_fingerprint({**PAYLOAD, 'alternate_url': 'https://hh.ru/other', 'counters': {}}) == base
+    assert vacancy_fingerprint({**PAYLOAD, 'salary': {'from': 160000, 'currency': 'RUR'}}) != base
+    # разделитель полей: сдвиг текста между полями даёт другой хеш
+    assert vacancy_fingerprint({**PAYLOAD, 'snippet': {'requirement': 'DjangoBackend', 'responsibility': ''}}) != base
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Unit-тесты core.cron: разбор выражений и следующий запуск на границах месяцев и переходах DST
+"""
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from core.cron import CronExpression, parse_cron
+
+BERLIN = ZoneInfo('Europe/Berlin')
+
+
+def fire_times(expression, start, count):
+    cron = parse_cron(expression)
+    moments, moment = [], start
+    for _ in range(count):
+        moment = cron.next_after(moment)
+        moments.append(moment)
+    return moments
+
+
+def test_every_n_hours_wraps_past_midnight():
+    # прежний разбор "0 */6" в 22:10 давал 00:00 того же дня — время в прошлом
+    assert parse_cron('0 */6 * * *').next_after(datetime(2025, 9, 30, 22, 10)) == datetime(2025, 10, 1, 0, 0)
+    assert fire_times('*/5 * * * *', datetime(2025, 12, 31, 23, 52), 3) == [
+        datetime(2025, 12, 31, 23, 55), datetime(2026, 1, 1, 0, 0), datetime(2026, 1, 1, 0, 5)]
+    assert parse_cron('0 * * * *').next_after(datetime(2025, 1, 1, 10, 0)) == datetime(2025, 1, 1, 11, 0)
+
+
+def test_month_boundaries_and_day_fields():
+    assert fire_times('0 0 31 * *', datetime(2025, 1, 31, 12, 0), 2) == [
+        datetime(2025, 3, 31), datetime(2025, 5, 31)]
+    assert parse_cron('30 6 29 2 *').next_after(datetime(2025, 1, 1)) == datetime(2028, 2, 29, 6, 30)
+    # день месяца ИЛИ понедельник, если ограничены оба поля
+    assert fire_times('0 9 15 * MON', datetime(2025, 9, 10), 3) == [
+        datetime(2025, 9, 15, 9), datetime(2025, 9, 22, 9), datetime(2025, 9, 29, 9)]
+    assert fire_times('0 9 10-20/5 * *', datetime(2025, 9, 10, 9), 2) == [
+        datetime(2025, 9, 15, 9), datetime(2025, 9, 20, 9)]
+    assert parse_cron('weekly').next_after(datetime(2025, 9, 28, 2, 0)) == datetime(2025, 9, 28, 3, 0)
+    assert parse_cron('0 0 * * 7').next_after(datetime(2025, 9, 23)) == datetime(2025, 9, 28)
+    assert parse_cron('0 12 * JAN,jul SAT-SUN').matches(datetime(2025, 7, 5, 12, 0))
+
+
+def test_dst_gap_and_repeated_hour_fire_once():
+    # 30.03.2025 02:00 -> 03:00: несуществующее 02:30 сдвигается на 03:30
+    moments = fire_times('30 2 * * *', datetime(2025, 3, 29, 3, 0, tzinfo=BERLIN), 2)
+    assert [m.isoformat() for m in moments] == ['2025-03-30T03:30:00+02:00', '2025-03-31T02:30:00+02:00']
+
+    # 26.10.2025 03:00 -> 02:00: час 02:xx повторяется, запуск только в первое вхождение
+    hourly = fire_times('0 * * * *', datetime(2025, 10, 26, 0, 30, tzinfo=BERLIN), 3)
+    assert [m.isoformat() for m in hourly] == [
+        '2025-10-26T01:00:00+02:00', '2025-10-26T02:00:00+02:00', '2025-10-26T03:00:00+01:00']
+    timestamps = [m.timestamp() for m in fire_times('*/20 * * * *', hourly[0], 12)]
+    assert timestamps == sorted(set(timestamps))
+    assert min(b - a for a, b in zip(timestamps, timestamps[1:])) == timedelta(minutes=20).total_seconds()
+
+
+@pytest.mark.parametrize('expression', ['* * * *', '60 * * * *', '0 0 0 * *', '*/0 * * * *', '0 0 * FOO *'])
+def test_invalid_expressions_rejected(expression):
+    with pytest.raises(ValueError):
+        CronExpression(expression)
+
+
+def test_never_firing_expression_raises():
+    with pytest.raises(ValueError):
+        parse_cron('0 0 30 2 *').next_after(datetime(2025, 1, 1))
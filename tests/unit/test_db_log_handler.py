@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Unit-тесты DbLogHandler: фоновая пакетная запись логов в SQLite
+"""
+import logging
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from core.db_log_handler import DbLogHandler
+
+
+def _logger(name, handler):
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    return logger
+
+
+def _count_logs(handler):
+    with handler.db.get_connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0]
+
+
+def test_records_written_in_batches_and_flushed_on_close(tmp_path):
+    handler = DbLogHandler(str(tmp_path / "logs.sqlite3"), batch_size=50, flush_interval_ms=10000)
+    batches = []
+    write = handler.db.write_log_records
+    handler.db.write_log_records = lambda rows: (batches.append(len(rows)), write(rows))
+    logger = _logger("tests.db_log.batch", handler)
+    try:
+        for i in range(120):
+            logger.warning("fetch failed %d", i)
+        assert handler.flush()
+        assert _count_logs(handler) == 120
+        assert max(batches) == 50 and sum(batches) == 120
+
+        logger.info("last record before shutdown")
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+    assert _count_logs(handler) == 121
+    assert handler.get_stats() == {'written': 121, 'dropped': 0, 'failed': 0, 'queued': 0}
+
+
+def test_full_queue_drops_records_without_blocking(tmp_path):
+    handler = DbLogHandler(str(tmp_path / "drop.sqlite3"), batch_size=1, max_queue=3)
+    release = threading.Event()
+    write = handler.db.write_log_records
+    handler.db.write_log_records = lambda rows: (release.wait(5), write(rows))
+    logger = _logger("tests.db_log.drop", handler)
+    try:
+        for i in range(10):
+            logger.error("burst %d", i)
+        assert handler.get_stats()['dropped'] >= 6
+    finally:
+        release.set()
+        logger.removeHandler(handler)
+        handler.close()
+    stats = handler.get_stats()
+    assert stats['written'] + stats['dropped'] == 10
+    assert _count_logs(handler) == stats['written']
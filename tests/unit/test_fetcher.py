@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+Unit-тесты VacancyFetcher без обращений к HH API (_fetch_page подменяется)
+"""
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from core.task_database import TaskDatabase
+from plugins.fetcher_v4 import VacancyFetcher, TokenBucket
+
+
+def _page_items(page, count):
+    return [{'id': str(page * 1000 + i), 'name': f'Vacancy {page}-{i}'} for i in range(count)]
+
+
+def test_token_bucket_spaces_requests():
+    bucket = TokenBucket(rate_limit_delay=0.05)
+    start = time.monotonic()
+    for _ in range(4):
+        bucket.acquire()
+    # первый токен доступен сразу, остальные — через 0.05s
+    assert time.monotonic() - start >= 0.14
+
+
+def test_concurrent_chunk_keeps_page_order_and_stops_on_short_page(tmp_path):
+    fetcher = VacancyFetcher(config={'concurrent_pages': 4}, rate_limit_delay=0.0,
+                             database=TaskDatabase(str(tmp_path / "fetch.sqlite3")))
+    requested = []
+    lock = threading.Lock()
+
+    def fake_fetch_page(filter_params, page):
+        with lock:
+            requested.append(page)
+        # более ранние страницы отвечают медленнее — порядок ответов перемешан
+        time.sleep(0.02 * (5 - page) if page < 5 else 0)
+        return _page_items(page, 100 if page < 3 else 10)
+
+    fetcher._fetch_page = fake_fetch_page
+    progress = []
+    fetcher._update_task_progress = lambda task_id, p, progress_key=None: progress.append(p['current_page'])
+
+    result = fetcher.fetch_chunk({'page_start': 0, 'page_end': 20, 'filter': {'id': 'f1'}, 'task_id': 't1'})
+
+    assert progress == [0, 1, 2, 3]
+    assert result['processed_pages'] == 4
+    assert result['last_page'] == 3
+    assert result['loaded_count'] == 310
+    # в полёте не больше concurrency страниц сверх последней
+    assert max(requested) < 3 + 1 + 4
+
+
+def test_parallel_chunks_of_one_task_report_progress_per_key(tmp_path):
+    db = TaskDatabase(str(tmp_path / "progress.sqlite3"))
+    db.create_task('t1', 'load_vacancies', {})
+    fetcher = VacancyFetcher(config={'progress_flush_interval_sec': 3600}, rate_limit_delay=0.0, database=db)
+    both_started = threading.Barrier(2)
+
+    def fake_fetch_page(filter_params, page):
+        if page == 0:
+            both_started.wait(5)
+        count = 100 if page < (2 if filter_params['id'] == 'f1' else 1) else 10
+        return _page_items(page + (0 if filter_params['id'] == 'f1' else 50), count)
+
+    fetcher._fetch_page = fake_fetch_page
+    threads = [threading.Thread(target=fetcher.fetch_chunk, args=({
+        'page_start': 0, 'page_end': 5, 'filter': {'id': flt}, 'task_id': 't1', 'progress_key': flt},))
+        for flt in ('f1', 'f2')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    progress = db.get_task('t1')['progress']
+    assert progress['parts']['f1']['vacancies_loaded'] == 210
+    assert progress['parts']['f2']['vacancies_loaded'] == 110
+    assert progress['vacancies_loaded'] == 320
+    assert progress['pages_processed'] == 5
+    assert fetcher._progress_reporters == {} and fetcher._progress_refs == {}
+
+
+def test_async_fetcher_ua_fallback_retry_and_employer_404(tmp_path):
+    import asyncio
+    import pytest
+    httpx = pytest.importorskip("httpx")
+    from plugins.fetcher_async_v4 import AsyncVacancyFetcher
+
+    calls = []
+
+    def handler(request):
+        calls.append((request.url.path, request.headers.get('User-Agent')))
+        if request.url.path == '/vacancies':
+            if len(calls) == 1:
+                return httpx.Response(400, text='bad ua')
+            page = int(request.url.params['page'])
+            return httpx.Response(200, json={'items': _page_items(page, 100 if page == 0 else 5), 'found': 105})
+        if request.url.path == '/employers/404':
+            return httpx.Response(404)
+        return httpx.Response(200, json={'id': '1', 'name': 'ACME'})
+
+    async def run():
+        fetcher = AsyncVacancyFetcher(config={'concurrent_pages': 2}, rate_limit_delay=0.0,
+                                      database=TaskDatabase(str(tmp_path / "async.sqlite3")))
+        fetcher._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        async with fetcher:
+            chunk = await fetcher.fetch_chunk({'page_start': 0, 'page_end': 5, 'filter': {'id': 'f1'}})
+            employer = await fetcher.fetch_employer('1')
+            missing = await fetcher.fetch_employer('404')
+        return fetcher, chunk, employer, missing
+
+    fetcher, chunk, employer, missing = asyncio.run(run())
+    assert chunk['processed_pages'] == 2
+    assert chunk['loaded_count'] == 105
+    assert fetcher.ua_fallback_used is True
+    assert calls[-1][1] == fetcher.safe_browser_ua
+    assert employer == {'id': '1', 'name': 'ACME'}
+    assert missing is None
+
+
+def test_fallbacks_do_not_mutate_shared_session_headers(tmp_path):
+    import json
+    import requests
+    from requests.adapters import BaseAdapter
+
+    sent = []
+
+    class FakeAdapter(BaseAdapter):
+        def send(self, request, **kwargs):
+            sent.append(dict(request.headers))
+            resp = requests.Response()
+            resp.status_code = 403 if len(sent) == 1 else 200
+            resp._content = json.dumps({'items': _page_items(0, 3), 'found': 3, 'pages': 1}).encode()
+            resp.url, resp.request = request.url, request
+            return resp
+
+        def close(self):
+            pass
+
+    fetcher = VacancyFetcher(config={}, rate_limit_delay=0.0,
+                             database=TaskDatabase(str(tmp_path / "headers.sqlite3")))
+    fetcher.session.headers['Authorization'] = 'Bearer token'
+    fetcher.session.mount('https://', FakeAdapter())
+    session_headers = dict(fetcher.session.headers)
+
+    data = fetcher._fetch_page_data({'text': 'python'}, 0)
+
+    assert len(data['items']) == 3
+    assert sent[0]['Authorization'] == 'Bearer token' and 'Authorization' not in sent[1]
+    # session общая для потоков пула — fallback действует через заголовки запроса
+    assert dict(fetcher.session.headers) == session_headers
+    assert 'Authorization' not in fetcher.get_headers()
+
+
+def test_estimate_total_pages_reuses_page_zero(tmp_path):
+    from plugins.fetcher_v4 import estimate_total_pages
+
+    fetcher = VacancyFetcher(rate_limit_delay=0.0, database=TaskDatabase(str(tmp_path / "estimate.sqlite3")))
+    requested = []
+
+    def fake_fetch_page_data(filter_params, page):
+        requested.append(page)
+        return {'items': _page_items(page, 100 if page == 0 else 20), 'found': 120, 'pages': 2}
+
+    fetcher._fetch_page_data = fake_fetch_page_data
+    flt = {'id': 'f1', 'params': {'text': 'python', 'area': 1}}
+
+    assert estimate_total_pages(flt['params'], fetcher) == 2
+    result = fetcher.fetch_chunk({'page_start': 0, 'page_end': 2, 'filter': flt})
+
+    assert requested == [0, 1]
+    assert result['loaded_count'] == 120
+
+
+def test_incremental_fetch_uses_and_advances_watermark(tmp_path):
+    db = TaskDatabase(str(tmp_path / "incremental.sqlite3"))
+    fetcher = VacancyFetcher(config={'incremental_fetch': True}, rate_limit_delay=0.0, database=db)
+    requests_seen = []
+    # выдача отсортирована по дате публикации: от новых к старым, 10 вакансий на час
+    published = [f'2025-09-20T{20 - i // 10:02d}:00:00+0300' for i in range(200)]
+
+    def fake_fetch_page(filter_params, page_no):
+        date_from = filter_params.get('params', filter_params).get('date_from')
+        requests_seen.append((page_no, date_from))
+        # HH фильтрует по date_from на своей стороне
+        matching = [p for p in published if not date_from or p >= date_from]
+        return [{'id': f'{page_no}-{i}', 'name': 'Vacancy', 'published_at': p}
+                for i, p in enumerate(matching[page_no * 100:(page_no + 1) * 100])]
+
+    fetcher._fetch_page = fake_fetch_page
+    flt = {'id': 'f1', 'params': {'text': 'python', 'period': 1}}
+
+    # первый прогон: watermark нет — полная загрузка; chunk'и watermark не трогают, его сдвигает вызывающий
+    assert fetcher.read_watermark('f1') is None
+    first = fetcher.fetch_chunk({'page_start': 0, 'page_end': 1, 'filter': flt, 'watermark': None})
+    second = fetcher.fetch_chunk({'page_start': 1, 'page_end': 2, 'filter': flt, 'watermark': None})
+    assert requests_seen == [(0, None), (1, None)]
+    assert db.get_filter_watermark('f1') is None
+    fetcher.commit_watermark('f1', {'newest_published_at': fetcher._newest_published(
+        [{'published_at': r['newest_published_at']} for r in (first, second)], None), 'errors': []})
+    assert db.get_filter_watermark('f1') == '2025-09-20T20:00:00+0300'
+
+    # следующий прогон: date_from = watermark, выдача заканчивается пустой страницей
+    requests_seen.clear()
+    db.set_filter_watermark('f1', '2025-09-20T15:00:00+0300')
+    watermark = fetcher.read_watermark('f1')
+    result = fetcher.fetch_chunk({'page_start': 0, 'page_end': 10, 'filter': flt, 'watermark': watermark})
+    assert requests_seen == [(0, watermark), (1, watermark)]
+    assert result['processed_pages'] == 1
+    assert 'period' not in fetcher._apply_watermark(flt, watermark)['params']
+
+    # ошибки в прогоне — watermark остаётся прежним
+    fetcher.commit_watermark('f1', {'newest_published_at': result['newest_published_at'], 'errors': [{'page': 3}]})
+    assert db.get_filter_watermark('f1') == watermark
+
+
+def test_split_search_space_bisects_date_window_under_cap(tmp_path):
+    from datetime import datetime
+
+    fetcher = VacancyFetcher(rate_limit_delay=0.0, database=TaskDatabase(str(tmp_path / "split.sqlite3")))
+    probes = []
+
+    def fake_fetch_page_data(filter_params, page):
+        fp = filter_params['params']
+        date_from = datetime.strptime(fp['date_from'], '%Y-%m-%dT%H:%M:%S%z')
+        date_to = datetime.strptime(fp['date_to'], '%Y-%m-%dT%H:%M:%S%z')
+        probes.append(page)
+        # ~1000 вакансий в сутки: 8 суток -> 8000, окно в 2 суток укладывается в лимит
+        found = int((date_to - date_from).total_seconds() / 86400 * 1000)
+        return {'items': _page_items(len(probes), 100), 'found': found, 'pages': min(20, (found + 99) // 100)}
+
+    fetcher._fetch_page_data = fake_fetch_page_data
+    flt = {'id': 'f1', 'params': {'text': 'python OR django', 'date_from': '2025-09-01T00:00:00+0300',
+                                  'date_to': '2025-09-09T00:00:00+0300', 'period': 30}}
+
+    slices = fetcher.split_search_space(flt)
+
+    assert [s['found'] for s in slices] == [2000] * 4
+    assert [s['filter']['params']['date_from'][:10] for s in slices] == \
+        ['2025-09-01', '2025-09-03', '2025-09-05', '2025-09-07']
+    assert slices[-1]['filter']['params']['date_to'] == '2025-09-09T00:00:00+0300'
+    assert all('period' not in s['filter']['params'] and s['filter']['id'] == 'f1' for s in slices)
+    # 1 + 2 + 4 проб: каждое окно запрошено один раз, страница 0 срезов переиспользуется
+    assert probes == [0] * 7
+    result = fetcher.fetch_chunk({'page_start': 0, 'page_end': 1, 'filter': slices[0]['filter']})
+    assert len(probes) == 7 and result['processed_pages'] == 1
+
+
+def test_employer_conditional_get_uses_stored_etag(tmp_path):
+    import asyncio
+    import pytest
+    httpx = pytest.importorskip("httpx")
+    from plugins.fetcher_async_v4 import AsyncVacancyFetcher
+
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers.get('If-None-Match'))
+        if request.headers.get('If-None-Match') == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, json={'id': '7', 'name': 'ACME'}, headers={'ETag': '"v1"'})
+
+    db = TaskDatabase(str(tmp_path / "etag.sqlite3"))
+
+    async def run():
+        fetcher = AsyncVacancyFetcher(rate_limit_delay=0.0, database=db)
+        fetcher._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        async with fetcher:
+            first = await fetcher.fetch_employer_if_modified('7')
+            second = await fetcher.fetch_employer_if_modified('7')
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == ({'id': '7', 'name': 'ACME'}, False)
+    assert second == (None, True)
+    assert seen == [None, '"v1"']
+    assert db.get_http_validators('https://api.hh.ru/employers/7')['etag'] == '"v1"'
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Unit-тесты HHDictionaryManager: кэш справочников без обращений к HH API
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from core.task_database import TaskDatabase
+from core.hh_dictionaries import HHDictionaryManager
+
+
+class FakeFetcher:
+    base_url = 'https://api.hh.ru'
+
+    def __init__(self):
+        self.calls = []
+
+    def fetch_json_if_modified(self, url, conditional=True):
+        self.calls.append((url, conditional))
+        if conditional:
+            return None, True
+        if url.endswith('/areas'):
+            return [{'id': '113', 'parent_id': None, 'name': 'Россия', 'areas': [
+                {'id': '1', 'parent_id': '113', 'name': 'Москва', 'areas': []},
+                {'id': '2', 'parent_id': '113', 'name': 'Санкт-Петербург', 'areas': []},
+            ]}], False
+        return {
+            'experience': [{'id': 'noExperience', 'name': 'Нет опыта'}],
+            'currency': [{'code': 'RUR', 'abbr': '₽', 'name': 'Рубли', 'rate': 1.0}],
+            'vacancy_search_fields': 'not a list',
+        }, False
+
+
+def test_refresh_caches_dictionaries_and_resolves_offline(tmp_path):
+    db = TaskDatabase(str(tmp_path / "dict.sqlite3"))
+    fetcher = FakeFetcher()
+    manager = HHDictionaryManager(db, fetcher)
+
+    result = manager.refresh()
+    assert result['updated'] == {'experience': 1, 'currency': 1, 'areas': 3}
+
+    # свежий кэш — повторный refresh без запросов
+    assert manager.refresh()['skipped'] == ['dictionaries', 'areas']
+    assert len(fetcher.calls) == 2
+
+    lookup = HHDictionaryManager(db)
+    assert lookup.resolve_area('москва') == '1'
+    assert lookup.get('areas', 2)['parent_id'] == '113'
+    assert lookup.get('currency', 'RUR')['metadata']['abbr'] == '₽'
+    flt = {'id': 'f1', 'params': {'area': ['Москва', 2], 'experience': 'Нет опыта', 'schedule': 'remote'}}
+    assert lookup.normalize_filter(flt)['params'] == {'area': ['1', '2'], 'experience': 'noExperience',
+                                                      'schedule': 'remote'}
+    assert lookup.validate_filter({'area': 'Атлантида', 'experience': 'noExperience'}) == \
+        ["Неизвестное значение area: 'Атлантида'"]
+
+
+def test_expired_dictionaries_use_conditional_get(tmp_path):
+    db = TaskDatabase(str(tmp_path / "dict304.sqlite3"))
+    fetcher = FakeFetcher()
+    manager = HHDictionaryManager(db, fetcher, cache_days=0)
+    manager.refresh()
+
+    result = manager.refresh()
+    assert sorted(result['not_modified']) == ['areas', 'currency', 'experience']
+    assert fetcher.calls[-2:] == [('https://api.hh.ru/dictionaries', True), ('https://api.hh.ru/areas', True)]
+    assert manager.get_name('experience', 'noExperience') == 'Нет опыта'
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Unit-тесты ProgressReporter: прогресс задач копится в памяти, в БД — не чаще интервала
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from core.progress_reporter import ProgressChannel, ProgressReporter
+
+
+class RecordingDb:
+    def __init__(self):
+        self.writes = []
+
+    def update_task_progress(self, task_id, progress):
+        self.writes.append((task_id, progress))
+
+
+def test_updates_coalesced_and_flushed_on_close():
+    db = RecordingDb()
+    channel = ProgressChannel()
+    published = []
+    unsubscribe = channel.subscribe(lambda task_id, progress: published.append(progress['page']))
+    reporter = ProgressReporter(db, 't1', min_interval_sec=3600, channel=channel,
+                                snapshot=lambda: {'stats': {'requests_made': 7}})
+
+    for page in range(20):
+        reporter.update(page=page, vacancies_loaded=(page + 1) * 100)
+
+    # первая страница записана сразу, остальные — только в памяти и канале
+    assert len(db.writes) == 1
+    assert published == list(range(20))
+    assert channel.latest('t1')['vacancies_loaded'] == 2000
+
+    reporter.close('completed')
+    assert len(db.writes) == 2
+    task_id, progress = db.writes[-1]
+    assert task_id == 't1' and progress['page'] == 19 and progress['status'] == 'completed'
+    assert progress['stats'] == {'requests_made': 7}
+
+    # без изменений повторная запись не выполняется
+    assert reporter.flush() is False
+    unsubscribe()
+    reporter.update(page=20)
+    assert published[-1] == 19
+
+
+def test_zero_interval_writes_every_update():
+    db = RecordingDb()
+    reporter = ProgressReporter(db, 't2', min_interval_sec=0, channel=ProgressChannel())
+    for page in range(3):
+        reporter.update(page=page)
+    assert [p['page'] for _, p in db.writes] == [0, 1, 2]
+
+
+def test_parts_do_not_overwrite_each_other_and_close_drops_channel_entry():
+    db = RecordingDb()
+    channel = ProgressChannel()
+    reporter = ProgressReporter(db, 't3', min_interval_sec=3600, channel=channel,
+                                totals=('vacancies_loaded',))
+    reporter.update_part('f1', current_page=4, vacancies_loaded=500)
+    reporter.update_part('f2', current_page=1, vacancies_loaded=200)
+    reporter.update_part('f1', current_page=5, vacancies_loaded=600)
+
+    latest = channel.latest('t3')
+    assert latest['parts'] == {'f1': {'current_page': 5, 'vacancies_loaded': 600},
+                               'f2': {'current_page': 1, 'vacancies_loaded': 200}}
+    assert latest['vacancies_loaded'] == 800
+
+    reporter.close('completed')
+    assert db.writes[-1][1]['vacancies_loaded'] == 800
+    assert channel.latest() == {}
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Unit-тесты SchedulerDaemon без запуска главного цикла (БД — временный файл)
+"""
+import asyncio
+import json
+import logging
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+import requests
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import core.scheduler_daemon as scheduler_daemon
+import core.task_dispatcher as task_dispatcher
+from core.task_database import TaskDatabase
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    db = TaskDatabase(str(tmp_path / "scheduler.sqlite3"))
+    monkeypatch.setattr(scheduler_daemon, 'TaskDatabase', lambda: db)
+    monkeypatch.setattr(task_dispatcher, 'TaskDatabase', lambda: db)
+    monkeypatch.setattr(logging.getLogger(), 'handlers', [logging.NullHandler()])
+    # демон не должен подменять обработчики сигналов процесса pytest
+    monkeypatch.setattr(scheduler_daemon.signal, 'signal', lambda *args: None)
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps({'task_dispatcher': {'task_lease_sec': 0.3},
+                                       'vacancy_fetcher': {'rate_limit_delay': 0.0}}), encoding='utf-8')
+    d = scheduler_daemon.SchedulerDaemon(str(config_path))
+    yield d
+    d.lease_heartbeat.stop()
+
+
+def test_blocking_handler_keeps_lease_beyond_lease_sec(daemon):
+    db = daemon.db_v4
+    reclaimed = []
+
+    async def blocking_health(task):
+        # блокирующий шаг занимает цикл дольше lease_sec — продлевать аренду должен поток
+        time.sleep(1.0)
+        reclaimed.append(db.reclaim_expired_leases())
+        return {'ok': True}
+
+    daemon._execute_system_health = blocking_health
+    task = scheduler_daemon.ScheduledTask(scheduler_daemon.TaskType.SYSTEM_HEALTH, 'health', 'hourly')
+    execution = asyncio.run(daemon._execute_task('health', task))
+
+    assert execution.status == scheduler_daemon.TaskStatus.COMPLETED
+    assert reclaimed == [{'requeued': 0, 'failed': 0}]
+    assert db.get_task('health')['status'] == 'completed'
+
+
+HH_DATE = '%Y-%m-%dT%H:%M:%S%z'
+
+
+def _run_fetch(daemon, tmp_path, flt, **params):
+    """_execute_fetch_vacancies по фильтру flt; HH отвечает ~1000 вакансий в сутки окна"""
+    fetcher = daemon.fetcher
+    daemon.async_fetcher = None
+    requested = []
+    now = datetime.now().astimezone().replace(microsecond=0)
+
+    def fake_fetch_page_data(filter_params, page):
+        request = fetcher._build_request_params(filter_params, page)
+        requested.append(request)
+        if page >= 20:
+            raise requests.RequestException("HTTP 400")
+        date_to = datetime.strptime(request['date_to'], HH_DATE) if 'date_to' in request else now
+        if 'date_from' in request:
+            date_from = datetime.strptime(request['date_from'], HH_DATE)
+        else:
+            date_from = now - timedelta(days=float(request.get('search_period', 30)))
+        found = int((date_to - date_from).total_seconds() / 86400 * 1000)
+        # короткая страница — chunk останавливается на странице 0
+        items = [{'id': f"{request.get('date_to', 'now')}-{i}", 'name': 'Vacancy',
+                  'published_at': (date_to - timedelta(minutes=i)).strftime(HH_DATE)} for i in range(10)]
+        return {'items': items, 'found': found, 'pages': min(20, (found + 99) // 100)}
+
+    fetcher._fetch_page_data = fake_fetch_page_data
+    filters_path = tmp_path / "filters.json"
+    filters_path.write_text(json.dumps({'filters': [flt]}), encoding='utf-8')
+    task = scheduler_daemon.ScheduledTask(scheduler_daemon.TaskType.FETCH_VACANCIES, 'fetch', 'hourly',
+                                          params={'filters_source': str(filters_path), **params})
+    asyncio.run(daemon._execute_fetch_vacancies('fetch', task))
+    return requested, now
+
+
+def test_incremental_window_over_cap_is_split_and_advances_watermark(daemon, tmp_path):
+    db = daemon.db_v4
+    watermark = (datetime.now().astimezone() - timedelta(days=3)).replace(microsecond=0).strftime(HH_DATE)
+    db.set_filter_watermark('f1', watermark)
+
+    requested, now = _run_fetch(daemon, tmp_path, {'id': 'f1', 'params': {'text': 'python'}}, incremental=True)
+
+    # 3000 вакансий после watermark: окно делится по датам, страницы за лимитом HH не запрашиваются
+    assert all(r['page'] < 20 for r in requested)
+    assert any('date_to' in r for r in requested)
+    assert db.get_filter_watermark('f1') == now.strftime(HH_DATE)
+
+
+def test_results_under_cap_are_not_split(daemon, tmp_path):
+    requested, _ = _run_fetch(daemon, tmp_path, {'id': 'f2', 'params': {'text': 'python', 'period': 1.95}},
+                              split_search_space=True)
+
+    # 1950 результатов: pages = 20, но в лимит HH укладываются — одна выдача без окон
+    assert [r['page'] for r in requested] == [0]
+    assert not any('date_to' in r for r in requested)
@@ -0,0 +1,486 @@
+# -*- coding: utf-8 -*-
+"""
+Unit-тесты TaskDatabase (без сети и без запущенного демона)
+"""
+import json
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from core.task_database import SQLiteConnectionPool, TaskDatabase
+
+
+def _vacancy(hh_id, name="Python developer", **extra):
+    data = {
+        'id': str(hh_id),
+        'name': name,
+        'employer': {'id': '100', 'name': 'ACME'},
+        'salary': {'from': 100000, 'to': 200000, 'currency': 'RUR'},
+        'area': {'id': '1', 'name': 'Москва'},
+        'experience': {'id': 'between1And3', 'name': 'От 1 года до 3 лет'},
+        'schedule': {'id': 'remote', 'name': 'Удаленная работа'},
+        'employment': {'id': 'full', 'name': 'Полная занятость'},
+        'snippet': {'responsibility': 'Писать код', 'requirement': 'Python'},
+        'published_at': '2025-09-20T10:00:00+0300',
+        'alternate_url': f'https://hh.ru/vacancy/{hh_id}',
+    }
+    data.update(extra)
+    return data
+
+
+def test_connection_pool_reuses_connection_per_thread(tmp_path):
+    db = TaskDatabase(str(tmp_path / "pool.sqlite3"))
+    with db.get_connection() as first:
+        pass
+    for _ in range(5):
+        with db.get_connection() as conn:
+            assert conn is first
+
+    other = []
+
+    def _worker():
+        with db.get_connection() as conn:
+            other.append(conn)
+
+    t = threading.Thread(target=_worker)
+    t.start()
+    t.join()
+    assert other and other[0] is not first
+
+    stats = db.get_pool_stats()
+    assert stats['created'] == 2
+    assert stats['reused'] >= 5
+    assert stats['open_connections'] == 2
+
+
+def test_schema_created_once_for_concurrent_constructors(tmp_path, monkeypatch):
+    calls = []
+    create_tables = TaskDatabase._create_tables
+
+    def slow_create_tables(self):
+        calls.append(threading.current_thread().name)
+        time.sleep(0.05)
+        create_tables(self)
+
+    monkeypatch.setattr(TaskDatabase, '_create_tables', slow_create_tables)
+    start = threading.Barrier(8)
+    path = str(tmp_path / "cold.sqlite3")
+
+    def _construct():
+        start.wait(5)
+        TaskDatabase(path)
+
+    threads = [threading.Thread(target=_construct) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+
+
+def test_pool_enforces_max_connections(tmp_path):
+    pool = SQLiteConnectionPool(str(tmp_path / "limit.sqlite3"), timeout=0.2, max_connections=1)
+    with pool.connection():
+        pass
+    errors = []
+    release = threading.Event()
+
+    def _holder():
+        with pool.connection():
+            pass
+        release.wait(5)
+
+    def _other():
+        try:
+            with pool.connection():
+                pass
+        except sqlite3.OperationalError as e:
+            errors.append(e)
+
+    pool.release()
+    holder = threading.Thread(target=_holder)
+    holder.start()
+    t = threading.Thread(target=_other)
+    t.start()
+    t.join()
+    assert len(errors) == 1 and 'exhausted' in str(errors[0])
+
+    release.set()
+    holder.join()
+    t = threading.Thread(target=_other)  # соединение завершившегося потока закрывается при нехватке
+    t.start()
+    t.join()
+    assert len(errors) == 1 and pool.get_stats()['open_connections'] == 1
+
+
+def test_pool_rolls_back_uncommitted_writes(tmp_path):
+    db = TaskDatabase(str(tmp_path / "rollback.sqlite3"))
+    with db.get_connection() as conn:
+        conn.execute("INSERT INTO logs (ts, level, message) VALUES (1, 'INFO', 'lost')")
+    with db.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0] == 0
+
+
+def test_save_vacancies_bulk_counts(tmp_path):
+    db = TaskDatabase(str(tmp_path / "bulk.sqlite3"))
+    page = [_vacancy(i) for i in range(1, 6)]
+
+    assert db.save_vacancies_bulk(page, 'f1') == {'new': 5, 'updated': 0, 'unchanged': 0, 'errors': 0}
+
+    page[0] = _vacancy(1, name="Senior Python developer")
+    page.append(_vacancy(6))
+    assert db.save_vacancies_bulk(page, 'f1') == {'new': 1, 'updated': 1, 'unchanged': 4, 'errors': 0}
+
+    with db.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM vacancies").fetchone()[0] == 6
+        title = conn.execute("SELECT title FROM vacancies WHERE hh_id = '1'").fetchone()[0]
+    assert title == "Senior Python developer"
+    # Одиночный путь видит те же хеши
+    assert db.save_vacancy(page[1], 'f1') is False
+
+
+def test_unique_hh_id_migration_removes_duplicates(tmp_path):
+    import sqlite3
+    path = str(tmp_path / "legacy.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE vacancies (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, hh_id TEXT, title TEXT, company TEXT, employer_id TEXT,
+            salary_from INTEGER, salary_to INTEGER, currency TEXT, experience TEXT, schedule TEXT,
+            employment TEXT, description TEXT, key_skills TEXT, area TEXT, published_at TEXT, url TEXT,
+            processed_at REAL, filter_id TEXT, content_hash TEXT, raw_json TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX idx_vacancies_hh_id ON vacancies(hh_id)")
+    conn.executemany("INSERT INTO vacancies (hh_id, title) VALUES (?, ?)",
+                     [('1', 'a'), ('1', 'a-dup'), ('2', 'b'), (None, 'x'), (None, 'y')])
+    conn.commit()
+    conn.close()
+
+    db = TaskDatabase(path)
+    with db.get_connection() as conn:
+        rows = conn.execute("SELECT hh_id, title FROM vacancies ORDER BY id").fetchall()
+        indexes = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert [tuple(r) for r in rows] == [('1', 'a'), ('2', 'b'), (None, 'x'), (None, 'y')]
+    assert 'idx_vacancies_hh_id_unique' in indexes
+    assert 'idx_vacancies_hh_id' not in indexes
+
+    assert db.save_vacancy(_vacancy(1), 'f1') is True
+    assert db.save_vacancy(_vacancy(1), 'f1') is False
+    assert db.save_vacancy(_vacancy(1, name="changed"), 'f1') is True
+
+
+def test_normalized_dimensions_and_compat_view(tmp_path):
+    db = TaskDatabase(str(tmp_path / "dims.sqlite3"))
+
+    def vacancy(hh_id, area_id, area_name):
+        return {'id': hh_id, 'name': 'Python dev', 'area': {'id': area_id, 'name': area_name},
+                'experience': {'id': 'between1And3', 'name': 'От 1 года до 3 лет'},
+                'salary': {'from': 100000, 'currency': 'RUR'}}
+
+    db.save_vacancies_bulk([vacancy('1', '1', 'Москва'), vacancy('2', '2', 'Санкт-Петербург')], 'f1')
+    with db.get_connection() as conn:
+        # строка, сохранённая до появления ключей (raw_json ещё TEXT)
+        conn.execute("UPDATE vacancies SET area_key = NULL, experience_key = NULL, raw_json = ? WHERE hh_id = '2'",
+                     (json.dumps(vacancy('2', '2', 'Санкт-Петербург'), ensure_ascii=False),))
+        conn.commit()
+
+    result = db.normalize_vacancy_storage(batch_size=1)
+    assert result['rows_keyed'] == 2
+    db.save_vacancy(vacancy('3', '1', 'Москва'))
+
+    with db.get_connection() as conn:
+        raw = conn.execute("SELECT area, experience, currency, area_key FROM vacancies ORDER BY hh_id").fetchall()
+        compat = conn.execute("SELECT hh_id, area, experience, currency FROM vacancies_compat ORDER BY hh_id").fetchall()
+        areas = conn.execute("SELECT COUNT(*) FROM dim_areas").fetchone()[0]
+    assert all(r['area'] is None and r['experience'] is None and r['currency'] is None for r in raw)
+    assert raw[0]['area_key'] == raw[2]['area_key'] and areas == 2
+    assert [tuple(r) for r in compat] == [
+        ('1', 'Москва', 'От 1 года до 3 лет', 'RUR'),
+        ('2', 'Санкт-Петербург', 'От 1 года до 3 лет', 'RUR'),
+        ('3', 'Москва', 'От 1 года до 3 лет', 'RUR'),
+    ]
+    assert db.get_recent_vacancies(1)[0]['area'] in ('Москва', 'Санкт-Петербург')
+
+
+def test_raw_json_compressed_and_decoded_lazily(tmp_path):
+    db = TaskDatabase(str(tmp_path / "raw.sqlite3"))
+    payload = {'id': '10', 'name': 'Backend', 'description': 'Python ' * 200}
+    db.save_vacancy(payload, 'f1')
+    with db.get_connection() as conn:
+        # legacy-строка с несжатым raw_json
+        conn.execute("INSERT INTO vacancies (hh_id, title, raw_json) VALUES ('11', 'Legacy', ?)",
+                     (json.dumps({'id': '11', 'name': 'Legacy'}),))
+        conn.commit()
+        stored = conn.execute("SELECT raw_json FROM vacancies WHERE hh_id = '10'").fetchone()[0]
+    assert isinstance(stored, bytes) and len(stored) < len(json.dumps(payload))
+
+    records = {v['hh_id']: v for v in db.get_unprocessed_vacancies()}
+    assert 'raw_data' not in dict(records['10']) and 'raw_data' in records['10']
+    assert records['10']['raw_data'] == payload
+    assert records['11'].get('raw_data') == {'id': '11', 'name': 'Legacy'}
+
+    assert db.compress_raw_json(batch_size=1) == 1
+    with db.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM vacancies WHERE typeof(raw_json) = 'text'").fetchone()[0] == 0
+
+
+def test_vacancy_versions_store_deltas_and_reconstruct(tmp_path):
+    db = TaskDatabase(str(tmp_path / "versions.sqlite3"))
+    v1 = {'id': '42', 'name': 'Python dev', 'salary': {'from': 100000}, 'snippet': {'requirement': 'Django'}}
+    v2 = {'id': '42', 'name': 'Python dev', 'salary': {'from': 150000}, 'snippet': {'requirement': 'Django'}}
+    v3 = {'id': '42', 'name': 'Senior Python dev', 'salary': {'from': 150000}, 'snippet': {'requirement': 'Django'},
+          'area': {'id': '1', 'name': 'Москва'}}
+
+    assert db.save_vacancy(v1) is True
+    assert db.save_vacancies_bulk([v2])['updated'] == 1
+    assert db.save_vacancy(v2) is False
+    assert db.save_vacancy(v3) is True
+
+    with db.get_connection() as conn:
+        deltas = [json.loads(r[0]) for r in conn.execute("SELECT delta FROM vacancy_versions ORDER BY version")]
+    # хранятся только изменённые поля
+    assert deltas[0] == {'set': {'salary': {'from': 100000}}, 'unset': []}
+    assert deltas[1] == {'set': {'name': 'Python dev'}, 'unset': ['area']}
+
+    versions = db.get_vacancy_versions('42')
+    assert [(v['version'], v['current']) for v in versions] == [(1, False), (2, False), (3, True)]
+    assert versions[1]['changed_fields'] == ['area', 'name']
+    assert db.reconstruct_vacancy_version('42', 1) == v1
+    assert db.reconstruct_vacancy_version('42', 2) == v2
+    assert db.reconstruct_vacancy_version('42', 3) == v3
+    assert db.reconstruct_vacancy_version('42', 4) is None
+    assert db.get_combined_changes_stats(1)['vacancies']['new_versions'] == 2
+
+    # строка удалена и вставлена заново — история прежней строки к ней не относится
+    with db.get_connection() as conn:
+        conn.execute("DELETE FROM vacancies WHERE hh_id = '42'")
+        conn.commit()
+    assert db.save_vacancy(v3) is True and db.save_vacancy(v1) is True
+    assert [(v['version'], v['current']) for v in db.get_vacancy_versions('42')] == [(1, False), (2, True)]
+    assert db.reconstruct_vacancy_version('42', 1) == v3
+
+    # версия 1 удалена по сроку хранения — цепочка дельт с разрывом, восстановить нельзя
+    with db.get_connection() as conn:
+        conn.execute("DELETE FROM vacancy_versions WHERE version = 1")
+        conn.commit()
+    assert db.reconstruct_vacancy_version('42', 1) is None
+    assert db.reconstruct_vacancy_version('42', 2) == v1
+    assert [v['version'] for v in db.get_vacancy_versions('42')] == [2]
+
+
+def test_search_vacancies_fts_follows_updates_and_deletes(tmp_path):
+    db = TaskDatabase(str(tmp_path / "search.sqlite3"))
+    db.save_vacancies_bulk([
+        _vacancy(1, "Python developer", snippet={'responsibility': 'Писать сервисы', 'requirement': 'Django'}),
+        _vacancy(2, "Java developer", snippet={'responsibility': 'Писать сервисы', 'requirement': 'Spring'}),
+        _vacancy(3, "Pythonista", employer={'id': '7', 'name': 'Яндекс'}, snippet={'requirement': 'Flask'}),
+    ])
+
+    result = db.search_vacancies("python")
+    assert result['total'] == 1 and result['items'][0]['hh_id'] == '1'
+    assert '[Python]' in result['items'][0]['snippet']
+    assert {v['hh_id'] for v in db.search_vacancies("pyth*")['items']} == {'1', '3'}
+    assert db.search_vacancies("яндекс")['items'][0]['hh_id'] == '3'
+    assert db.search_vacancies("c++ \"")['total'] == 0
+    assert db.search_vacancies("сервисы", limit=1, offset=1)['total'] == 2
+
+    # триггеры: обновление и удаление отражаются в индексе
+    db.save_vacancy(_vacancy(2, "Kotlin developer"))
+    assert db.search_vacancies("java")['total'] == 0
+    assert db.search_vacancies("kotlin")['items'][0]['hh_id'] == '2'
+    with db.get_connection() as conn:
+        conn.execute("DELETE FROM vacancies WHERE hh_id = '1'")
+        conn.commit()
+    assert db.search_vacancies("django")['total'] == 0
+
+
+def test_stats_counters_maintained_by_triggers_and_cache_invalidated(tmp_path):
+    db = TaskDatabase(str(tmp_path / "stats.sqlite3"))
+    db.save_vacancies_bulk([_vacancy(1), _vacancy(2), _vacancy(3)])
+
+    stats = db.get_stats()
+    assert stats['vacancies']['total_vacancies'] == 3
+    assert stats['vacancies']['processed_vacancies'] == 0
+    assert stats['vacancies']['today_vacancies'] == 3
+    # вызывающий код может дописывать в ответ, кэш от этого не меняется
+    stats['vacancies']['total_vacancies'] = -1
+    assert db.get_stats()['vacancies']['total_vacancies'] == 3
+
+    # повторное сохранение без изменений не сбрасывает кэш
+    generation = db.pool.stats_cache[0]
+    db.save_vacancies_bulk([_vacancy(1)])
+    assert db.pool.stats_cache[0] == generation
+
+    with db.get_connection() as conn:
+        conn.execute("UPDATE vacancies SET is_processed = 1 WHERE hh_id IN ('1', '2')")
+        conn.execute("DELETE FROM vacancies WHERE hh_id = '2'")
+        conn.commit()
+        full = conn.execute("SELECT COUNT(*), SUM(is_processed = 1) FROM vacancies").fetchone()
+    stats = db.get_stats()['vacancies']
+    assert (stats['total_vacancies'], stats['processed_vacancies']) == tuple(full) == (2, 1)
+
+
+def test_stats_cache_covers_storage_metrics(tmp_path):
+    db = TaskDatabase(str(tmp_path / "storage.sqlite3"))
+    db.create_task("t1", "load_vacancies", {})
+    stats = db.get_stats()
+    assert stats['storage']['active_workers'] == 0
+    assert stats['storage']['db_size_bytes'] > 0
+
+    # захват задачи меняет generation — кэш пересчитывается без ожидания TTL
+    db.claim_task("t1", "owner", worker_id="worker-0")
+    claimed = db.get_stats()
+    assert claimed['generation'] != stats['generation']
+    assert claimed['storage']['active_workers'] == 1
+    assert db.get_stats()['generation'] == claimed['generation']
+
+
+def test_hot_queries_use_indexes(tmp_path):
+    """EXPLAIN QUERY PLAN реальных запросов: без полного сканирования таблиц, автоиндексов и сортировок"""
+    db = TaskDatabase(str(tmp_path / "plans.sqlite3"))
+    db.save_vacancies_bulk([_vacancy(1, snippet={}), _vacancy(2, snippet={})])
+    db.create_task("t1", "load_vacancies", {})
+
+    statements = []
+    with db.get_connection() as conn:
+        conn.set_trace_callback(statements.append)
+        try:
+            db.get_due_tasks()
+            db.get_pending_tasks()
+            db.get_tasks()
+            db.get_tasks(status='running')
+            db.get_stats(max_age_sec=0)
+            db.get_unsynced_vacancy_ids()
+            db.get_unprocessed_vacancies()
+            db.get_unanalyzed_vacancies()
+            db.get_unanalyzed_vacancies(new_only=False)
+        finally:
+            conn.set_trace_callback(None)
+
+        selects = [s for s in statements if s.lstrip().upper().startswith('SELECT')]
+        assert len(selects) >= 10
+        for sql in selects:
+            plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+            for step in plan:
+                full_scan = step.startswith('SCAN ') and ' USING ' not in step and step != 'SCAN stats_counters'
+                assert not full_scan, (sql, plan)
+                assert 'AUTOMATIC' not in step, (sql, plan)
+                assert 'TEMP B-TREE FOR ORDER BY' not in step, (sql, plan)
+
+    # new_only=False раньше давал SQL с "AND" без WHERE
+    assert {v['hh_id'] for v in db.get_unanalyzed_vacancies(new_only=False)} == {'1', '2'}
+
+
+def test_task_timestamps_migrated_to_unix_and_cleanup_prunes(tmp_path):
+    db = TaskDatabase(str(tmp_path / "tasks.sqlite3"))
+    now = time.time()
+    for task_id in ("old", "fresh", "legacy"):
+        db.create_task(task_id, "load_vacancies", {})
+    db.update_task_status("fresh", "running")
+    db.update_task_status("fresh", "completed", {"ok": True})
+    fresh = db.get_task("fresh")
+    assert abs(fresh['started_at'] - now) < 60 and abs(fresh['finished_at'] - now) < 60
+
+    # Строки, записанные до исправления: finished_at в юлианских днях
+    old_jd = (now - 30 * 86400) / 86400.0 + 2440587.5
+    with db.get_connection() as conn:
+        conn.execute("UPDATE tasks SET status = 'completed', started_at = ?, finished_at = ? WHERE id = 'old'",
+                     (old_jd, old_jd))
+        conn.execute("UPDATE tasks SET status = 'failed', created_at = ? WHERE id = 'legacy'", (now - 20 * 86400,))
+        conn.execute("DELETE FROM db_meta WHERE key = 'time_unit'")
+        conn.commit()
+    db._create_tables()
+
+    assert abs(db.get_task("old")['finished_at'] - (now - 30 * 86400)) < 1
+    assert db.get_task("legacy")['finished_at'] == db.get_task("legacy")['created_at']
+    assert db.cleanup_old_tasks(days_to_keep=7)['cleaned_count'] == 2
+    assert [t['id'] for t in db.get_tasks()] == ["fresh"]
+
+
+def test_run_maintenance_prunes_in_batches_and_vacuums_incrementally(tmp_path):
+    db = TaskDatabase(str(tmp_path / "maint.sqlite3"))
+    now = time.time()
+    with db.get_connection() as conn:
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        conn.executemany(
+            "INSERT INTO logs (ts, level, module, func, message) VALUES (?, 'INFO', 'm', 'f', ?)",
+            [(now - (40 if i % 2 else 1) * 86400, "x" * 2000) for i in range(2500)]
+        )
+        conn.commit()
+
+    result = db.run_maintenance({'logs': 30, 'tasks': 7, 'unknown': 1}, batch_size=500)
+    assert result['deleted'] == {'logs': 1250, 'tasks': 0}
+    assert result['vacuum']['mode'] == 'incremental'
+    assert result['vacuum']['freed_pages'] > 0 and result['vacuum']['free_pages_left'] == 0
+    assert result['checkpoint']['busy'] == 0
+    with db.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0] == 1250
+
+
+def test_next_schedule_at_and_data_version_signal_new_tasks(tmp_path):
+    db = TaskDatabase(str(tmp_path / "wake.sqlite3"))
+    now = time.time()
+    db.create_task('soon', 'cleanup', {}, schedule_at=now + 30)
+    db.create_task('later', 'cleanup', {}, schedule_at=now + 600)
+    db.create_task('now', 'cleanup', {}, schedule_at=None)
+    assert db.get_next_schedule_at(now) == now + 30
+
+    version = db.get_data_version()
+    assert db.get_data_version() == version  # собственные чтения и записи не меняют версию
+    writer = threading.Thread(target=lambda: db.create_task('web', 'load_vacancies', {}))
+    writer.start()
+    writer.join()
+    assert db.get_data_version() != version
+
+
+def test_task_leases_claim_once_renew_and_reclaim(tmp_path):
+    db = TaskDatabase(str(tmp_path / "lease.sqlite3"))
+    for i in range(30):
+        db.create_task(f't{i}', 'load_vacancies', {'n': i})
+    db.create_task('daemon', 'cleanup', {}, owner='scheduler:1')
+
+    claimed = []
+    def worker(owner):
+        while True:
+            task = db.claim_next_task(owner, lease_sec=60)
+            if task is None:
+                return
+            claimed.append((task['id'], owner))
+
+    threads = [threading.Thread(target=worker, args=(f'host:{n}',)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    ids = [task_id for task_id, _ in claimed]
+    assert sorted(ids) == sorted(f't{i}' for i in range(30))  # каждая ровно один раз, без задачи демона
+    assert db.claim_task('t0', 'other') is None
+
+    owner = dict(claimed)['t1']
+    assert db.renew_leases(owner, ['t1']) == 1 and db.renew_leases('intruder', ['t1']) == 0
+    assert db.update_task_status('t1', 'completed', {'ok': 1}, lease_owner='intruder') is False
+    assert db.update_task_status('t1', 'completed', {'ok': 1}, lease_owner=owner) is True
+
+    # упавший владелец: аренда истекла -> задача снова pending, после лимита попыток -> failed
+    with db.get_connection() as conn:
+        conn.execute("UPDATE tasks SET lease_expires_at = ? WHERE id IN ('t2', 't3')", (time.time() - 1,))
+        conn.execute("UPDATE tasks SET attempts = 3 WHERE id = 't3'")
+        conn.commit()
+    assert db.reclaim_expired_leases(max_attempts=3) == {'requeued': 1, 'failed': 1}
+    assert db.get_task('t2')['status'] == 'pending' and db.get_task('t3')['status'] == 'failed'
+    assert db.get_task('daemon')['status'] == 'running'
+
+    # задача, которую выполняет создатель: аренда продлевается им, после его падения — failed, не pending
+    assert db.renew_leases('scheduler:1', ['daemon'], lease_sec=60) == 1
+    with db.get_connection() as conn:
+        conn.execute("UPDATE tasks SET lease_expires_at = ? WHERE id = 'daemon'", (time.time() - 1,))
+        conn.commit()
+    assert db.reclaim_expired_leases(max_attempts=3) == {'requeued': 0, 'failed': 1}
+    assert db.get_task('daemon')['status'] == 'failed'
+    again = db.claim_next_task('host:new')
+    assert again['id'] == 't2' and again['attempts'] == 2 and again['params'] == {'n': 2}
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Unit-тесты TaskDispatcher без запуска воркеров (БД — временный файл)
+"""
+import logging
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import core.task_dispatcher as task_dispatcher
+from core.task_database import TaskDatabase
+
+
+@pytest.fixture
+def dispatcher(tmp_path, monkeypatch):
+    db = TaskDatabase(str(tmp_path / "dispatcher.sqlite3"))
+    monkeypatch.setattr(task_dispatcher, 'TaskDatabase', lambda: db)
+    # без настроенного root-логгера диспетчер открыл бы logs/app.log
+    monkeypatch.setattr(logging.getLogger(), 'handlers', [logging.NullHandler()])
+    disp = task_dispatcher.TaskDispatcher(max_workers=1)
+
+    # воркер захватывает задачу сразу после постановки в очередь
+    put = disp.task_queue.put
+
+    def put_and_claim(task, priority=None):
+        added = put(task, priority)
+        assert db.claim_task(task.id, disp.lease_owner, worker_id='worker-0') is not None
+        return added
+
+    disp.task_queue.put = put_and_claim
+    return disp
+
+
+def test_enqueue_does_not_drop_lease_of_claimed_task(dispatcher):
+    db = dispatcher.db
+    immediate = dispatcher.add_task('cleanup', {})
+    db.create_task('scheduled', 'cleanup', {}, schedule_at=time.time() - 1)
+    dispatcher._check_schedule()
+
+    for task_id in (immediate, 'scheduled'):
+        assert db.get_task(task_id)['status'] == 'running'
+        # арендованную строку нельзя вернуть в pending мимо reclaim_expired_leases
+        assert db.update_task_status(task_id, 'pending') is False
+        assert db.claim_task(task_id, 'other') is None
+        assert db.update_task_status(task_id, 'completed', {'ok': 1}, lease_owner=dispatcher.lease_owner) is True
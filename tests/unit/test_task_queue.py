@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Unit-тесты TaskQueue: приоритеты, дедупликация и лимиты конкурентности по типам задач
+"""
+import queue
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from core.task_dispatcher import Task
+from core.task_queue import PRIORITY_URGENT, TaskQueue, TimerHeap
+
+
+def load_task(task_id, filter_id, priority=None):
+    return Task(id=task_id, type='load_vacancies', params={'filter': {'id': filter_id}}, priority=priority)
+
+
+def test_urgent_task_jumps_the_line_fifo_within_priority():
+    tq = TaskQueue(type_limits={})
+    tq.put(load_task('a', 'f1'))
+    tq.put(load_task('b', 'f2'))
+    tq.put(Task(id='ui', type='load_vacancies', params={'filter': {'id': 'f3'}, 'priority': PRIORITY_URGENT}))
+
+    assert [tq.get(timeout=0).id for _ in range(3)] == ['ui', 'a', 'b']
+
+    fifo = TaskQueue(type_limits={}, priority_enabled=False)
+    fifo.put(load_task('a', 'f1'))
+    fifo.put(load_task('ui', 'f2', priority=PRIORITY_URGENT))
+    assert fifo.get(timeout=0).id == 'a'
+
+
+def test_duplicate_put_ignored_until_done():
+    tq = TaskQueue()
+    task = load_task('a', 'f1')
+    assert tq.put(task) is True
+    assert tq.put(task) is False
+    assert tq.get(timeout=0) is task
+    assert tq.put(task) is False and 'a' in tq  # выполняется
+    tq.task_done(task)
+    assert 'a' not in tq and tq.put(task) is True
+
+
+def test_one_load_per_filter_and_cleanup_excluded():
+    tq = TaskQueue()
+    first = load_task('a', 'f1')
+    tq.put(first)
+    tq.put(load_task('b', 'f1'))
+    tq.put(Task(id='c', type='cleanup', params={}))
+    tq.put(load_task('d', 'f2'))
+
+    assert tq.get(timeout=0) is first
+    # b ждёт тот же фильтр, cleanup конфликтует с загрузкой — выдаётся d
+    assert tq.get(timeout=0).id == 'd'
+    with pytest.raises(queue.Empty):
+        tq.get(timeout=0.05)
+    assert tq.is_running_type('load_vacancies') and tq.qsize() == 2
+
+    tq.task_done(first)
+    second = tq.get(timeout=0)
+    assert second.id == 'b'
+    tq.task_done(second)
+    tq.task_done(load_task('d', 'f2'))
+    assert tq.get(timeout=0).id == 'c'
+    assert tq.get_stats()['running_by_type'] == {'cleanup': 1}
+
+
+def test_blocked_tasks_parked_until_their_slot_is_released():
+    tq = TaskQueue()
+    first = load_task('a0', 'f1')
+    tq.put(first)
+    for i in range(1, 50):
+        tq.put(load_task(f'a{i}', 'f1'))
+    tq.put(load_task('b', 'f2'))
+
+    assert tq.get(timeout=0) is first
+    assert tq.get(timeout=0).id == 'b'
+    # задачи фильтра f1 сняты с кучи и больше не перебираются при каждом get()
+    assert not tq._heap and len(tq._parked[('key', ('load_vacancies', 'f1'))]) == 49
+    with pytest.raises(queue.Empty):
+        tq.get(timeout=0)
+
+    tq.task_done(load_task('b', 'f2'))
+    assert not tq._heap  # освобождение другого фильтра f1 не будит
+    tq.task_done(first)
+    assert tq.get(timeout=0).id == 'a1'
+    assert tq.qsize() == 48
+
+
+def test_timer_heap_reschedule_and_pop_due():
+    timers = TimerHeap()
+    timers.push('hourly', 100.0)
+    timers.push('daily', 50.0)
+    timers.push('daily', 150.0)  # перенос: прежний срок больше не срабатывает
+    timers.push('gone', 10.0)
+    timers.discard('gone')
+
+    assert timers.next_due() == 100.0
+    assert timers.pop_due(120.0) == ['hourly']
+    assert timers.pop_due(120.0) == []
+    assert len(timers) == 1 and timers.pop_due(200.0) == ['daily']
+    assert timers.next_due() is None
@@ -140,12 +140,27 @@ class MonitoringService:
         profile['top_employers'] = dict(cursor.fetchall())
         
         # Распределение по опыту
-        cursor.execute("""
-            SELECT experience, COUNT(*) as count
-            FROM vacancies
-            GROUP BY experience
-            ORDER BY count DESC
-        """)
+        # // Chg_VAC_DIMS_1710: группировка по целочисленному experience_key, название — из справочника
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='dim_experience'")
+        if cursor.fetchone():
+            cursor.execute("""
+                SELECT COALESCE(d.name, g.experience) as experience, SUM(g.count) as count
+                FROM (
+                    SELECT experience_key, experience, COUNT(*) as count
+                    FROM vacancies
+                    GROUP BY experience_key, experience
+                ) g
+                LEFT JOIN dim_experience d ON d.id = g.experience_key
+                GROUP BY 1
+                ORDER BY count DESC
+            """)
+        else:
+            cursor.execute("""
+                SELECT experience, COUNT(*) as count
+                FROM vacancies
+                GROUP BY experience
+                ORDER BY count DESC
+            """)
         profile['experience_distribution'] = dict(cursor.fetchall())
         
         # Последние обновления
@@ -26,6 +26,8 @@ from core.config_manager import get_config_manager
 
 # Импорты модулей v4
 from core.task_database import TaskDatabase
+from core.progress_reporter import progress_channel
+from core.task_queue import PRIORITY_URGENT
 
 app = FastAPI(title="HH Tool v4 Dashboard", version="4.0.0")
 
@@ -58,7 +60,11 @@ try:
         sh.setFormatter(logging.Formatter(logging_cfg.get('format', '%(asctime)s - %(name)s - %(levelname)s - %(message)s')))
         root.addHandler(sh)
     if db_enabled and not any(isinstance(h, DbLogHandler) for h in root.handlers):
-        dbh = DbLogHandler()
+        dbh = DbLogHandler(
+            batch_size=int(logging_cfg.get('db_batch_size', 200)),
+            flush_interval_ms=int(logging_cfg.get('db_flush_interval_ms', 500)),
+            max_queue=int(logging_cfg.get('db_queue_size', 10000))
+        )
         dbh.setFormatter(logging.Formatter(logging_cfg.get('format', '%(asctime)s - %(name)s - %(levelname)s - %(message)s')))
         root.addHandler(dbh)
     root.setLevel(level)
@@ -123,42 +129,20 @@ async def get_stats():
         # Получаем агрегированную статистику в формате v4 БД
         stats = task_db.get_stats()
         
-        # Надёжное вычисление размера БД: PRAGMA -> os.path.getsize -> сумма файлов data/*.sqlite*
-        db_size_bytes: int = 0
-        try:
-            with task_db.get_connection() as conn:
-                cursor = conn.execute("PRAGMA page_count")
-                page_count = cursor.fetchone()[0]
-                cursor = conn.execute("PRAGMA page_size")
-                page_size = cursor.fetchone()[0]
-                db_size_bytes = int(page_count) * int(page_size)
-        except Exception:
+        # // Chg_STATS_CACHE_1710: размер БД и активные воркеры приходят из кэша get_stats
+        storage = stats.pop("storage", None) or {}
+        db_size_bytes: int = storage.get("db_size_bytes", 0)
+        if not db_size_bytes:
             try:
                 # Фолбэк: размер основного файла
                 main_db = Path(task_db.db_path)
-                if main_db.exists():
-                    db_size_bytes = os.path.getsize(main_db)
-                else:
-                    raise FileNotFoundError
+                db_size_bytes = os.path.getsize(main_db) if main_db.exists() else 0
             except Exception:
-                # Фолбэк: сумма по маске
-                try:
-                    db_files = glob.glob("data/*.sqlite*")
-                    db_size_bytes = sum(os.path.getsize(f) for f in db_files if os.path.exists(f))
-                except Exception:
-                    db_size_bytes = 0
+                db_size_bytes = 0
 
         sys_info = _get_system_info()
-        # // Chg_WORKERS_1509: считаем активных воркеров и читаем конфигурацию
-        active_workers = 0
-        try:
-            with task_db.get_connection() as conn:
-                roww = conn.execute(
-                    "SELECT COUNT(DISTINCT worker_id) AS cnt FROM tasks WHERE status='running' AND worker_id IS NOT NULL"
-                ).fetchone()
-                active_workers = roww['cnt'] if roww else 0
-        except Exception:
-            active_workers = 0
+        # // Chg_WORKERS_1509: активные воркеры и конфигурация
+        active_workers = storage.get("active_workers", 0)
         workers_configured = None
         try:
             cfg_path = Path('config/config_v4.json')
@@ -229,11 +213,7 @@ async def get_tasks(
     for task in tasks:
         if task.get('created_at'):
             try:
-                if task['created_at'] > 1000000000:
-                    task['created_at_formatted'] = datetime.fromtimestamp(task['created_at']).isoformat()
-                else:
-                    unix_time = (task['created_at'] - 2440587.5) * 86400
-                    task['created_at_formatted'] = datetime.fromtimestamp(unix_time).isoformat()
+                task['created_at_formatted'] = datetime.fromtimestamp(task['created_at']).isoformat()
             except:
                 task['created_at_formatted'] = 'Invalid'
     
@@ -271,6 +251,26 @@ async def get_recent_vacancies(limit: int = 20):
         })
     return {"vacancies": mapped}
 
+# // Chg_VAC_FTS_1710: полнотекстовый поиск вакансий (FTS5)
+@app.get("/api/vacancies/search")
+async def search_vacancies(q: str, limit: int = 20, offset: int = 0):
+    """API поиска вакансий по тексту (название, компания, описание)"""
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Query parameter 'q' is empty")
+    db = TaskDatabase()
+    result = await asyncio.to_thread(db.search_vacancies, q, limit, offset)
+    vacancies = [{
+        "id": v.get("id"),
+        "hh_id": v.get("hh_id"),
+        "name": v.get("title"),
+        "employer_name": v.get("company"),
+        "area_name": v.get("area"),
+        "published_at": v.get("published_at"),
+        "url": v.get("url"),
+        "snippet": v.get("snippet")
+    } for v in result['items']]
+    return {"query": q, "total": result['total'], "limit": limit, "offset": offset, "vacancies": vacancies}
+
 @app.get("/api/filters")
 async def get_filters():
     """API: Список фильтров из config/filters.json"""
@@ -968,7 +968,9 @@ async def filters_load_now(request: Request):
         for f in selected:
             try:
                 tid = str(_uuid.uuid4())
-                params = {"filter": f, "max_pages": f.get('max_pages'), "chunk_size": 500}
+                # // Chg_TASK_PRIORITY_1710: ручной запуск из UI обгоняет задачи по расписанию
+                params = {"filter": f, "max_pages": f.get('max_pages'), "chunk_size": 500,
+                          "priority": PRIORITY_URGENT}
                 db.create_task(tid, 'load_vacancies', params, schedule_at=None, timeout_sec=3600)
                 created.append({"task_id": tid, "filter_id": f.get('id'), "name": f.get('name')})
             except Exception:
@@ -1073,6 +1075,8 @@ async def daemon_restart():
 # Background task для broadcast обновлений
 async def broadcast_updates():
     """Фоновая задача для отправки обновлений всем подключенным клиентам"""
+    # // Chg_STATS_CACHE_1710: stats_update отправляем, только когда сменилось поколение статистики
+    last_generation = None
     while True:
         try:
             # Получаем актуальные данные безопасно
@@ -1081,6 +1085,8 @@ async def broadcast_updates():
             except Exception as e:
                 print(f"Ошибка получения статистики: {e}")
                 stats_data = {"status": "error", "error": str(e)}
+            generation = stats_data.get("generation")
+            stats_changed = generation is None or generation != last_generation
             
             try:
                 system_info = _get_system_info()
@@ -1090,11 +1096,13 @@ async def broadcast_updates():
             
             # Отправляем всем подключенным клиентам
             if manager.active_connections:
-                await manager.broadcast({
-                    "type": "stats_update",
-                    "data": stats_data,
-                    "timestamp": time.time()
-                })
+                if stats_changed:
+                    await manager.broadcast({
+                        "type": "stats_update",
+                        "data": stats_data,
+                        "timestamp": time.time()
+                    })
+                    last_generation = generation
                 
                 await manager.broadcast({
                     "type": "system_update", 
@@ -1112,6 +1120,24 @@ async def broadcast_updates():
 async def startup_event():
     """Событие запуска - запускаем фоновые задачи"""
     asyncio.create_task(broadcast_updates())
+    # // Chg_PROGRESS_THROTTLE_1710: прогресс задач этого процесса — сразу в WebSocket, без опроса БД
+    loop = asyncio.get_running_loop()
+
+    def _on_progress(task_id: str, progress: Dict[str, Any]) -> None:
+        if manager.active_connections:
+            asyncio.run_coroutine_threadsafe(manager.broadcast({
+                "type": "task_progress",
+                "task_id": task_id,
+                "data": progress,
+                "timestamp": time.time()
+            }), loop)
+
+    progress_channel.subscribe(_on_progress)
+
+@app.get("/api/tasks/progress")
+async def get_tasks_progress():
+    """API: последний прогресс задач, выполняемых в процессе веб-сервера (без чтения БД)"""
+    return {"progress": progress_channel.latest()}
 
 def _read_web_bind_from_config() -> tuple[str, int, str]:
     """Читает host/port и уровень логирования из config/config_v4.json"""